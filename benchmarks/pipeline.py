@@ -0,0 +1,339 @@
+"""Benchmark staging and upload of synthetic Angular build directories.
+
+Runs `copy_build_dir_to_versioned` and `S3.upload_dir` end to end for the
+following profiles:
+
+- `tiny` - thousands of tiny files (lazy loaded chunks, icons, i18n)
+- `huge` - a few huge bundles (hitting multipart uploads)
+- `mixed` - a distribution resembling a real world application
+
+Usage:
+
+    python -m benchmarks.pipeline [--profile mixed] [--scale 1]
+        [--workers 8] [--json results.json]
+
+Uploads go through the real boto3 client (request signing, serialization,
+HTTP and the tuned connection pool) to a minimal S3 compatible stand-in
+served over the loopback by a separate process, so that neither network
+nor the stand-in itself distort the results.
+
+Peak RSS is the maximum of the whole process (and its children) reached
+so far, therefore it never decreases between consecutive benchmarks.
+
+"""
+import argparse
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import json
+import multiprocessing
+import os
+import random
+import resource
+import shutil
+import string
+import tempfile
+import time
+from urllib.parse import parse_qs, urlparse
+import uuid
+
+from lily_delivery.deployers import AngularCLIS3WebsiteDeployer
+
+
+VERSION = '1.0.0'
+
+PROJECT = 'benchmark'
+
+KB = 1024
+
+MB = 1024 * KB
+
+# -- (directory, extension, count, min size, max size, compressible)
+PROFILES = {
+    'tiny': [
+        ('', '.js', 3000, 1 * KB, 4 * KB, True),
+        ('assets/icons', '.svg', 2000, 256, 2 * KB, True),
+        ('assets/i18n', '.json', 500, 512, 8 * KB, True),
+    ],
+    'huge': [
+        ('', '.js', 4, 20 * MB, 40 * MB, True),
+        ('assets/videos', '.mp4', 2, 30 * MB, 30 * MB, False),
+    ],
+    'mixed': [
+        ('', '.js', 60, 10 * KB, 500 * KB, True),
+        ('', '.js', 3, 2 * MB, 6 * MB, True),
+        ('', '.css', 5, 20 * KB, 300 * KB, True),
+        ('assets/images', '.png', 200, 5 * KB, 400 * KB, False),
+        ('assets/icons', '.svg', 300, 512, 4 * KB, True),
+        ('assets/fonts', '.woff2', 10, 20 * KB, 100 * KB, False),
+        ('assets/i18n', '.json', 20, 5 * KB, 50 * KB, True),
+    ],
+}
+
+REPLACEMENTS = [
+    {
+        'from': '/assets/',
+        'to': '/{version}/assets/',
+        'file_extensions': ['.js', '.css'],
+    },
+]
+
+
+class StubS3Handler(BaseHTTPRequestHandler):
+    """Minimal S3 compatible endpoint accepting uploads.
+
+    Only the requests sent by uploads are understood. Bodies are read and
+    discarded so that the stand-in uses as little CPU and memory as
+    possible.
+
+    """
+
+    # -- keep-alive, so that the client's connection pool is exercised
+    protocol_version = 'HTTP/1.1'
+
+    def do_PUT(self):
+        self.read_body()
+        self.respond(headers={'ETag': f'"{uuid.uuid4().hex}"'})
+
+    def do_POST(self):
+        self.read_body()
+        query = parse_qs(urlparse(self.path).query, keep_blank_values=True)
+        if 'uploads' in query:
+            body = (
+                '<InitiateMultipartUploadResult>'
+                f'<UploadId>{uuid.uuid4().hex}</UploadId>'
+                '</InitiateMultipartUploadResult>')
+
+        else:
+            body = (
+                '<CompleteMultipartUploadResult>'
+                f'<ETag>"{uuid.uuid4().hex}"</ETag>'
+                '</CompleteMultipartUploadResult>')
+
+        self.respond(body.encode('utf-8'))
+
+    def do_DELETE(self):
+        self.respond(status=204)
+
+    def read_body(self):
+
+        size = int(self.headers.get('Content-Length', 0))
+        while size > 0:
+            size -= len(self.rfile.read(min(size, MB)))
+
+    def respond(self, body=b'', status=200, headers=None):
+
+        self.send_response(status)
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+def serve(ports):
+
+    server = ThreadingHTTPServer(('127.0.0.1', 0), StubS3Handler)
+    ports.put(server.server_address[1])
+    server.serve_forever()
+
+
+def start_stub_s3():
+    """Run the stand-in in its own process and return `(process, url)`."""
+
+    ports = multiprocessing.Queue()
+    process = multiprocessing.Process(target=serve, args=(ports,))
+    process.daemon = True
+    process.start()
+
+    return process, f'http://127.0.0.1:{ports.get()}'
+
+
+def generate_project(path, profile, scale):
+    """Create Angular CLI project with a synthetic build directory."""
+
+    build_path = os.path.join(path, 'dist')
+    with open(os.path.join(path, 'package.json'), 'w') as f:
+        f.write(json.dumps({'version': VERSION}))
+
+    with open(os.path.join(path, 'angular.json'), 'w') as f:
+        f.write(json.dumps({
+            'projects': {
+                PROJECT: {
+                    'architect': {
+                        'build': {'options': {'outputPath': 'dist'}},
+                    },
+                },
+            },
+        }))
+
+    os.makedirs(build_path)
+    with open(os.path.join(build_path, 'index.html'), 'w') as f:
+        f.write('<html><script src="/assets/main.js"></script></html>')
+
+    # -- compressible content is built from words, incompressible one
+    # -- is random
+    alphabet = string.ascii_letters + string.digits + ' ;(){}.\n'
+    text = ''.join(random.choice(alphabet) for _ in range(64 * KB))
+    text = (text + '"/assets/logo.svg"').encode('utf-8')
+    noise = os.urandom(MB)
+
+    for subdir, ext, count, min_size, max_size, compressible in PROFILES[
+            profile]:
+        os.makedirs(os.path.join(build_path, subdir), exist_ok=True)
+        source = text if compressible else noise
+        for i in range(max(int(count * scale), 1)):
+            size = random.randint(min_size, max_size)
+            name = os.path.join(build_path, subdir, f'file-{i}-{size}{ext}')
+            with open(name, 'wb') as f:
+                while size > 0:
+                    f.write(source[:size])
+                    size -= len(source)
+
+    return build_path
+
+
+def get_usage():
+
+    usages = [
+        resource.getrusage(resource.RUSAGE_SELF),
+        resource.getrusage(resource.RUSAGE_CHILDREN),
+    ]
+
+    return (
+        sum(usage.ru_utime + usage.ru_stime for usage in usages),
+        # -- in KB on Linux
+        max(usage.ru_maxrss for usage in usages) * KB,
+    )
+
+
+def measure(name, fn, files_count, total_size):
+
+    cpu_time = get_usage()[0]
+    started_at = time.perf_counter()
+    fn()
+    duration = time.perf_counter() - started_at
+    cpu_time, peak_rss = get_usage()[0] - cpu_time, get_usage()[1]
+
+    result = {
+        'name': name,
+        'duration': duration,
+        'files_per_second': files_count / duration,
+        'mb_per_second': total_size / duration / MB,
+        'cpu_time': cpu_time,
+        'peak_rss_mb': peak_rss / MB,
+    }
+    print(
+        f'{name:>22}: {duration:7.2f}s, '
+        f'{result["files_per_second"]:9.1f} files/s, '
+        f'{result["mb_per_second"]:7.1f} MB/s, '
+        f'CPU {cpu_time:6.2f}s, '
+        f'peak RSS {result["peak_rss_mb"]:.0f} MB')
+
+    return result
+
+
+def run(profile, scale, workers, conf):
+
+    path = tempfile.mkdtemp()
+    cwd = os.getcwd()
+    try:
+        build_path = generate_project(path, profile, scale)
+        os.chdir(path)
+
+        files = [
+            os.path.join(subdir, file)
+            for subdir, dirs, files in os.walk(build_path)
+            for file in files]
+        total_size = sum(os.path.getsize(file) for file in files)
+        print(
+            f'\n{profile}: {len(files)} file(s), '
+            f'{total_size / MB:.1f} MB')
+
+        deployer = AngularCLIS3WebsiteDeployer(
+            'benchmark', PROJECT, conf, workers=workers)
+
+        staged = {}
+        results = [
+            measure(
+                f'{profile}: staging',
+                lambda: staged.update(
+                    path=deployer.copy_build_dir_to_versioned()[0]),
+                len(files),
+                total_size),
+            measure(
+                f'{profile}: upload',
+                lambda: deployer.s3.upload_dir(
+                    staged['path'],
+                    deployer.meta,
+                    workers=deployer.workers),
+                len(files),
+                total_size),
+        ]
+
+        deployer.cleanup()
+
+        return results
+
+    finally:
+        os.chdir(cwd)
+        shutil.rmtree(path)
+
+
+def main():
+
+    parser = argparse.ArgumentParser()
+    parser.add_argument(
+        '--profile', choices=sorted(PROFILES) + ['all'], default='all')
+    parser.add_argument(
+        '--scale',
+        type=float,
+        default=1.0,
+        help='multiplies number of generated files')
+    parser.add_argument('--workers', type=int, default=8)
+    parser.add_argument('--json', help='store results in that file')
+    args = parser.parse_args()
+
+    server, endpoint_url = start_stub_s3()
+    conf = {
+        'meta': {'cache-control': 'max-age=7200, no-transform, public'},
+        'replacements': REPLACEMENTS,
+        # -- the stand-in serves all buckets under its own host
+        'aws': {'s3': {'addressing_style': 'path'}},
+        'dependencies': {
+            'benchmark': {
+                'hosting_s3': {
+                    'access_key_id': 'benchmark',
+                    'secret_access_key': 'benchmark',
+                    'region': 'us-east-1',
+                    'bucket_name': 'benchmark',
+                    'endpoint_url': endpoint_url,
+                },
+                'hosting_cloudfront': {
+                    'access_key_id': 'benchmark',
+                    'secret_access_key': 'benchmark',
+                    'region': 'us-east-1',
+                    'distribution_id': 'BENCHMARK',
+                },
+            },
+        },
+    }
+
+    profiles = sorted(PROFILES) if args.profile == 'all' else [args.profile]
+    results = []
+    try:
+        for profile in profiles:
+            results.extend(run(profile, args.scale, args.workers, conf))
+
+    finally:
+        server.terminate()
+
+    if args.json:
+        with open(args.json, 'w') as f:
+            f.write(json.dumps(results, indent=2))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,103 @@
+"""Benchmark content replacements on a synthetic set of large bundles.
+
+Compares the single-pass `ReplacementEngine` against applying `str.replace`
+once per pattern on the fully decoded file.
+
+Usage:
+
+    python -m benchmarks.replacements [--files 200] [--size 2]
+
+"""
+import argparse
+import os
+import random
+import shutil
+import string
+import tempfile
+import time
+
+from lily_delivery.replacements import ReplacementEngine
+
+
+REPLACEMENTS = [
+    {
+        'from': f'/assets/lib-{i}',
+        'to': '/{version}/assets/lib-%d' % i,
+        'file_extensions': ['.js'],
+    }
+    for i in range(20)
+]
+
+
+def generate_bundles(path, files_count, size_mb, match_ratio=0.2):
+
+    alphabet = string.ascii_letters + string.digits + ' ;(){}.\n'
+    chunk = ''.join(random.choice(alphabet) for _ in range(64 * 1024))
+    for i in range(files_count):
+        with open(os.path.join(path, f'chunk-{i}.js'), 'w') as f:
+            for _ in range(size_mb * 16):
+                f.write(chunk)
+
+            if random.random() < match_ratio:
+                f.write('"/assets/lib-3/index.js"')
+
+
+def sequential(src, dst, version):
+
+    with open(src, 'r') as f:
+        content = f.read()
+        for replacement in REPLACEMENTS:
+            content = content.replace(
+                replacement['from'],
+                replacement['to'].format(version=version))
+
+    with open(dst, 'w') as f:
+        f.write(content)
+
+
+def measure(name, fn, paths, total_size):
+
+    started_at = time.perf_counter()
+    for src, dst in paths:
+        fn(src, dst)
+
+    duration = time.perf_counter() - started_at
+    print(
+        f'{name:>12}: {duration:.2f}s, '
+        f'{total_size / duration / 1024 / 1024:.1f} MB/s')
+
+
+def main():
+
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--files', type=int, default=200)
+    parser.add_argument('--size', type=int, default=2, help='in MB')
+    args = parser.parse_args()
+
+    path = tempfile.mkdtemp()
+    try:
+        source_path = os.path.join(path, 'src')
+        target_path = os.path.join(path, 'dst')
+        os.makedirs(source_path)
+        os.makedirs(target_path)
+
+        generate_bundles(source_path, args.files, args.size)
+        paths = [
+            (os.path.join(source_path, name), os.path.join(target_path, name))
+            for name in sorted(os.listdir(source_path))]
+        total_size = sum(os.path.getsize(src) for src, _ in paths)
+
+        engine = ReplacementEngine(REPLACEMENTS, '1.0.0')
+        measure(
+            'sequential',
+            lambda src, dst: sequential(src, dst, '1.0.0'),
+            paths,
+            total_size)
+        measure('single pass', engine.apply, paths, total_size)
+
+    finally:
+        shutil.rmtree(path)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,61 @@
+"""Benchmark startup time of the CLI.
+
+Runs `lily_delivery --help` in fresh interpreters and reports the best and
+the median wall time. With `--max-ms` it exits with an error if the median
+exceeds the limit, so it can guard against regressions in CI.
+
+Usage:
+
+    python -m benchmarks.startup [--runs 20] [--max-ms 150]
+
+"""
+import argparse
+import statistics
+import subprocess
+import sys
+import time
+
+
+SCRIPT = (
+    'import sys; '
+    'from lily_delivery.cli import cli; '
+    'sys.argv = ["lily_delivery", "--help"]; '
+    'cli()'
+)
+
+
+def measure(script):
+
+    started_at = time.perf_counter()
+    subprocess.run(
+        [sys.executable, '-c', script],
+        check=True,
+        stdout=subprocess.DEVNULL)
+
+    return (time.perf_counter() - started_at) * 1000
+
+
+def main():
+
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--runs', type=int, default=20)
+    parser.add_argument(
+        '--max-ms', type=float, help='fail if the median is slower')
+    args = parser.parse_args()
+
+    # -- the bare interpreter startup is the floor nothing can go below
+    baseline = [measure('pass') for _ in range(args.runs)]
+    durations = [measure(SCRIPT) for _ in range(args.runs)]
+    median = statistics.median(durations)
+
+    print(
+        f'interpreter: {statistics.median(baseline):.1f}ms (median)\n'
+        f'lily_delivery --help: {min(durations):.1f}ms (best), '
+        f'{median:.1f}ms (median)')
+
+    if args.max_ms is not None and median > args.max_ms:
+        sys.exit(f'startup took {median:.1f}ms, limit is {args.max_ms}ms')
+
+
+if __name__ == '__main__':
+    main()
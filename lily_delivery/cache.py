@@ -0,0 +1,183 @@
+import hashlib
+import json
+import os
+import re
+import tempfile
+import threading
+
+
+# -- bump it whenever the format of the cached artifacts changes
+CACHE_VERSION = 1
+
+DEFAULT_PATH = os.path.join('~', '.cache', 'lily_delivery', 'artifacts')
+
+DEFAULT_MAX_SIZE = 1024 * 1024 * 1024
+
+BLOCK_SIZE = 1024 * 1024
+
+# -- artifacts are sharded by the first two characters of their keys
+SHARD_PATTERN = re.compile(r'^[0-9a-f]{2}$')
+
+
+class ArtifactCache:
+    """Persistent on-disk cache of transformed and compressed files.
+
+    Artifacts are stored under keys computed with `get_key` from everything
+    which influences their content (source content hash, replacements,
+    version, compression settings, ...). Once the total size of the cache
+    exceeds `max_size` the least recently used artifacts are removed.
+
+    """
+
+    def __init__(self, path=None, max_size=None):
+        self.path = os.path.expanduser(path or DEFAULT_PATH)
+        self.max_size = max_size or DEFAULT_MAX_SIZE
+        self.lock = threading.Lock()
+        self.key_locks = {}
+        self.size = None
+
+        os.makedirs(self.path, exist_ok=True)
+
+    def __getstate__(self):
+        # -- allow passing it to other processes
+        state = self.__dict__.copy()
+        del state['lock']
+        del state['key_locks']
+
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self.lock = threading.Lock()
+        self.key_locks = {}
+
+    @classmethod
+    def from_conf(cls, conf):
+
+        return cls(path=conf.get('path'), max_size=conf.get('max_size'))
+
+    @staticmethod
+    def get_key(*parts):
+
+        return hashlib.sha256(
+            json.dumps([CACHE_VERSION, *parts], sort_keys=True).encode('utf-8')
+        ).hexdigest()
+
+    def get_path(self, key):
+
+        return os.path.join(self.path, key[:2], key)
+
+    def get(self, key):
+        """Return path of the artifact stored under `key` or `None`."""
+
+        path = self.get_path(key)
+        try:
+            # -- mark it as recently used
+            os.utime(path)
+
+        except FileNotFoundError:
+            return None
+
+        return path
+
+    def put(self, key, chunks):
+        """Store artifact built from iterable of bytes `chunks`."""
+
+        path = self.get_path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+
+        fd, temp_path = tempfile.mkstemp(dir=os.path.dirname(path))
+        with os.fdopen(fd, 'wb') as f:
+            for chunk in chunks:
+                f.write(chunk)
+
+        replaced_size = os.path.getsize(path) if os.path.exists(path) else 0
+        os.replace(temp_path, path)
+
+        # -- the artifact is about to be used, it must survive even if it
+        # -- alone exceeds the budget
+        self.evict(os.path.getsize(path) - replaced_size, keep=path)
+
+        return path
+
+    def get_or_put(self, key, build):
+        """Return path of artifact `key` storing `build()` if it's missing.
+
+        Threads sharing the cache build the same artifact only once.
+
+        """
+        with self.lock:
+            key_lock = self.key_locks.setdefault(key, threading.Lock())
+
+        with key_lock:
+            path = self.get(key)
+            if path is None:
+                path = self.put(key, build())
+
+        return path
+
+    def put_file(self, key, source_path):
+
+        with open(source_path, 'rb') as f:
+            return self.put(key, iter(lambda: f.read(BLOCK_SIZE), b''))
+
+    def evict(self, added_size=0, keep=None):
+        """Remove least recently used artifacts if cache grew too big.
+
+        Artifact at `keep` path is never removed.
+
+        """
+
+        with self.lock:
+            if self.size is None:
+                self.size = sum(size for _, size, _ in self.list())
+
+            else:
+                self.size += added_size
+
+            if self.size <= self.max_size:
+                return
+
+            for path, size, _ in sorted(self.list(), key=lambda x: x[2]):
+
+                if self.size <= self.max_size:
+                    break
+
+                if path == keep:
+                    continue
+
+                try:
+                    os.remove(path)
+
+                except FileNotFoundError:
+                    continue
+
+                self.size -= size
+
+    def list(self):
+        """Yield `(path, size, mtime)` of all artifacts.
+
+        Only shard directories are listed so that other files sharing
+        the directory (inventory, journal, ...) are never evicted.
+
+        """
+        for shard in os.listdir(self.path):
+            if not SHARD_PATTERN.match(shard):
+                continue
+
+            subdir = os.path.join(self.path, shard)
+            try:
+                files = os.listdir(subdir)
+
+            except (FileNotFoundError, NotADirectoryError):
+                continue
+
+            for file in files:
+                path = os.path.join(subdir, file)
+                try:
+                    stat = os.stat(path)
+
+                except FileNotFoundError:
+                    continue
+
+                yield path, stat.st_size, stat.st_mtime
@@ -1,10 +1,10 @@
 
-import os
+import json
 
-import yaml
 import click
 
-from .deployers import AngularCLIS3WebsiteDeployer
+from .plan import format_plan
+from .project import ProjectContext
 
 
 @click.group()
@@ -16,16 +16,111 @@ def cli():
 @click.command()
 @click.option('--project')
 @click.option(
-    '--environment', default='integration')
-def deploy_angular_cli_to_s3(project, environment):
+    '--environment',
+    multiple=True,
+    default=['integration'],
+    help='can be repeated to deploy to multiple environments at once')
+@click.option(
+    '--workers',
+    type=int,
+    help='number of parallel uploads (overrides `upload.workers`)')
+@click.option(
+    '--serial-transform',
+    is_flag=True,
+    help='apply replacements in a single process')
+@click.option(
+    '--dry-run',
+    is_flag=True,
+    help='only print the deployment plan, nothing is uploaded')
+@click.option(
+    '--compare-remote',
+    is_flag=True,
+    help='compare the plan with the bucket (read-only requests)')
+@click.option(
+    '--output',
+    type=click.Choice(['table', 'json']),
+    default='table',
+    help='format of the deployment plan')
+def deploy_angular_cli_to_s3(
+        project,
+        environment,
+        workers,
+        serial_transform,
+        dry_run,
+        compare_remote,
+        output):
+
+    # -- imported here since it pulls in boto3, which would slow down the
+    # -- startup of all commands (and `--help`)
+    from .deployers import AngularCLIS3WebsiteDeployer
 
-    with open(os.path.join(os.getcwd(), '.lily_delivery.yaml'), 'r') as f:
-        conf = yaml.load(f.read())
+    context = ProjectContext()
+    conf = context.conf
 
-    AngularCLIS3WebsiteDeployer(
-        environment=environment,
+    if dry_run:
+        plans = AngularCLIS3WebsiteDeployer.plan_environments(
+            environments=list(environment),
+            project=project,
+            conf=conf,
+            remote=compare_remote,
+            serial_transform=serial_transform,
+            context=context)
+
+        if output == 'json':
+            click.echo(json.dumps(plans, indent=2))
+
+        else:
+            click.echo('\n\n'.join(format_plan(plan) for plan in plans))
+
+        return
+
+    AngularCLIS3WebsiteDeployer.deploy_environments(
+        environments=list(environment),
         project=project,
-        conf=conf).deploy()
+        conf=conf,
+        workers=workers,
+        serial_transform=serial_transform,
+        context=context)
+
+
+@click.command()
+@click.option('--project')
+@click.option(
+    '--environment',
+    multiple=True,
+    default=['integration'],
+    help='can be repeated to prune multiple environments')
+@click.option(
+    '--keep',
+    type=int,
+    default=5,
+    help='number of the most recent releases to keep')
+@click.option(
+    '--workers',
+    type=int,
+    help='number of parallel requests (overrides `upload.workers`)')
+@click.option(
+    '--dry-run',
+    is_flag=True,
+    help='only print releases which would be deleted')
+def prune_s3_releases(project, environment, keep, workers, dry_run):
+    """Delete old releases keeping the served one and the most recent."""
+
+    # -- imported here since it pulls in boto3, which would slow down the
+    # -- startup of all commands (and `--help`)
+    from .deployers import AngularCLIS3WebsiteDeployer
+
+    context = ProjectContext()
+    conf = context.conf
+
+    for name in environment:
+        AngularCLIS3WebsiteDeployer(
+            environment=name,
+            project=project,
+            conf=conf,
+            workers=workers,
+            context=context).prune(keep, dry_run=dry_run)
 
 
 cli.add_command(deploy_angular_cli_to_s3)
+cli.add_command(prune_s3_releases)
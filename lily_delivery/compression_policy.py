@@ -0,0 +1,95 @@
+import os
+import zlib
+
+from .content_type import get_content_type
+
+
+# -- formats which are already compressed and would not get any smaller
+INCOMPRESSIBLE_CONTENT_TYPES = set([
+    'application/gzip',
+    'application/pdf',
+    'application/x-bzip2',
+    'application/x-rar-compressed',
+    'application/x-7z-compressed',
+    'application/zip',
+    'font/woff',
+    'font/woff2',
+    'image/gif',
+    'image/jpeg',
+    'image/png',
+    'image/webp',
+])
+
+INCOMPRESSIBLE_CONTENT_TYPE_PREFIXES = ('audio/', 'video/')
+
+
+class CompressionPolicy:
+    """Decide if and how strongly a given file should be gzip compressed.
+
+    Files are not compressed when:
+    - their content type is known to be already compressed,
+    - they are smaller than `min_size` bytes,
+    - (if `sample_size` is set) their first `sample_size` bytes do not
+      compress below `max_ratio` of their original size.
+
+    """
+
+    def __init__(
+            self,
+            level=9,
+            levels=None,
+            min_size=0,
+            sample_size=None,
+            max_ratio=0.9,
+            skip_content_types=None):
+
+        self.level = level
+        self.levels = levels or {}
+        self.min_size = min_size
+        self.sample_size = sample_size
+        self.max_ratio = max_ratio
+        self.skip_content_types = (
+            INCOMPRESSIBLE_CONTENT_TYPES | set(skip_content_types or []))
+
+    @classmethod
+    def from_conf(cls, conf):
+
+        return cls(**{
+            name: conf[name]
+            for name in [
+                'level',
+                'levels',
+                'min_size',
+                'sample_size',
+                'max_ratio',
+                'skip_content_types',
+            ]
+            if name in conf
+        })
+
+    def get_level(self, path):
+        """Return compression level for `path` or `None` if not worth it."""
+
+        content_type = get_content_type(path)
+        if content_type and (
+                content_type in self.skip_content_types or
+                content_type.startswith(INCOMPRESSIBLE_CONTENT_TYPE_PREFIXES)):
+            return None
+
+        if os.path.getsize(path) < self.min_size:
+            return None
+
+        if self.sample_size and not self.is_compressible(path):
+            return None
+
+        return self.levels.get(content_type, self.level)
+
+    def is_compressible(self, path):
+
+        with open(path, 'rb') as f:
+            sample = f.read(self.sample_size)
+
+        if not sample:
+            return False
+
+        return len(zlib.compress(sample, 1)) < self.max_ratio * len(sample)
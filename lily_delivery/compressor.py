@@ -0,0 +1,156 @@
+from contextlib import contextmanager
+import base64
+import gzip
+import hashlib
+import io
+import os
+import time
+
+
+CHUNK_SIZE = 1024 * 1024
+
+
+class FileStream:
+    """Read a file block by block.
+
+    Length and MD5 checksum of the produced output are computed along the
+    way and are available once the stream is consumed.
+
+    """
+
+    encoding = None
+
+    def __init__(self, path, chunk_size=None):
+        self.path = path
+        self.chunk_size = chunk_size or CHUNK_SIZE
+        self.raw_size = 0
+        self.size = 0
+        self.cpu_time = 0.0
+        self.md5 = hashlib.md5()
+
+    def __iter__(self):
+        with open(self.path, 'rb') as f:
+            for chunk in iter(lambda: f.read(self.chunk_size), b''):
+                self.raw_size += len(chunk)
+                yield from self.emit(chunk)
+
+    def emit(self, output):
+        if output:
+            self.size += len(output)
+            self.md5.update(output)
+
+            yield output
+
+    def read(self):
+        """Process the whole file and return its content."""
+
+        return b''.join(self)
+
+    def parts(self, part_size):
+        """Yield output split into parts of at least `part_size`.
+
+        Only the last part can be smaller.
+
+        """
+        part = bytearray()
+        for output in self:
+            part += output
+            if len(part) >= part_size:
+                yield bytes(part)
+                part = bytearray()
+
+        if part:
+            yield bytes(part)
+
+    @property
+    def content_md5(self):
+        """Base64 encoded MD5 as expected by the `Content-MD5` header."""
+
+        return base64.b64encode(self.md5.digest()).decode('ascii')
+
+
+class GzipStream(FileStream):
+    """Gzip compress a file block by block.
+
+    The compressed output is yielded as soon as it is produced, so memory
+    usage depends only on the `chunk_size`. CPU time spent on compression
+    is collected in `cpu_time`.
+
+    The gzip header carries no modification time therefore compressing the
+    same content always gives the same output.
+
+    """
+
+    encoding = 'gzip'
+
+    def __init__(self, path, chunk_size=None, level=9):
+        super().__init__(path, chunk_size)
+        self.level = level
+
+    def __iter__(self):
+        buffer = io.BytesIO()
+        compressor = gzip.GzipFile(
+            fileobj=buffer,
+            mode='wb',
+            compresslevel=self.level,
+            mtime=0)
+
+        with open(self.path, 'rb') as f:
+            for chunk in iter(lambda: f.read(self.chunk_size), b''):
+                self.raw_size += len(chunk)
+                with self.measure_cpu_time():
+                    compressor.write(chunk)
+
+                yield from self.emit(self.drain(buffer))
+
+        with self.measure_cpu_time():
+            compressor.close()
+
+        yield from self.emit(self.drain(buffer))
+
+    @contextmanager
+    def measure_cpu_time(self):
+        started_at = time.thread_time()
+        yield
+        self.cpu_time += time.thread_time() - started_at
+
+    def drain(self, buffer):
+        compressed = buffer.getvalue()
+        buffer.seek(0)
+        buffer.truncate()
+
+        return compressed
+
+
+class CachedGzipStream(GzipStream):
+    """Read gzip compressed content of `source_path` cached at `path`.
+
+    If the cached artifact got evicted before it was opened `source_path`
+    is compressed again with `level`, which yields the same content.
+
+    """
+
+    def __init__(self, path, source_path, chunk_size=None, level=9):
+        super().__init__(path, chunk_size, level)
+        self.source_path = source_path
+
+    def __iter__(self):
+        try:
+            f = open(self.path, 'rb')
+
+        except FileNotFoundError:
+            self.path = self.source_path
+            yield from super().__iter__()
+
+            return
+
+        with f:
+            for chunk in iter(lambda: f.read(self.chunk_size), b''):
+                yield from self.emit(chunk)
+
+        self.raw_size = os.path.getsize(self.source_path)
+
+
+def get_content_md5(content):
+
+    return base64.b64encode(hashlib.md5(content).digest()).decode('ascii')
@@ -1,3 +1,5 @@
 
 from .s3 import S3  # noqa
-from .cloudfront import Cloudfront  # noqa
+from .cloudfront import Cloudfront, PropagationTracker  # noqa
+from .inventory import Inventory  # noqa
+from .clients import get_client  # noqa
@@ -0,0 +1,58 @@
+import threading
+
+import boto3
+from botocore.config import Config
+
+
+lock = threading.Lock()
+
+sessions = {}
+
+clients = {}
+
+
+def get_client(
+        service_name,
+        access_key_id,
+        secret_access_key,
+        region_name,
+        config=None,
+        endpoint_url=None):
+    """Return `boto3` client shared within the process.
+
+    One session is created per set of credentials and one client per
+    service and configuration, so that several dependencies (and several
+    deployers) reuse the same connection pool.
+
+    `config` allows one to tune the client:
+    - `max_pool_connections` - size of the connection pool (should not be
+      lower than the number of parallel uploads),
+    - `tcp_keepalive` - if keep-alive should be enabled on the sockets,
+    - `retries` - for example `{mode: adaptive, max_attempts: 10}`.
+
+    `endpoint_url` points the client to an S3 compatible service other
+    than AWS.
+
+    """
+    config = config or {}
+    credentials = (access_key_id, secret_access_key, region_name)
+    client_key = (
+        service_name,
+        credentials,
+        repr(sorted(config.items())),
+        endpoint_url)
+
+    with lock:
+        if client_key not in clients:
+            if credentials not in sessions:
+                sessions[credentials] = boto3.session.Session(
+                    aws_access_key_id=access_key_id,
+                    aws_secret_access_key=secret_access_key,
+                    region_name=region_name)
+
+            clients[client_key] = sessions[credentials].client(
+                service_name,
+                config=Config(**config),
+                endpoint_url=endpoint_url)
+
+        return clients[client_key]
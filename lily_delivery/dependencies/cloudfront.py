@@ -1,10 +1,73 @@
 
-from time import time
+from collections import Counter
+from time import monotonic, sleep, time
+import threading
 
-import boto3
 from botocore.exceptions import ClientError, EndpointConnectionError
 import click
 
+from .clients import get_client
+
+
+# -- CloudFront allows up to 3000 paths and 15 wildcard paths in progress
+# -- at once, while each path above 1000 per month is paid for
+MAX_INVALIDATION_PATHS = 100
+
+MAX_INVALIDATION_WILDCARDS = 15
+
+
+def get_invalidation_paths(
+        paths,
+        max_paths=MAX_INVALIDATION_PATHS,
+        max_wildcards=MAX_INVALIDATION_WILDCARDS):
+    """Merge `paths` into wildcard prefixes until they fit the limits.
+
+    Paths sharing the same directory are replaced with `<directory>/*`
+    starting with the deepest directories (the ones covering most paths on
+    ties), so that as little as possible is invalidated. If limits still
+    cannot be met everything is invalidated with `/*`.
+
+    """
+    paths = set(paths)
+    while len(paths) > max_paths:
+        parents = [
+            (parent, count)
+            for parent, count in Counter(
+                get_parent(path) for path in paths if path != '/').items()
+            if count > 1
+        ]
+        if not parents:
+            break
+
+        parent, _ = max(
+            parents, key=lambda x: (x[0].count('/'), x[1], x[0]))
+
+        wildcard = f'{parent}*'
+        paths = set(
+            path for path in paths
+            if not (path.startswith(parent) and path != parent))
+        paths.add(wildcard)
+
+    wildcards = [path for path in paths if path.endswith('*')]
+    if (
+            len(paths) > max_paths or
+            len(wildcards) > max_wildcards or
+            '/*' in paths):
+        return ['/*']
+
+    return sorted(paths)
+
+
+def get_parent(path):
+    """Return parent directory (with trailing slash) of `path`.
+
+    For wildcard `/a/b/*` it's `/a/`.
+
+    """
+    path = path[:-2] if path.endswith('/*') else path
+
+    return path[:path.rstrip('/').rfind('/') + 1]
+
 
 class Cloudfront:
 
@@ -13,13 +76,15 @@ class Cloudfront:
             access_key_id,
             secret_access_key,
             region_name,
-            distribution_id):
+            distribution_id,
+            client_config=None):
 
-        self.client = boto3.client(
+        self.client = get_client(
             'cloudfront',
-            aws_access_key_id=access_key_id,
-            aws_secret_access_key=secret_access_key,
-            region_name=region_name)
+            access_key_id,
+            secret_access_key,
+            region_name,
+            client_config)
         self.distribution_id = distribution_id
 
     def is_valid(self):
@@ -47,39 +112,126 @@ class Cloudfront:
                 'could not connect to the distribution specified')
 
     def update_frontend_routing(self, index_html_key):
+        """Route all unknown paths to `index_html_key`.
 
+        Returns `None` without updating the distribution if it's already
+        routing to `index_html_key`, since each update triggers a lengthy
+        rollout.
+
+        """
         response = self.client.get_distribution(
             Id=self.distribution_id)
 
         etag = response['ETag']
         current_config = response['Distribution']['DistributionConfig']
+        custom_error_responses = {
+            'Quantity': 1,
+            'Items': [
+                {
+                    'ErrorCode': 404,
+                    'ResponsePagePath': f'/{index_html_key}',
+                    'ResponseCode': '200',
+                    'ErrorCachingMinTTL': 300
+                },
+            ]
+        }
+
+        if current_config.get(
+                'CustomErrorResponses') == custom_error_responses:
+            return None
 
         return self.client.update_distribution(
             Id=self.distribution_id,
             IfMatch=etag,
             DistributionConfig={
                 **current_config,
-                'CustomErrorResponses': {
-                    'Quantity': 1,
-                    'Items': [
-                        {
-                            'ErrorCode': 404,
-                            'ResponsePagePath': f'/{index_html_key}',
-                            'ResponseCode': '200',
-                            'ErrorCachingMinTTL': 300
-                        },
-                    ]
-                },
+                'CustomErrorResponses': custom_error_responses,
             })
 
-    def invalidate_cache(self):
+    def is_deployed(self):
+        response = self.client.get_distribution(Id=self.distribution_id)
+
+        return response['Distribution']['Status'] == 'Deployed'
 
-        self.client.create_invalidation(
+    def is_invalidated(self, invalidation_id):
+        response = self.client.get_invalidation(
+            DistributionId=self.distribution_id,
+            Id=invalidation_id)
+
+        return response['Invalidation']['Status'] == 'Completed'
+
+    def invalidate_cache(self, paths=None):
+        """Invalidate `paths` or everything (`/*`) if not provided."""
+
+        paths = paths or ['/*']
+
+        response = self.client.create_invalidation(
             DistributionId=self.distribution_id,
             InvalidationBatch={
                 'Paths': {
-                    'Quantity': 1,
-                    'Items': ['/*'],
+                    'Quantity': len(paths),
+                    'Items': paths,
                 },
                 'CallerReference': str(time())
             })
+
+        return response['Invalidation']['Id']
+
+
+class PropagationTracker:
+    """Track CloudFront rollouts in the background.
+
+    Each tracked check is polled in its own thread with exponential backoff
+    until it passes (or `timeout` is reached), so the deployment can carry
+    on in the meantime. `wait` blocks until all checks are done and reports
+    how long each of them took to propagate.
+
+    """
+
+    def __init__(self, initial_delay=5, max_delay=60, timeout=1800):
+        self.initial_delay = initial_delay
+        self.max_delay = max_delay
+        self.timeout = timeout
+        self.threads = []
+        self.durations = {}
+
+    def track(self, name, check):
+
+        thread = threading.Thread(
+            target=self.poll, args=(name, check), daemon=True)
+        thread.start()
+        self.threads.append(thread)
+
+    def poll(self, name, check):
+
+        started_at = monotonic()
+        delay = self.initial_delay
+        while monotonic() - started_at < self.timeout:
+            try:
+                if check():
+                    self.durations[name] = monotonic() - started_at
+                    return
+
+            except (ClientError, EndpointConnectionError):
+                pass
+
+            sleep(delay)
+            delay = min(delay * 2, self.max_delay)
+
+        self.durations[name] = None
+
+    def wait(self):
+
+        for thread in self.threads:
+            thread.join()
+
+        for name, duration in sorted(self.durations.items()):
+            if duration is None:
+                text = f'{name}: not propagated in {self.timeout}s'
+
+            else:
+                text = f'{name}: propagated in {duration:.1f}s'
+
+            click.secho(text, fg='white')
+
+        return self.durations
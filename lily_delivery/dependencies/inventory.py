@@ -0,0 +1,124 @@
+import json
+import os
+import tempfile
+import threading
+import time
+
+
+DEFAULT_PATH = os.path.join('~', '.cache', 'lily_delivery', 'inventory')
+
+# -- after that long the inventory is rebuilt from a full listing
+DEFAULT_MAX_AGE = 24 * 60 * 60
+
+
+class Inventory:
+    """Persistent local index of objects stored in a bucket.
+
+    For each key its ETag and size are kept, so that existence checks and
+    delta decisions do not require any requests. Top level prefixes (like
+    `1.0.0/`) are tracked separately which allows one to refresh it
+    incrementally by listing only prefixes which appeared since the last
+    refresh (see `S3.refresh_inventory`).
+
+    """
+
+    def __init__(self, bucket_name, path=None, max_age=None):
+        self.bucket_name = bucket_name
+        self.path = os.path.join(
+            os.path.expanduser(path or DEFAULT_PATH), f'{bucket_name}.json')
+        self.max_age = DEFAULT_MAX_AGE if max_age is None else max_age
+        self.lock = threading.Lock()
+        self.reset()
+
+    @classmethod
+    def from_conf(cls, bucket_name, conf):
+
+        return cls(
+            bucket_name, path=conf.get('path'), max_age=conf.get('max_age'))
+
+    def reset(self):
+        self.objects = {}
+        self.prefixes = set()
+        self.refreshed_at = None
+
+    def load(self):
+        """Load inventory from disk and return `False` if not present."""
+
+        try:
+            with open(self.path, 'r') as f:
+                data = json.loads(f.read())
+
+        except (OSError, ValueError):
+            return False
+
+        self.objects = {
+            key: {'etag': etag, 'size': size}
+            for key, (etag, size) in data['objects'].items()
+        }
+        self.prefixes = set(data['prefixes'])
+        self.refreshed_at = data['refreshed_at']
+
+        return True
+
+    def save(self):
+
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        with self.lock:
+            data = json.dumps({
+                'refreshed_at': self.refreshed_at,
+                'prefixes': sorted(self.prefixes),
+                'objects': {
+                    key: [obj['etag'], obj['size']]
+                    for key, obj in self.objects.items()
+                },
+            })
+
+        fd, temp_path = tempfile.mkstemp(dir=os.path.dirname(self.path))
+        with os.fdopen(fd, 'w') as f:
+            f.write(data)
+
+        os.replace(temp_path, self.path)
+
+    @property
+    def is_loaded(self):
+        return self.refreshed_at is not None
+
+    def is_stale(self):
+        return (
+            not self.is_loaded or
+            time.time() - self.refreshed_at > self.max_age)
+
+    def mark_refreshed(self):
+        self.refreshed_at = time.time()
+
+    def __contains__(self, key):
+        return key in self.objects
+
+    def get(self, key):
+        return self.objects.get(key)
+
+    def add(self, key, etag, size):
+
+        with self.lock:
+            self.objects[key] = {'etag': etag, 'size': size}
+            if '/' in key:
+                self.prefixes.add(key[:key.index('/') + 1])
+
+    def remove(self, keys):
+
+        with self.lock:
+            for key in keys:
+                self.objects.pop(key, None)
+
+    def remove_prefix(self, prefix):
+
+        with self.lock:
+            self.prefixes.discard(prefix)
+            self.objects = {
+                key: obj
+                for key, obj in self.objects.items()
+                if not key.startswith(prefix)
+            }
+
+    def keys(self, prefix=''):
+        return [key for key in self.objects if key.startswith(prefix)]
@@ -1,13 +1,131 @@
 
-import gzip
+from concurrent.futures import ThreadPoolExecutor
+import json
 import os
+import re
+import threading
+import time
 
-import boto3
-from botocore.exceptions import ClientError, EndpointConnectionError
+from botocore.exceptions import (
+    BotoCoreError,
+    ClientError,
+    ConnectionError as BotoConnectionError,
+    EndpointConnectionError,
+    HTTPClientError,
+)
 import click
 
+from ..compression_policy import CompressionPolicy
+from ..compressor import (
+    CachedGzipStream,
+    FileStream,
+    GzipStream,
+    get_content_md5,
+)
 from ..content_type import get_content_type
 from ..describer import Describer
+from ..manifest import get_file_hash
+from ..metadata_policy import MetadataPolicy
+from .clients import get_client
+
+
+MB = 1024 * 1024
+
+# -- S3 rejects multipart uploads with parts (other than the last one)
+# -- smaller than 5MB
+MIN_PART_SIZE = 5 * MB
+
+# -- maximum number of keys deleted by a single `delete_objects` call
+MAX_DELETE_KEYS = 1000
+
+# -- only prefixes and root keys looking like releases (at least
+# -- `MAJOR.MINOR`, so that `404/` or `2024/` are not) are ever pruned
+VERSION_PATTERN = re.compile(
+    r'^v?(?P<release>\d+(\.\d+)+)'
+    r'(-(?P<prerelease>[0-9A-Za-z.-]+))?(\+[0-9A-Za-z.-]+)?$')
+
+RELEASE_KEY_PATTERN = re.compile(
+    r'^(index-(?P<index>.+)\.html|manifest-(?P<manifest>.+)\.json)$')
+
+# -- error codes AWS returns for requests worth repeating (other client
+# -- errors like `AccessDenied` or `NoSuchBucket` would fail again)
+TRANSIENT_ERROR_CODES = {
+    'InternalError',
+    'RequestLimitExceeded',
+    'RequestTimeout',
+    'RequestTimeoutException',
+    'ServiceUnavailable',
+    'SlowDown',
+    'Throttling',
+    'ThrottlingException',
+    'TooManyRequestsException',
+}
+
+
+class UploadStats:
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.files_count = 0
+        self.compressed_count = 0
+        self.raw_size = 0
+        self.size = 0
+        self.cpu_time = 0.0
+        self.retries = 0
+        self.copied_count = 0
+        self.copied_size = 0
+
+    def add(self, stream):
+        with self.lock:
+            self.files_count += 1
+            self.compressed_count += int(stream.encoding is not None)
+            self.raw_size += stream.raw_size
+            self.size += stream.size
+            self.cpu_time += stream.cpu_time
+
+    def add_copy(self, size):
+        with self.lock:
+            self.copied_count += 1
+            self.copied_size += size
+
+    def add_retries(self, count):
+        with self.lock:
+            self.retries += count
+
+    @property
+    def saved_size(self):
+        return self.raw_size - self.size
+
+    @property
+    def compression_ratio(self):
+        if not self.raw_size:
+            return None
+
+        return self.size / self.raw_size
+
+    def as_dict(self):
+        return {
+            'files_count': self.files_count,
+            'compressed_count': self.compressed_count,
+            'raw_size': self.raw_size,
+            'size': self.size,
+            'saved_size': self.saved_size,
+            'compression_ratio': self.compression_ratio,
+            'cpu_time': self.cpu_time,
+            'retries': self.retries,
+            'copied_count': self.copied_count,
+            'copied_size': self.copied_size,
+        }
+
+    def summary(self):
+        return (
+            f'uploaded {self.files_count} file(s) '
+            f'({self.compressed_count} compressed): '
+            f'{self.raw_size} -> {self.size} bytes, '
+            f'saved {self.saved_size} bytes, '
+            f'compression CPU time {self.cpu_time:.2f}s, '
+            f'copied {self.copied_count} file(s) '
+            f'({self.copied_size} bytes) on the server side')
 
 
 class S3(Describer):
@@ -17,14 +135,54 @@ class S3(Describer):
             access_key_id,
             secret_access_key,
             region_name,
-            bucket_name):
+            bucket_name,
+            multipart_threshold=16 * MB,
+            multipart_chunksize=8 * MB,
+            multipart_concurrency=4,
+            retries=3,
+            retry_delay=0.5,
+            compression_policy=None,
+            metadata_policy=None,
+            cache=None,
+            inventory=None,
+            client_config=None,
+            endpoint_url=None):
+
+        client_config = client_config or {}
+        self.client = get_client(
+            's3',
+            access_key_id,
+            secret_access_key,
+            region_name,
+            client_config,
+            endpoint_url)
 
-        self.client = boto3.client(
+        # -- uploads are retried (request by request) by `with_retries`
+        # -- only, botocore retrying them as well would multiply attempts
+        self.upload_client = get_client(
             's3',
-            aws_access_key_id=access_key_id,
-            aws_secret_access_key=secret_access_key,
-            region_name=region_name)
+            access_key_id,
+            secret_access_key,
+            region_name,
+            {
+                **client_config,
+                'retries': {
+                    **client_config.get('retries', {}),
+                    'total_max_attempts': 1,
+                },
+            },
+            endpoint_url)
         self.bucket_name = bucket_name
+        self.multipart_threshold = multipart_threshold
+        self.multipart_chunksize = multipart_chunksize
+        self.multipart_concurrency = multipart_concurrency
+        self.retries = retries
+        self.retry_delay = retry_delay
+        self.compression_policy = compression_policy or CompressionPolicy()
+        self.metadata_policy = metadata_policy or MetadataPolicy()
+        self.cache = cache
+        self.inventory = inventory
+        self.stats = UploadStats()
 
     def is_valid(self):
         """Validate if connection credentials are correct.
@@ -52,8 +210,12 @@ class S3(Describer):
                 'could not connect to the bucket specified')
 
     def check_if_key_exists(self, key):
+        if self.inventory and self.inventory.is_loaded:
+            return key in self.inventory
+
         try:
-            response = self.client.get_object(
+            # -- HEAD does not start downloading the body of the object
+            response = self.client.head_object(
                 Key=key,
                 Bucket=self.bucket_name)
 
@@ -71,24 +233,619 @@ class S3(Describer):
             raise click.ClickException(
                 'could not connect to bucket specified')
 
-    def upload_dir(self, path, meta):
+    def list_root(self):
+        """List objects and prefixes (like `1.0.0/`) of the bucket's root.
+
+        Thanks to the delimiter objects stored under prefixes are not listed
+        one by one, therefore a single request is usually enough.
+
+        """
+        objects, prefixes = {}, set()
+        for page in self.paginate(Delimiter='/'):
+            objects.update(self.get_page_objects(page))
+            prefixes.update(
+                item['Prefix'] for item in page.get('CommonPrefixes', []))
+
+        return objects, prefixes
+
+    def list_objects(self, prefix=''):
+        """List all objects (with ETag and size) stored under `prefix`."""
+
+        objects = {}
+        for page in self.paginate(Prefix=prefix):
+            objects.update(self.get_page_objects(page))
+
+        return objects
+
+    def paginate(self, **kwargs):
+        try:
+            paginator = self.client.get_paginator('list_objects_v2')
+            yield from paginator.paginate(Bucket=self.bucket_name, **kwargs)
+
+        except ClientError:
+            raise click.ClickException(
+                'faced problems when connecting to AWS S3')
+
+        except EndpointConnectionError:
+            raise click.ClickException(
+                'could not connect to bucket specified')
+
+    def get_page_objects(self, page):
+        return {
+            item['Key']: {'etag': item['ETag'], 'size': item['Size']}
+            for item in page.get('Contents', [])
+        }
+
+    def list_releases(self):
+        """Return `{version: root_keys}` of all releases in the bucket.
 
-        for subdir, dirs, files in os.walk(path):
-            for file in files:
-                filepath = os.path.join(subdir, file)
+        Releases are recognized by their `<version>/` prefix, index and
+        manifest, the latter two are listed as its root keys.
 
-                with open(filepath, 'rb') as f:
+        """
+        objects, prefixes = self.list_root()
+
+        releases = {}
+        for prefix in prefixes:
+            if VERSION_PATTERN.match(prefix[:-1]):
+                releases.setdefault(prefix[:-1], [])
+
+        for key in objects:
+            match = RELEASE_KEY_PATTERN.match(key)
+            if match:
+                version = match.group('index') or match.group('manifest')
+                if VERSION_PATTERN.match(version):
+                    releases.setdefault(version, []).append(key)
+
+        return releases
 
-                    key = filepath[len(path) + 1:]
-                    with self.text(f'uploading: {key}'):
-                        self.client.put_object(
-                            ACL='public-read',
-                            Key=key,
-                            Bucket=self.bucket_name,
-                            Body=gzip.compress(f.read()),
-                            ContentType=get_content_type(filepath),
-                            CacheControl=meta['cache-control'],
-                            ContentEncoding='gzip')
+    def delete_keys(self, keys, workers=1):
+        """Delete `keys` in batches of `MAX_DELETE_KEYS` run concurrently."""
+
+        keys = list(keys)
+        batches = [
+            keys[i:i + MAX_DELETE_KEYS]
+            for i in range(0, len(keys), MAX_DELETE_KEYS)
+        ]
+        with ThreadPoolExecutor(max_workers=max(workers, 1)) as executor:
+            errors = [
+                error
+                for batch_errors in executor.map(self.delete_batch, batches)
+                for error in batch_errors
+            ]
+
+        if errors:
+            for error in errors:
+                click.secho(
+                    f'failed: {error["Key"]} ({error["Message"]})', fg='red')
+
+            raise click.ClickException(
+                f'failed to delete {len(errors)} file(s)')
+
+    def delete_batch(self, keys):
+
+        try:
+            response = self.client.delete_objects(
+                Bucket=self.bucket_name,
+                Delete={
+                    'Objects': [{'Key': key} for key in keys],
+                    'Quiet': True,
+                })
+
+        except ClientError:
+            raise click.ClickException(
+                'faced problems when connecting to AWS S3')
+
+        except EndpointConnectionError:
+            raise click.ClickException(
+                'could not connect to bucket specified')
+
+        errors = response.get('Errors', [])
+        if self.inventory:
+            failed = set(error['Key'] for error in errors)
+            self.inventory.remove([key for key in keys if key not in failed])
+
+        return errors
+
+    def check_if_release_exists(self, index_html_key, prefix):
+        """Check if either the index or any key under `prefix` exists."""
+
+        if self.inventory and self.inventory.is_loaded:
+            keys, prefixes = self.inventory, self.inventory.prefixes
+
+        else:
+            keys, prefixes = self.list_root()
+
+        return index_html_key in keys or f'{prefix}/' in prefixes
+
+    def refresh_inventory(self):
+        """Bring local inventory of the bucket up to date.
+
+        If the inventory is missing or stale all objects are listed.
+        Otherwise only the root of the bucket is listed and prefixes which
+        appeared since the last refresh are listed in full.
+
+        """
+        inventory = self.inventory
+        if inventory is None:
+            return
+
+        if not inventory.load() or inventory.is_stale():
+            with self.text('inventory: full listing'):
+                inventory.reset()
+                for key, obj in self.list_objects().items():
+                    inventory.add(key, obj['etag'], obj['size'])
+
+        else:
+            objects, prefixes = self.list_root()
+            for prefix in inventory.prefixes - prefixes:
+                inventory.remove_prefix(prefix)
+
+            for key, obj in objects.items():
+                inventory.add(key, obj['etag'], obj['size'])
+
+            for prefix in sorted(prefixes - inventory.prefixes):
+                with self.text(f'inventory: listing {prefix}'):
+                    for key, obj in self.list_objects(prefix).items():
+                        inventory.add(key, obj['etag'], obj['size'])
+
+            for key in [k for k in inventory.keys() if '/' not in k]:
+                if key not in objects:
+                    inventory.objects.pop(key)
+
+        inventory.mark_refreshed()
+        inventory.save()
+
+    def save_inventory(self):
+        if self.inventory and self.inventory.is_loaded:
+            self.inventory.save()
+
+    def get_manifest(self, key):
+        """Fetch content-hash manifest stored under `key`.
+
+        Returns `None` if no manifest was stored so far.
+
+        """
+        try:
+            response = self.client.get_object(
+                Key=key,
+                Bucket=self.bucket_name)
+
+            return json.loads(response['Body'].read().decode('utf-8'))
+
+        except ClientError as e:
+            if e.response['ResponseMetadata']['HTTPStatusCode'] == 404:
+                return None
+
+            else:
+                raise click.ClickException(
+                    'faced problems when connecting to AWS S3')
+
+        except EndpointConnectionError:
+            raise click.ClickException(
+                'could not connect to bucket specified')
+
+    def put_manifest(self, key, manifest):
+
+        body = json.dumps(manifest, sort_keys=True).encode('utf-8')
+        response = self.client.put_object(
+            Key=key,
+            Bucket=self.bucket_name,
+            Body=body,
+            ContentType='application/json')
+
+        if self.inventory:
+            self.inventory.add(key, response['ETag'], len(body))
+
+    def upload_dir(self, path, meta, **kwargs):
+        """Upload all files found in `path` to the bucket.
+
+        Keys are paths of the files relative to `path`. See `upload` for
+        the remaining arguments.
+
+        """
+        files = []
+        for subdir, dirs, names in os.walk(path):
+            for name in names:
+                filepath = os.path.join(subdir, name)
+                files.append((filepath[len(path) + 1:], filepath))
+
+        return self.upload(files, meta, **kwargs)
+
+    def upload(
+            self,
+            files,
+            meta,
+            workers=1,
+            deferred_keys=None,
+            manifest=None,
+            sources=None,
+            journal=None):
+        """Upload `(key, filepath)` pairs to the bucket.
+
+        Files are uploaded by a pool of `workers` threads. Keys listed in
+        `deferred_keys` (for example the versioned `index.html`) are uploaded
+        only once all other files were uploaded successfully. Failures are
+        collected and reported together at the end.
+
+        Files which content hash matches the one found in `manifest` (a
+        manifest of the previous upload of the same keys) are skipped.
+        Returns the manifest of the uploaded files.
+
+        `sources` maps keys to `(source_key, content_hash)` of objects
+        already present in the bucket (for example the same files of the
+        previous release). Files matching their source are copied on the
+        server side instead of being uploaded.
+
+        Each file is retried independently. Files successfully processed
+        are recorded in `journal` (if given) and files already recorded
+        there by an interrupted upload are skipped.
+
+        """
+        deferred_keys = set(deferred_keys or [])
+        uploads, deferred = [], []
+        for key, filepath in files:
+            if key in deferred_keys:
+                deferred.append((key, filepath))
+
+            else:
+                uploads.append((key, filepath))
+
+        if journal:
+            manifest = {**(manifest or {}), **journal.entries}
+
+        self.stats = UploadStats()
+        uploaded_manifest = {}
+        failures = self.upload_files(
+            uploads,
+            meta,
+            workers,
+            manifest,
+            uploaded_manifest,
+            sources,
+            journal)
+        if not failures:
+            failures = self.upload_files(
+                deferred,
+                meta,
+                workers,
+                manifest,
+                uploaded_manifest,
+                sources,
+                journal)
+
+        if failures:
+            for key, error in failures:
+                click.secho(f'failed: {key} ({error})', fg='red')
+
+            raise click.ClickException(
+                f'failed to upload {len(failures)} file(s)')
+
+        click.secho(self.stats.summary(), fg='white')
+
+        return uploaded_manifest
+
+    def upload_files(
+            self,
+            files,
+            meta,
+            workers=1,
+            manifest=None,
+            uploaded_manifest=None,
+            sources=None,
+            journal=None):
+        """Upload `(key, filepath)` pairs and return the failed ones.
+
+        Hashes of all successfully processed files are stored in
+        `uploaded_manifest` and recorded in `journal`.
+
+        """
+        manifest = manifest or {}
+        sources = sources or {}
+        if uploaded_manifest is None:
+            uploaded_manifest = {}
+
+        failures = []
+        with ThreadPoolExecutor(max_workers=max(workers, 1)) as executor:
+            futures = [
+                (
+                    key,
+                    executor.submit(
+                        self.upload_file_if_changed,
+                        key,
+                        filepath,
+                        meta,
+                        manifest.get(key),
+                        sources.get(key)),
+                )
+                for key, filepath in files]
+
+            for key, future in futures:
+                try:
+                    uploaded_manifest[key] = future.result()
+                    if journal:
+                        journal.record(key, uploaded_manifest[key])
+
+                except (ClientError, BotoCoreError, OSError) as e:
+                    failures.append((key, e))
+
+        return failures
+
+    def upload_file_if_changed(
+            self, key, filepath, meta, content_hash=None, source=None):
+
+        current_hash = get_file_hash(filepath)
+        if current_hash == content_hash:
+            with self.text(f'unchanged: {key}'):
+                return current_hash
+
+        if source and source[1] == current_hash:
+            if self.with_retries(
+                    self.copy_file, source[0], key, filepath, meta):
+                return current_hash
+
+        self.upload_file(key, filepath, meta)
+
+        return current_hash
+
+    def with_retries(self, fn, *args):
+        """Call `fn` retrying it with exponential backoff on transient errors.
+
+        Server errors, throttling, connection errors and timeouts are
+        retried, errors of the request itself (`AccessDenied`, invalid
+        parameters...) are raised at once.
+
+        """
+        attempt = 0
+        while True:
+            try:
+                return fn(*args)
+
+            except (ClientError, BotoCoreError) as e:
+                if not is_transient_error(e) or attempt >= self.retries:
+                    raise
+
+                time.sleep(self.retry_delay * 2 ** attempt)
+                attempt += 1
+                self.stats.add_retries(1)
+
+    def copy_file(self, source_key, key, filepath, meta):
+        """Create `key` as a server side copy of `source_key`.
+
+        `source_key` must hold the same content as `filepath`. The copy is
+        done only if the source object is encoded the same way `filepath`
+        would be, otherwise `False` is returned and nothing happens.
+
+        """
+        try:
+            head = self.upload_client.head_object(
+                Bucket=self.bucket_name, Key=source_key)
+
+        except ClientError as e:
+            if e.response['ResponseMetadata']['HTTPStatusCode'] == 404:
+                return False
+
+            raise
+
+        encoding = (
+            'gzip'
+            if self.get_compression_level(key, filepath) is not None
+            else None)
+        if head.get('ContentEncoding') != encoding:
+            return False
+
+        with self.text(f'copying: {source_key} -> {key}'):
+            response = self.upload_client.copy_object(
+                ACL='public-read',
+                Key=key,
+                Bucket=self.bucket_name,
+                CopySource={'Bucket': self.bucket_name, 'Key': source_key},
+                MetadataDirective='REPLACE',
+                **self.get_upload_params(key, filepath, encoding, meta))
+
+        self.stats.add_retries(get_retry_attempts(response))
+        if self.inventory:
+            self.inventory.add(
+                key,
+                response['CopyObjectResult']['ETag'],
+                head['ContentLength'])
+
+        self.stats.add_copy(head['ContentLength'])
+
+        return True
+
+    def upload_file(self, key, filepath, meta):
+
+        stream = self.open_stream(key, filepath)
+        params = self.get_upload_params(key, filepath, stream.encoding, meta)
+        if os.path.getsize(filepath) >= self.multipart_threshold:
+            response = self.upload_file_multipart(key, stream, params)
+
+        else:
+            with self.text(f'uploading: {key}'):
+                body = stream.read()
+                response = self.with_retries(
+                    lambda: self.upload_client.put_object(
+                        ACL='public-read',
+                        Key=key,
+                        Bucket=self.bucket_name,
+                        Body=body,
+                        ContentMD5=stream.content_md5,
+                        **params))
+
+        self.stats.add_retries(get_retry_attempts(response))
+        if self.inventory:
+            self.inventory.add(key, response['ETag'], stream.size)
+
+        self.stats.add(stream)
+
+    def get_upload_params(self, key, filepath, encoding, meta):
+        """Return headers of `key`, rules of `metadata_policy` win."""
+
+        metadata = self.metadata_policy.get_metadata(key)
+        params = {
+            'ContentType': metadata.get(
+                'content-type', get_content_type(filepath)),
+            'CacheControl': metadata.get(
+                'cache-control', meta['cache-control']),
+        }
+        if encoding:
+            params['ContentEncoding'] = encoding
+
+        return params
+
+    def describe_upload(self, key, filepath, meta):
+        """Describe how `filepath` would be uploaded without uploading it.
+
+        The file is processed exactly as by `upload_file` (including
+        compression) in order to get its final size.
+
+        """
+        stream = self.open_stream(key, filepath)
+        for _ in stream:
+            pass
+
+        return {
+            'key': key,
+            'path': filepath,
+            'raw_size': stream.raw_size,
+            'size': stream.size,
+            'multipart': stream.raw_size >= self.multipart_threshold,
+            'headers': self.get_upload_params(
+                key, filepath, stream.encoding, meta),
+        }
+
+    def open_stream(self, key, filepath):
+        """Open `filepath` for upload compressing it if worth it.
+
+        If cache is enabled compressed content is served from it (and
+        stored in it if missing).
+
+        """
+        level = self.get_compression_level(key, filepath)
+        if level is None:
+            return FileStream(filepath)
+
+        if self.cache is None:
+            return GzipStream(filepath, level=level)
+
+        built = []
+
+        def build():
+            built.append(GzipStream(filepath, level=level))
+            return built[-1]
+
+        key = self.cache.get_key('gzip', get_file_hash(filepath), level)
+        path = self.cache.get_or_put(key, build)
+
+        # -- on a miss the compression happened while filling the cache,
+        # -- it's reported by the stream uploaded in place of the built one
+        stream = CachedGzipStream(path, filepath, level=level)
+        stream.cpu_time = sum(b.cpu_time for b in built)
+
+        return stream
+
+    def get_compression_level(self, key, filepath):
+        """Return gzip level of `key` or `None` if it's not compressed.
+
+        `compress` set by `metadata_policy` (`false`, `true` or a level)
+        overrides `compression_policy`.
+
+        """
+        compress = self.metadata_policy.get_metadata(key).get('compress')
+        if compress is None:
+            return self.compression_policy.get_level(filepath)
+
+        if compress is True:
+            return self.compression_policy.level
+
+        return compress or None
+
+    def upload_file_multipart(self, key, stream, params):
+        """Upload `stream` to the bucket in multiple parts.
+
+        Parts are uploaded concurrently (and retried independently) while
+        the stream is being read. At most `multipart_concurrency` parts
+        are kept in memory at once.
+
+        """
+        with self.text(f'uploading (multipart): {key}'):
+            upload_id = self.with_retries(
+                lambda: self.upload_client.create_multipart_upload(
+                    ACL='public-read',
+                    Key=key,
+                    Bucket=self.bucket_name,
+                    **params))['UploadId']
+
+            try:
+                slots = threading.BoundedSemaphore(self.multipart_concurrency)
+                futures = []
+                with ThreadPoolExecutor(
+                        max_workers=self.multipart_concurrency) as executor:
+
+                    part_size = max(self.multipart_chunksize, MIN_PART_SIZE)
+                    parts = stream.parts(part_size)
+                    for number, body in enumerate(parts, 1):
+                        slots.acquire()
+                        future = executor.submit(
+                            self.upload_part, key, upload_id, number, body)
+                        future.add_done_callback(lambda _: slots.release())
+                        futures.append(future)
+
+                    parts = [future.result() for future in futures]
+
+                return self.with_retries(
+                    lambda: self.upload_client.complete_multipart_upload(
+                        Key=key,
+                        Bucket=self.bucket_name,
+                        UploadId=upload_id,
+                        MultipartUpload={'Parts': parts}))
+
+            except Exception:
+                self.upload_client.abort_multipart_upload(
+                    Key=key,
+                    Bucket=self.bucket_name,
+                    UploadId=upload_id)
+
+                raise
+
+    def upload_part(self, key, upload_id, number, body):
+
+        response = self.with_retries(
+            lambda: self.upload_client.upload_part(
+                Key=key,
+                Bucket=self.bucket_name,
+                UploadId=upload_id,
+                PartNumber=number,
+                Body=body,
+                ContentMD5=get_content_md5(body)))
+        self.stats.add_retries(get_retry_attempts(response))
+
+        return {'ETag': response['ETag'], 'PartNumber': number}
+
+    def get_website_index(self):
+        """Return the index document currently served by the bucket.
+
+        Returns `None` if website hosting is not configured yet.
+
+        """
+        try:
+            response = self.client.get_bucket_website(
+                Bucket=self.bucket_name)
+
+        except ClientError as e:
+            if e.response['ResponseMetadata']['HTTPStatusCode'] == 404:
+                return None
+
+            else:
+                raise click.ClickException(
+                    'faced problems when connecting to AWS S3')
+
+        except EndpointConnectionError:
+            raise click.ClickException(
+                'could not connect to bucket specified')
+
+        return response.get('IndexDocument', {}).get('Suffix')
 
     def update_website_index(self, index_html_key):
 
@@ -103,3 +860,43 @@ class S3(Describer):
 
         except ClientError as e:
             raise click.ClickException('failed to replace an index document')
+
+
+def is_transient_error(error):
+    """Tell if the request failing with `error` might succeed if repeated."""
+
+    if isinstance(error, ClientError):
+        status = error.response.get(
+            'ResponseMetadata', {}).get('HTTPStatusCode', 0)
+        code = error.response.get('Error', {}).get('Code')
+        return (
+            status >= 500 or
+            status == 429 or
+            code in TRANSIENT_ERROR_CODES)
+
+    return isinstance(error, (BotoConnectionError, HTTPClientError))
+
+
+def get_retry_attempts(response):
+    """Return number of retries botocore performed to get `response`."""
+
+    return response.get('ResponseMetadata', {}).get('RetryAttempts', 0)
+
+
+def get_version_key(version):
+    """Sort key ordering versions matching `VERSION_PATTERN` as semver.
+
+    Numbers are compared numerically (`1.10.0` after `1.9.0`) and
+    pre-releases come before their release (`1.0.0-rc.1` before `1.0.0`).
+
+    """
+    match = VERSION_PATTERN.match(version)
+    release = [int(part) for part in match.group('release').split('.')]
+    prerelease = match.group('prerelease')
+    if prerelease is None:
+        return release, 1, []
+
+    return release, 0, [
+        (0, int(part), '') if part.isdigit() else (1, 0, part)
+        for part in prerelease.split('.')
+    ]
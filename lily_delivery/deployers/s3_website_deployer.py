@@ -1,21 +1,108 @@
 
-import json
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+import multiprocessing
 import os
 import re
 import shutil
+import sys
 import tempfile
+from time import perf_counter
 
+import click
+
+from ..cache import ArtifactCache
+from ..compression_policy import CompressionPolicy
 from ..describer import Describer
-from ..dependencies import S3, Cloudfront
+from ..dependencies import S3, Cloudfront, Inventory, PropagationTracker
+from ..dependencies.cloudfront import get_invalidation_paths
+from ..dependencies.s3 import get_version_key
+from ..journal import Journal
+from ..manifest import get_file_hash
+from ..metadata_policy import MetadataPolicy
+from ..metrics import Metrics
+from ..project import ProjectContext
+from ..replacements import ReplacementEngine
+from ..scheduler import Cancelled, Scheduler
+from ..staging import Staging
 
 
 class AngularCLIS3WebsiteDeployer(Describer):
 
-    def __init__(self, environment, project, conf):
+    def __init__(
+            self,
+            environment,
+            project,
+            conf,
+            workers=None,
+            serial_transform=False,
+            context=None):
 
+        self.environment = environment
         self.project = project
+
+        # -- project files are parsed once and shared by all deployers
+        self.context = context or ProjectContext()
         self.replacements = conf.get('replacements', [])
         self.meta = conf['meta']
+        upload = conf.get('upload', {})
+        self.workers = workers or upload.get('workers', 1)
+
+        # -- files unchanged since the currently served release are copied
+        # -- on the server side instead of being uploaded again
+        self.copy_unchanged = upload.get('copy_unchanged', True)
+
+        # -- `virtual` uploads files straight from the build directory,
+        # -- `physical` first creates versioned copy of it
+        self.staging = conf.get('staging', 'virtual')
+        self.temp_dirs = []
+
+        # -- `targeted` invalidates only paths which changed, `full`
+        # -- invalidates everything
+        self.invalidation = conf.get('invalidation', {})
+
+        # -- if enabled CloudFront rollouts are polled in the background
+        # -- and their propagation time is reported at the end
+        tracking = dict(conf.get('tracking', {}))
+        if tracking.pop('enabled', False):
+            self.tracker = PropagationTracker(**tracking)
+
+        else:
+            self.tracker = None
+
+        # -- replacements are CPU bound therefore they're applied by
+        # -- a pool of processes
+        if serial_transform:
+            self.transform_workers = 1
+
+        else:
+            self.transform_workers = conf.get('transform', {}).get(
+                'workers', os.cpu_count() or 1)
+
+        # -- uploaded files are journaled locally so that an interrupted
+        # -- deployment can be resumed
+        self.journal_conf = conf.get('journal', {})
+        self.journal = None
+
+        # -- JSON report of the deployment is written to `report.path`
+        # -- and / or appended to `report.history`
+        self.report = conf.get('report', {})
+        self.metrics = None
+
+        if 'cache' in conf:
+            self.cache = ArtifactCache.from_conf(conf['cache'] or {})
+
+        else:
+            self.cache = None
+
+        # -- clients are shared by all dependencies using the same
+        # -- credentials, the pool must fit all parallel uploads
+        client_config = {
+            'max_pool_connections': max(
+                10, self.workers * upload.get('multipart_concurrency', 4)),
+            'tcp_keepalive': True,
+            'retries': {'mode': 'adaptive', 'max_attempts': 5},
+            **conf.get('aws', {}),
+        }
 
         # -- FIXME: this will be replaced by the calls to lily-delivery
         # -- also the dependencies would be already loaded as appropriate
@@ -27,93 +114,751 @@ class AngularCLIS3WebsiteDeployer(Describer):
             access_key_id=dep['access_key_id'],
             secret_access_key=dep['secret_access_key'],
             region_name=dep['region'],
-            bucket_name=dep['bucket_name'])
+            bucket_name=dep['bucket_name'],
+            compression_policy=CompressionPolicy.from_conf(
+                conf.get('compression', {})),
+            # -- rules are compiled once and shared by all uploads
+            metadata_policy=MetadataPolicy.from_conf(
+                conf.get('metadata', {})),
+            cache=self.cache,
+            inventory=self.get_inventory(dep['bucket_name'], conf),
+            client_config=client_config,
+            endpoint_url=dep.get('endpoint_url'),
+            **{
+                name: upload[name]
+                for name in [
+                    'multipart_threshold',
+                    'multipart_chunksize',
+                    'multipart_concurrency',
+                    'retries',
+                ]
+                if name in upload
+            })
 
         dep = dependencies['hosting_cloudfront']
         self.cloudfront = Cloudfront(
             access_key_id=dep['access_key_id'],
             secret_access_key=dep['secret_access_key'],
             region_name=dep['region'],
-            distribution_id=dep['distribution_id'])
+            distribution_id=dep['distribution_id'],
+            client_config=client_config)
+
+    def get_inventory(self, bucket_name, conf):
+
+        if 'inventory' in conf:
+            return Inventory.from_conf(bucket_name, conf['inventory'] or {})
+
+        return None
+
+    @classmethod
+    def deploy_environments(
+            cls,
+            environments,
+            project,
+            conf,
+            workers=None,
+            serial_transform=False,
+            context=None):
+        """Deploy the same build to multiple environments at once.
+
+        The build directory is staged only once (by the deployer of the
+        first environment) and then all environments are deployed
+        concurrently. Compressed files are shared through a single cache
+        (a temporary one unless `cache` is configured) so that each file
+        is compressed once as well. Failure of one environment does not
+        stop the other ones, all failures are reported at the end.
+
+        """
+        deployers = {
+            environment: cls(
+                environment,
+                project,
+                conf,
+                workers=workers,
+                serial_transform=serial_transform,
+                context=context)
+            for environment in environments
+        }
+        if len(deployers) == 1:
+            return next(iter(deployers.values())).deploy()
+
+        primary = deployers[environments[0]]
+        try:
+            with primary.subheader('staging build directory'):
+                staged = primary.stage()
+
+            cache = primary.cache
+            if cache is None:
+                temp_dir = tempfile.mkdtemp()
+                primary.temp_dirs.append(temp_dir)
+                cache = ArtifactCache(temp_dir, max_size=sys.maxsize)
+
+            for deployer in deployers.values():
+                deployer.s3.cache = cache
+
+            with ThreadPoolExecutor(max_workers=len(deployers)) as executor:
+                futures = {
+                    environment: executor.submit(deployer.deploy, staged)
+                    for environment, deployer in deployers.items()
+                }
+
+            failed = []
+            for environment, future in futures.items():
+                try:
+                    future.result()
+                    click.secho(f'{environment}: deployed', fg='green')
+
+                except Exception as e:
+                    failed.append(environment)
+                    click.secho(f'{environment}: failed: {e}', fg='red')
+
+        finally:
+            primary.cleanup()
+
+        if failed:
+            raise click.ClickException(
+                f'failed to deploy to: {", ".join(failed)}')
+
+    @classmethod
+    def plan_environments(
+            cls,
+            environments,
+            project,
+            conf,
+            remote=False,
+            serial_transform=False,
+            context=None):
+        """Compute deployment plans of multiple environments.
+
+        The build directory is staged only once and shared by all plans.
+
+        """
+        deployers = [
+            cls(
+                environment,
+                project,
+                conf,
+                serial_transform=serial_transform,
+                context=context)
+            for environment in environments
+        ]
+        primary = deployers[0]
+        try:
+            staged = primary.stage_build_dir()
+
+            return [
+                deployer.plan(staged, remote=remote)
+                for deployer in deployers
+            ]
+
+        finally:
+            primary.cleanup()
+
+    def plan(self, staged=None, remote=False):
+        """Describe what `deploy` would do without changing anything.
+
+        For each file its key, raw and compressed size, headers and whether
+        replacements were applied are computed together with CloudFront
+        paths to invalidate. Everything happens locally unless `remote` is
+        set, in which case the plan is compared with the release present
+        in the bucket using read-only requests.
 
-    def deploy(self):
+        """
+        try:
+            staging, index_html_name, version = (
+                staged or self.stage_build_dir())
+            manifest_name = f'manifest-{version}.json'
+
+            remote_manifest, release_exists, sources = None, None, {}
+            uploaded, resumed = None, None
+            if remote:
+                remote_manifest = self.s3.get_manifest(manifest_name)
+                uploaded = remote_manifest
+                release_exists = (
+                    remote_manifest is None and
+                    self.s3.check_if_release_exists(
+                        index_html_name, version))
+                sources = self.get_copy_sources(version)
+
+                # -- `deploy` would resume an interrupted upload
+                journal = Journal.from_conf(
+                    f'{self.s3.bucket_name}-{version}', self.journal_conf)
+                if release_exists and journal.load():
+                    release_exists = False
+                    uploaded = journal.entries
+                    resumed = len(journal.entries)
+
+            build_path = self.build_path
+            with ThreadPoolExecutor(
+                    max_workers=self.transform_workers) as executor:
+                files = list(executor.map(
+                    lambda item: self.plan_file(
+                        *item,
+                        build_path,
+                        uploaded,
+                        release_exists,
+                        sources),
+                    staging))
+
+            manifest = {file['key']: file['content_hash'] for file in files}
+            if release_exists:
+                invalidation_paths = []
+
+            else:
+                invalidation_paths = self.get_invalidation_paths(
+                    index_html_name, manifest, remote_manifest) or ['/*']
+
+            return {
+                'environment': self.environment,
+                'version': version,
+                'index': index_html_name,
+                'remote': remote,
+                'release_exists': release_exists,
+                'resumed': resumed,
+                'files': sorted(files, key=lambda file: file['key']),
+                'invalidation_paths': invalidation_paths,
+            }
+
+        finally:
+            if staged is None:
+                self.cleanup()
+
+    def plan_file(
+            self,
+            key,
+            path,
+            build_path,
+            remote_manifest,
+            release_exists,
+            sources=None):
+
+        plan = self.s3.describe_upload(key, path, self.meta)
+        plan['content_hash'] = get_file_hash(path)
+
+        # -- transformed files are staged outside of the build directory
+        plan['replaced'] = (
+            os.path.commonpath([build_path, path]) != build_path)
+
+        if release_exists:
+            plan['action'] = 'skip'
+
+        elif (remote_manifest or {}).get(key) == plan['content_hash']:
+            plan['action'] = 'unchanged'
+
+        elif (sources or {}).get(key, (None, None))[1] == (
+                plan['content_hash']):
+            plan['action'] = 'copy'
+
+        else:
+            plan['action'] = 'upload'
+
+        return plan
+
+    def deploy(self, staged=None):
+        """Deploy the build.
+
+        `staged` is the result of `stage` shared by multiple deployers, in
+        that case staging is skipped and its temp directories are left for
+        the owner to clean up.
+
+        """
+        self.metrics = Metrics(
+            environment=self.environment, project=self.project)
+        try:
+            self.perform_deploy(staged)
+            self.metrics.update(succeeded=True)
+
+        except Exception:
+            self.metrics.update(succeeded=False)
+
+            raise
+
+        finally:
+            self.s3.save_inventory()
+            if staged is None:
+                self.cleanup()
+
+            self.metrics.finish()
+            self.save_report()
+
+    def save_report(self):
+
+        if self.report.get('path'):
+            self.metrics.save(
+                self.report['path'].format(environment=self.environment))
+
+        if self.report.get('history'):
+            self.metrics.append_to_history(self.report['history'])
+
+    def perform_deploy(self, staged=None):
         with self.header('performing a deployment'):
+            scheduler = self.get_scheduler(staged)
+            try:
+                scheduler.run()
+
+                # -- the release is either deployed or there was nothing
+                # -- to do, either way there is nothing left to resume
+                self.journal.remove()
+
+            finally:
+                self.metrics.update(
+                    critical_path=scheduler.get_critical_path())
+                with self.subheader('deployment steps timings'):
+                    scheduler.report()
+
+    def get_scheduler(self, staged=None):
+        """Express deployment as a graph of steps.
+
+        Preflight checks, staging and inspection of the remote release are
+        independent and run concurrently, the rollout itself (upload,
+        manifest, website index, routing and invalidation) starts only once
+        all of them passed and keeps its order.
+
+        """
+        version = self.version
+        self.metrics.update(version=version)
+        self.journal = Journal.from_conf(
+            f'{self.s3.bucket_name}-{version}', self.journal_conf)
+        index_html_name = f'index-{version}.html'
+        manifest_name = f'manifest-{version}.json'
+
+        def check_s3(results):
+            if not self.s3.is_valid():
+                raise click.ClickException('could not access AWS S3 bucket')
+
+        def check_cloudfront(results):
+            if not self.cloudfront.is_valid():
+                raise click.ClickException(
+                    'could not access AWS CloudFront distribution')
+
+        def stage(results):
+            # -- preparation of the mapping of files to keys to be deployed
+            staging, _, _ = staged or self.stage()
+
+            return staging
+
+        def refresh_inventory(results):
+            if self.s3.inventory:
+                self.s3.refresh_inventory()
+
+        def get_remote_manifest(results):
+            remote_manifest = self.s3.get_manifest(manifest_name)
 
-            with self.subheader('copying build directory to temp location'):
-                # -- preparation of the directory/file structure to be
-                # -- deployed
-                path, index_html_name, assets_name = (
-                    self.copy_build_dir_to_versioned())
+            # -- releases uploaded without a manifest are never touched
+            # -- unless their upload was interrupted and it can be resumed
+            if remote_manifest is None and self.s3.check_if_release_exists(
+                    index_html_name, version):
+                if not self.journal.load():
+                    raise Cancelled()
 
-            # -- final AWS steps
-            if (not self.s3.check_if_key_exists(index_html_name) and
-                    not self.s3.check_if_key_exists(assets_name)):
+                click.secho(
+                    f'resuming interrupted deployment, '
+                    f'{len(self.journal.entries)} file(s) already uploaded',
+                    fg='yellow')
 
-                with self.subheader(f's3: uploading "{path}"'):
-                    self.s3.upload_dir(path, self.meta)
+            return remote_manifest
 
-                with self.subheader(f's3: updating website index.html file'):
-                    self.s3.update_website_index(index_html_name)
+        def get_copy_sources(results):
+            return self.get_copy_sources(version)
 
-                with self.subheader('cloudfront: frontend routing'):
-                    self.cloudfront.update_frontend_routing(index_html_name)
+        def upload(results):
+            started = perf_counter()
+            try:
+                manifest = self.s3.upload(
+                    results['staging build directory'],
+                    self.meta,
+                    workers=self.workers,
+                    deferred_keys=[index_html_name],
+                    manifest=results['s3: checking release'],
+                    sources=results['s3: finding previous release'],
+                    journal=self.journal)
+                self.journal.mark_complete()
 
-                with self.subheader('cloudfront: invalidate cache'):
-                    self.cloudfront.invalidate_cache()
+                return manifest
+
+            finally:
+                duration = perf_counter() - started
+                stats = self.s3.stats
+                self.metrics.update(upload={
+                    **stats.as_dict(),
+                    'duration': duration,
+                    'throughput': stats.size / duration if duration else None,
+                })
+
+        def put_manifest(results):
+            # -- the index switch and CloudFront must never point to
+            # -- a partially uploaded release
+            if not self.journal.is_complete:
+                raise click.ClickException('upload is not complete')
+
+            # -- nothing changed since the release was uploaded, but its
+            # -- rollout might have failed at any of the following steps,
+            # -- all of them are safe to repeat (routing is not updated if
+            # -- it's already right) so they're always run
+            manifest = results['s3: uploading files']
+            if manifest == results['s3: checking release']:
+                click.secho(
+                    f'"{manifest_name}" already stored, finishing rollout',
+                    fg='yellow')
+
+            else:
+                self.s3.put_manifest(manifest_name, manifest)
+
+        def update_website_index(results):
+            self.s3.update_website_index(index_html_name)
+
+        def update_frontend_routing(results):
+            routing = self.cloudfront.update_frontend_routing(index_html_name)
+            if routing and self.tracker:
+                self.tracker.track(
+                    'cloudfront: distribution', self.cloudfront.is_deployed)
+
+        def invalidate_cache(results):
+            invalidation_id = self.cloudfront.invalidate_cache(
+                self.get_invalidation_paths(
+                    index_html_name,
+                    results['s3: uploading files'],
+                    results['s3: checking release']))
+
+            if self.tracker:
+                self.tracker.track(
+                    'cloudfront: invalidation',
+                    lambda: self.cloudfront.is_invalidated(invalidation_id))
+
+        def wait_for_propagation(results):
+            if self.tracker:
+                self.tracker.wait()
+
+        scheduler = Scheduler(metrics=self.metrics)
+        scheduler.add('s3: checking access', check_s3)
+        scheduler.add('cloudfront: checking access', check_cloudfront)
+        scheduler.add('staging build directory', stage)
+        scheduler.add(
+            's3: refreshing inventory',
+            refresh_inventory,
+            depends_on=['s3: checking access'])
+        scheduler.add(
+            's3: checking release',
+            get_remote_manifest,
+            depends_on=['s3: refreshing inventory'])
+        scheduler.add(
+            's3: finding previous release',
+            get_copy_sources,
+            depends_on=['s3: checking access'])
+        scheduler.add(
+            's3: uploading files',
+            upload,
+            depends_on=[
+                'staging build directory',
+                's3: checking release',
+                's3: finding previous release',
+                'cloudfront: checking access',
+            ])
+        scheduler.add(
+            f's3: storing "{manifest_name}"',
+            put_manifest,
+            depends_on=['s3: uploading files'])
+        scheduler.add(
+            's3: updating website index.html file',
+            update_website_index,
+            depends_on=[f's3: storing "{manifest_name}"'])
+        scheduler.add(
+            'cloudfront: frontend routing',
+            update_frontend_routing,
+            depends_on=['s3: updating website index.html file'])
+        scheduler.add(
+            'cloudfront: invalidate cache',
+            invalidate_cache,
+            depends_on=['cloudfront: frontend routing'])
+        scheduler.add(
+            'cloudfront: waiting for propagation',
+            wait_for_propagation,
+            depends_on=['cloudfront: invalidate cache'])
+
+        return scheduler
+
+    def prune(self, keep, dry_run=False):
+        """Delete all releases but the last `keep` ones.
+
+        The release currently served by the website index is always kept.
+        Returns the list of pruned versions.
+
+        """
+        if keep < 1:
+            raise click.ClickException('at least one release must be kept')
+
+        with self.header('pruning old releases'):
+            releases = self.s3.list_releases()
+            match = re.match(
+                r'^index-(.+)\.html$', self.s3.get_website_index() or '')
+
+            versions = sorted(releases, key=get_version_key)
+            kept = set(versions[-keep:])
+            if match:
+                kept.add(match.group(1))
+
+            pruned = [version for version in versions if version not in kept]
+            with ThreadPoolExecutor(max_workers=self.workers) as executor:
+                keys = dict(zip(pruned, executor.map(
+                    lambda version: releases[version] + list(
+                        self.s3.list_objects(f'{version}/')),
+                    pruned)))
+
+            for version in versions:
+                if version in kept:
+                    click.secho(f'keep: {version}', fg='white')
+
+                else:
+                    click.secho(
+                        f'delete: {version} ({len(keys[version])} file(s))',
+                        fg='yellow')
+
+            if dry_run or not pruned:
+                return pruned
+
+            inventory = self.s3.inventory
+            if inventory:
+                inventory.load()
+
+            with self.subheader(f's3: deleting {len(pruned)} release(s)'):
+                try:
+                    self.s3.delete_keys(
+                        [key for version in pruned for key in keys[version]],
+                        workers=self.workers)
+
+                    if inventory:
+                        for version in pruned:
+                            inventory.remove_prefix(f'{version}/')
+
+                finally:
+                    self.s3.save_inventory()
+
+            return pruned
+
+    def get_copy_sources(self, version):
+        """Map keys of `version` to the same files of the served release.
+
+        The currently served release is found through the website index
+        document and its manifest tells the content hash of each file.
+        Returns `{key: (source_key, content_hash)}` as expected by
+        `S3.upload`.
+
+        """
+        if not self.copy_unchanged:
+            return {}
+
+        match = re.match(
+            r'^index-(.+)\.html$', self.s3.get_website_index() or '')
+        if not match or match.group(1) == version:
+            return {}
+
+        previous = match.group(1)
+        manifest = self.s3.get_manifest(f'manifest-{previous}.json') or {}
+
+        sources = {}
+        for key, content_hash in manifest.items():
+            if key == f'index-{previous}.html':
+                sources[f'index-{version}.html'] = (key, content_hash)
+
+            elif key.startswith(f'{previous}/'):
+                name = key[len(previous) + 1:]
+                sources[f'{version}/{name}'] = (key, content_hash)
+
+        return sources
+
+    def get_invalidation_paths(
+            self, index_html_name, manifest, remote_manifest):
+        """Compute CloudFront paths which might serve stale content.
+
+        Those are the root (served by the website index document), the
+        new index, `invalidation.routes` (client side routes, their cached
+        error responses carry the previous index) and files which were
+        overwritten. Files uploaded under new keys were never cached
+        therefore they're skipped.
+
+        Returns `None` (invalidate everything) in `full` mode.
+
+        """
+        if self.invalidation.get('mode', 'targeted') == 'full':
+            return None
+
+        remote_manifest = remote_manifest or {}
+        paths = ['/', f'/{index_html_name}'] + [
+            '/' + route.lstrip('/')
+            for route in self.invalidation.get('routes', [])
+        ] + [
+            f'/{key}'
+            for key, content_hash in manifest.items()
+            if key in remote_manifest and
+            remote_manifest[key] != content_hash
+        ]
+
+        return get_invalidation_paths(
+            paths,
+            **{
+                name: self.invalidation[name]
+                for name in ['max_paths', 'max_wildcards']
+                if name in self.invalidation
+            })
 
     @property
     def build_path(self):
-        with open(os.path.join(os.getcwd(), 'angular.json'), 'r') as f:
-            angular_json = json.loads(f.read())
-            conf = angular_json['projects'][self.project]
-
-        return os.path.join(
-            os.getcwd(),
-            conf['architect']['build']['options']['outputPath'])
+        return self.context.get_build_path(self.project)
 
     @property
     def version(self):
-        with open(os.path.join(os.getcwd(), 'package.json'), 'r') as f:
-            package_json = json.loads(f.read())
-            return package_json['version']
+        return self.context.version
+
+    def cleanup(self):
+        for temp_dir in self.temp_dirs:
+            shutil.rmtree(temp_dir, ignore_errors=True)
+
+        self.temp_dirs = []
+
+    def stage(self):
+
+        if self.staging == 'physical':
+            path, index_html_name, assets_name = (
+                self.copy_build_dir_to_versioned())
+
+            return Staging.from_dir(path), index_html_name, assets_name
+
+        return self.stage_build_dir()
+
+    def stage_build_dir(self, transformed_path=None):
+        """Map files of the build directory to their versioned keys.
+
+        Files requiring replacements are transformed and stored in
+        `transformed_path` (a fresh temp directory by default), all other
+        files are referenced directly in the build directory.
+
+        """
+        if transformed_path is None:
+            transformed_path = tempfile.mkdtemp()
+            self.temp_dirs.append(transformed_path)
+
+        version = self.version
+        build_path = self.build_path
+        index_html_name = f'index-{version}.html'
+
+        engine = ReplacementEngine(self.replacements, version)
+        staging = Staging()
+        transforms = []
+        for subdir, dirs, files in os.walk(build_path):
+            for file in files:
+                src = os.path.join(subdir, file)
+                name = os.path.relpath(src, build_path)
+
+                if name == 'index.html':
+                    key = index_html_name
+
+                else:
+                    key = f'{version}/{name}'
+
+                if engine.get_replacements(src):
+                    dst = os.path.join(transformed_path, key)
+                    os.makedirs(os.path.dirname(dst), exist_ok=True)
+                    transforms.append((key, src, dst))
+
+                staging.add(key, src)
+
+        transformed = self.transform_files(
+            engine, [(src, dst) for _, src, dst in transforms])
+        for (key, _, dst), replaced in zip(transforms, transformed):
+            if replaced:
+                staging.add(key, dst)
+
+        return staging, index_html_name, version
+
+    def transform_files(self, engine, files):
+        """Apply replacements to all `(src, dst)` pairs.
+
+        Returns list of flags telling if given file was rewritten.
+
+        """
+        if self.transform_workers <= 1 or len(files) <= 1:
+            return [
+                transform_file(engine, self.cache, src, dst)
+                for src, dst in files]
+
+        # -- staging runs in a scheduler thread while other threads talk
+        # -- to AWS, forking such a process could deadlock, the engine and
+        # -- cache are sent once per process instead of once per file
+        with ProcessPoolExecutor(
+                max_workers=self.transform_workers,
+                mp_context=get_transform_context(),
+                initializer=init_transform_worker,
+                initargs=(engine, self.cache)) as executor:
+
+            return list(executor.map(
+                transform_worker_file,
+                [src for src, _ in files],
+                [dst for _, dst in files],
+                chunksize=max(
+                    1, len(files) // (self.transform_workers * 4))))
 
     def copy_build_dir_to_versioned(self):
 
-        build_path = os.path.join(tempfile.mkdtemp(), 'build')
-        version_dir = os.path.join(build_path, self.version)
+        temp_dir = tempfile.mkdtemp()
+        self.temp_dirs.append(temp_dir)
 
-        shutil.copytree(
-            self.build_path,
-            version_dir,
-            copy_function=self.copy_with_renames)
+        build_path = os.path.join(temp_dir, 'build')
+        staging, index_html_name, assets_name = self.stage_build_dir(
+            os.path.join(temp_dir, 'transformed'))
 
-        shutil.move(
-            os.path.join(version_dir, 'index.html'),
-            os.path.join(build_path, f'index-{self.version}.html'))
+        staging.materialize(build_path)
 
-        return build_path, f'index-{self.version}.html', self.version
+        return build_path, index_html_name, assets_name
 
-    def copy_with_renames(self, src, dst, *args, **kwargs):
 
-        content_replacements = []
-        for replacement in self.replacements:
-            _, ext = os.path.splitext(src)
-            if ext in replacement['file_extensions']:
-                content_replacements.append(replacement)
+# -- state of a process of the transform pool
+transform_worker = {}
 
-        if content_replacements:
 
-            with open(src, 'r') as f:
-                content = f.read()
-                for replacement in content_replacements:
-                    content = content.replace(
-                        replacement['from'],
-                        replacement['to'].format(version=self.version))
+def get_transform_context():
 
-            with open(dst, 'w') as f:
-                f.write(content)
+    if 'forkserver' in multiprocessing.get_all_start_methods():
+        return multiprocessing.get_context('forkserver')
 
-            return dst
+    return multiprocessing.get_context('spawn')
 
-        else:
-            return shutil.copy2(src, dst, *args, **kwargs)
+
+def init_transform_worker(engine, cache):
+    transform_worker['engine'] = engine
+    transform_worker['cache'] = cache
+
+
+def transform_worker_file(src, dst):
+
+    return transform_file(
+        transform_worker['engine'], transform_worker['cache'], src, dst)
+
+
+def transform_file(engine, cache, src, dst):
+    """Write `src` with replacements applied to `dst` if any applies.
+
+    It's a module level function so that it can be run by a process pool.
+
+    """
+    if cache:
+        key = cache.get_key(
+            'replacements',
+            get_file_hash(src),
+            engine.get_replacements(src),
+            engine.version)
+        cached_path = cache.get(key)
+        if cached_path:
+            try:
+                shutil.copyfile(cached_path, dst)
+
+                return True
+
+            except FileNotFoundError:
+                # -- evicted by another worker in the meantime
+                pass
+
+    replaced = engine.apply(src, dst)
+    if replaced and cache:
+        cache.put_file(key, dst)
+
+    return replaced
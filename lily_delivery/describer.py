@@ -1,5 +1,4 @@
-
-from contextlib import contextmanager
+from contextlib import contextmanager, nullcontext
 
 import click
 
@@ -10,16 +9,26 @@ class Describer:
     def header(self, text):
         text = text.upper()
         click.secho(f'\n\n[START] {text}', fg='blue')  # noqa
-        yield
+        with self.measure(text, 'header'):
+            yield
         click.secho(f'[STOP] {text}', fg='blue')  # noqa
 
     @contextmanager
     def subheader(self, text):
         click.secho(f'\n\n[START] {text}', fg='green')  # noqa
-        yield
+        with self.measure(text, 'subheader'):
+            yield
         click.secho(f'[STOP] {text}', fg='green')  # noqa
 
     @contextmanager
     def text(self, text):
         click.secho(text, fg='white')
         yield
+
+    def measure(self, text, kind):
+        # -- phases are recorded only by describers having `metrics`
+        metrics = getattr(self, 'metrics', None)
+        if metrics is None:
+            return nullcontext()
+
+        return metrics.phase(text, kind)
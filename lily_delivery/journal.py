@@ -0,0 +1,82 @@
+import json
+import os
+import threading
+
+
+DEFAULT_PATH = os.path.join('~', '.cache', 'lily_delivery', 'journal')
+
+
+class Journal:
+    """Local record of files uploaded by a deployment of a release.
+
+    Each uploaded file is appended (as a JSON line) as soon as its upload
+    completes, so if the deployment gets interrupted the next one can load
+    the journal and upload only the missing files. Once all files are
+    uploaded the journal is marked as complete.
+
+    """
+
+    def __init__(self, name, path=None):
+        self.path = os.path.join(
+            os.path.expanduser(path or DEFAULT_PATH), f'{name}.jsonl')
+        self.lock = threading.Lock()
+        self.entries = {}
+        self.is_complete = False
+
+    @classmethod
+    def from_conf(cls, name, conf):
+
+        return cls(name, path=conf.get('path'))
+
+    def load(self):
+        """Load journal from disk and return `False` if not present."""
+
+        try:
+            with open(self.path, 'r') as f:
+                lines = f.read().splitlines()
+
+        except OSError:
+            return False
+
+        for line in lines:
+            try:
+                entry = json.loads(line)
+
+            except ValueError:
+                # -- the last line could be cut short by an interruption
+                continue
+
+            if entry.get('complete'):
+                self.is_complete = True
+
+            else:
+                self.entries[entry['key']] = entry['hash']
+
+        return True
+
+    def record(self, key, content_hash):
+        self.append({'key': key, 'hash': content_hash})
+        with self.lock:
+            self.entries[key] = content_hash
+
+    def mark_complete(self):
+        self.append({'complete': True})
+        self.is_complete = True
+
+    def append(self, entry):
+
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        with self.lock:
+            with open(self.path, 'a') as f:
+                f.write(json.dumps(entry) + '\n')
+
+    def remove(self):
+
+        try:
+            os.remove(self.path)
+
+        except FileNotFoundError:
+            pass
+
+        self.entries = {}
+        self.is_complete = False
@@ -0,0 +1,14 @@
+import hashlib
+
+
+BLOCK_SIZE = 1024 * 1024
+
+
+def get_file_hash(path):
+
+    sha = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(BLOCK_SIZE), b''):
+            sha.update(block)
+
+    return sha.hexdigest()
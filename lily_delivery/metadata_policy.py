@@ -0,0 +1,113 @@
+from fnmatch import translate
+import re
+
+import click
+
+
+# -- names produced by Angular CLI for bundles built with webpack
+# -- (`main.3f2a9c1b8e7d6a5f.js`) and esbuild (`chunk-5ZDXMDWL.js`)
+HASHED_PATTERN = (
+    r'[.-]([0-9a-f]{16,}|(?=[0-9A-Z]*[A-Z])[0-9A-Z]{8})(\.[0-9A-Za-z]+)+$')
+
+HASHED_CACHE_CONTROL = 'public, max-age=31536000, immutable'
+
+ATTRIBUTES = ['cache-control', 'content-type', 'compress']
+
+
+class MetadataRule:
+
+    def __init__(self, pattern, **attributes):
+        self.pattern = pattern
+        self.attributes = attributes
+
+    @classmethod
+    def from_conf(cls, conf):
+
+        conf = dict(conf)
+        if ('glob' in conf) == ('regex' in conf):
+            raise click.ClickException(
+                f'metadata rule {conf} must have either "glob" or "regex"')
+
+        unknown = set(conf) - set(ATTRIBUTES) - {'glob', 'regex'}
+        if unknown:
+            raise click.ClickException(
+                f'metadata rule {conf} has unknown attributes: '
+                f'{", ".join(sorted(unknown))}')
+
+        try:
+            if 'glob' in conf:
+                # -- anchored as `translate` anchors only the end
+                pattern = re.compile('^' + translate(conf.pop('glob')))
+
+            else:
+                pattern = re.compile(conf.pop('regex'))
+
+        except re.error as e:
+            raise click.ClickException(f'metadata rule is not valid: {e}')
+
+        return cls(pattern, **conf)
+
+    def matches(self, key):
+        return self.pattern.search(key) is not None
+
+
+class MetadataPolicy:
+    """Decide metadata of uploaded objects based on their keys.
+
+    Rules are checked in order and each attribute (`cache-control`,
+    `content-type`, `compress`) is taken from the first matching rule
+    defining it. Globs must match the whole key (`*` matches `/` as
+    well), regexes are searched for anywhere in it.
+
+    Keys of the versioned prefix not given `cache-control` by any rule
+    but looking content hashed get `hashed_cache_control` (they can never
+    change).
+
+    """
+
+    def __init__(
+            self,
+            rules=None,
+            detect_hashed=True,
+            hashed_pattern=HASHED_PATTERN,
+            hashed_cache_control=HASHED_CACHE_CONTROL):
+
+        self.rules = [MetadataRule.from_conf(rule) for rule in rules or []]
+        self.hashed_pattern = (
+            re.compile(hashed_pattern) if detect_hashed else None)
+        self.hashed_cache_control = hashed_cache_control
+
+    @classmethod
+    def from_conf(cls, conf):
+
+        return cls(**{
+            name: conf[name]
+            for name in [
+                'rules',
+                'detect_hashed',
+                'hashed_pattern',
+                'hashed_cache_control',
+            ]
+            if name in conf
+        })
+
+    def get_metadata(self, key):
+        """Return attributes of `key` overriding the defaults."""
+
+        metadata = {}
+        for rule in self.rules:
+            if rule.matches(key):
+                for name, value in rule.attributes.items():
+                    metadata.setdefault(name, value)
+
+        # -- root keys (the index answering `/`) must never be cached for
+        # -- long, whatever their version looks like
+        versioned = '/' in key
+        if (
+                'cache-control' not in metadata and
+                versioned and
+                self.hashed_pattern and
+                self.hashed_pattern.search(key)):
+            metadata['cache-control'] = self.hashed_cache_control
+
+        return metadata
@@ -0,0 +1,86 @@
+from contextlib import contextmanager
+import json
+import os
+import threading
+from time import perf_counter, time
+
+
+# -- guards appends to history files shared by concurrent deployments
+history_lock = threading.Lock()
+
+
+class Metrics:
+    """Machine readable record of a single deployment.
+
+    Wall time of each phase (every `Describer.header` and
+    `Describer.subheader` of objects having `metrics` attribute) is
+    recorded together with arbitrary values added with `update` (upload
+    statistics, critical path, ...).
+
+    """
+
+    def __init__(self, **info):
+        self.lock = threading.Lock()
+        self.info = info
+        self.started_at = time()
+        self.started = perf_counter()
+        self.duration = None
+        self.phases = []
+        self.values = {}
+
+    @contextmanager
+    def phase(self, name, kind):
+
+        started_at = time()
+        started = perf_counter()
+        succeeded = False
+        try:
+            yield
+            succeeded = True
+
+        finally:
+            with self.lock:
+                self.phases.append({
+                    'name': name,
+                    'kind': kind,
+                    'started_at': started_at,
+                    'duration': perf_counter() - started,
+                    'succeeded': succeeded,
+                })
+
+    def finish(self):
+        self.duration = perf_counter() - self.started
+
+    def update(self, **values):
+        with self.lock:
+            self.values.update(values)
+
+    def as_dict(self):
+        with self.lock:
+            return {
+                **self.info,
+                'started_at': self.started_at,
+                'duration': (
+                    perf_counter() - self.started
+                    if self.duration is None else self.duration),
+                'phases': sorted(
+                    self.phases, key=lambda phase: phase['started_at']),
+                **self.values,
+            }
+
+    def save(self, path):
+
+        path = os.path.expanduser(path)
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        with open(path, 'w') as f:
+            f.write(json.dumps(self.as_dict(), indent=2))
+
+    def append_to_history(self, path):
+        """Append report as a single JSON line to `path`."""
+
+        path = os.path.expanduser(path)
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        line = json.dumps(self.as_dict())
+        with history_lock:
+            with open(path, 'a') as f:
+                f.write(line + '\n')
@@ -0,0 +1,61 @@
+COLUMNS = [
+    ('ACTION', lambda file: file['action']),
+    ('KEY', lambda file: file['key']),
+    ('RAW', lambda file: format_size(file['raw_size'])),
+    ('SIZE', lambda file: format_size(file['size'])),
+    ('ENCODING', lambda file: file['headers'].get('ContentEncoding', '-')),
+    ('CONTENT TYPE', lambda file: file['headers']['ContentType'] or '-'),
+    ('CACHE CONTROL', lambda file: file['headers']['CacheControl']),
+    ('REPLACED', lambda file: 'yes' if file['replaced'] else '-'),
+]
+
+
+def format_size(size):
+
+    for unit in ['B', 'KB', 'MB']:
+        if size < 1024:
+            return f'{size:.0f}{unit}' if unit == 'B' else f'{size:.1f}{unit}'
+
+        size /= 1024
+
+    return f'{size:.1f}GB'
+
+
+def format_plan(plan):
+    """Render deployment plan (see `plan` of deployers) as a table."""
+
+    rows = [[name for name, _ in COLUMNS]] + [
+        [get(file) for _, get in COLUMNS]
+        for file in plan['files']
+    ]
+    widths = [max(len(row[i]) for row in rows) for i in range(len(COLUMNS))]
+
+    lines = [
+        f'environment: {plan["environment"]}, version: {plan["version"]}, '
+        f'index: {plan["index"]}',
+    ]
+    if plan['release_exists']:
+        lines.append(
+            'release uploaded without a manifest exists, '
+            'nothing would be deployed')
+
+    if plan['resumed'] is not None:
+        lines.append(
+            f'resuming interrupted deployment, {plan["resumed"]} file(s) '
+            f'already uploaded')
+
+    lines.extend(
+        '  '.join(value.ljust(width) for value, width in zip(row, widths))
+        .rstrip()
+        for row in rows)
+
+    uploads = [file for file in plan['files'] if file['action'] == 'upload']
+    lines.append(
+        f'{len(uploads)} of {len(plan["files"])} file(s) to upload: '
+        f'{format_size(sum(file["raw_size"] for file in uploads))} -> '
+        f'{format_size(sum(file["size"] for file in uploads))}')
+    lines.append(
+        'invalidation paths: ' +
+        (', '.join(plan['invalidation_paths']) or '-'))
+
+    return '\n'.join(lines)
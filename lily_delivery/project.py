@@ -0,0 +1,91 @@
+import json
+import os
+import threading
+
+import click
+
+
+CONF_NAME = '.lily_delivery.yaml'
+
+
+def load_yaml(content):
+    """Parse YAML `content` with the C loader if libyaml is available."""
+
+    # -- imported here so that the CLI starts without it
+    import yaml
+
+    try:
+        return yaml.load(
+            content, Loader=getattr(yaml, 'CSafeLoader', yaml.SafeLoader))
+
+    except yaml.YAMLError as e:
+        raise ValueError(str(e))
+
+
+class ProjectContext:
+    """Files describing the deployed project, loaded once per run.
+
+    `.lily_delivery.yaml`, `package.json` and `angular.json` found in `path`
+    (the current working directory by default) are read, parsed and
+    validated on first access only, all later accesses (from any thread)
+    get the parsed content. Problems are reported as `ClickException`.
+
+    """
+
+    def __init__(self, path=None):
+        self.path = path
+        self.lock = threading.Lock()
+        self.files = {}
+
+    def load(self, name, parse):
+
+        with self.lock:
+            if name not in self.files:
+                path = os.path.join(self.path or os.getcwd(), name)
+                try:
+                    with open(path, 'r') as f:
+                        content = f.read()
+
+                except FileNotFoundError:
+                    raise click.ClickException(f'"{path}" does not exist')
+
+                try:
+                    self.files[name] = parse(content)
+
+                except ValueError as e:
+                    raise click.ClickException(
+                        f'"{path}" is not valid: {e}')
+
+            return self.files[name]
+
+    @property
+    def conf(self):
+
+        conf = self.load(CONF_NAME, load_yaml)
+        if not isinstance(conf, dict):
+            raise click.ClickException(f'"{CONF_NAME}" must be a mapping')
+
+        return conf
+
+    @property
+    def version(self):
+
+        package_json = self.load('package.json', json.loads)
+        try:
+            return package_json['version']
+
+        except (KeyError, TypeError):
+            raise click.ClickException('"package.json" lacks "version"')
+
+    def get_build_path(self, project):
+
+        angular_json = self.load('angular.json', json.loads)
+        try:
+            conf = angular_json['projects'][project]
+            output_path = conf['architect']['build']['options']['outputPath']
+
+        except (KeyError, TypeError):
+            raise click.ClickException(
+                f'"angular.json" lacks output path of project "{project}"')
+
+        return os.path.join(self.path or os.getcwd(), output_path)
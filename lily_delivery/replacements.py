@@ -0,0 +1,73 @@
+from collections import defaultdict
+import mmap
+import os
+import re
+
+
+class ReplacementEngine:
+    """Apply all configured content replacements in a single pass.
+
+    Replacements are grouped by file extension and all `from` patterns of a
+    given extension are compiled into one alternation (longest patterns
+    first), so each file is scanned only once. Files are memory mapped and
+    searched before anything else happens, so files without any match are
+    never decoded nor rewritten.
+
+    Contrary to applying `str.replace` one after another the replacements
+    are applied simultaneously, therefore output of one replacement is
+    never matched by another one.
+
+    """
+
+    def __init__(self, replacements, version):
+        self.version = version
+        self.replacements = defaultdict(list)
+        for replacement in replacements:
+            for ext in replacement['file_extensions']:
+                self.replacements[ext].append(replacement)
+
+        self.matchers = {}
+        for ext, ext_replacements in self.replacements.items():
+            targets = {}
+            for replacement in ext_replacements:
+                targets.setdefault(
+                    replacement['from'].encode('utf-8'),
+                    replacement['to'].format(
+                        version=version).encode('utf-8'))
+
+            pattern = re.compile(b'|'.join(
+                re.escape(source)
+                for source in sorted(targets, key=len, reverse=True)))
+
+            self.matchers[ext] = (pattern, targets)
+
+    def get_replacements(self, path):
+
+        _, ext = os.path.splitext(path)
+
+        return self.replacements.get(ext, [])
+
+    def apply(self, src, dst):
+        """Write `src` with replacements applied to `dst`.
+
+        Returns `False` (and does not touch `dst`) if nothing in `src`
+        should be replaced.
+
+        """
+        _, ext = os.path.splitext(src)
+        if ext not in self.matchers or os.path.getsize(src) == 0:
+            return False
+
+        pattern, targets = self.matchers[ext]
+        with open(src, 'rb') as f:
+            with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as content:
+                if pattern.search(content) is None:
+                    return False
+
+                replaced = pattern.sub(
+                    lambda match: targets[match.group(0)], content)
+
+        with open(dst, 'wb') as f:
+            f.write(replaced)
+
+        return True
@@ -0,0 +1,123 @@
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from time import perf_counter
+
+import click
+
+from .describer import Describer
+
+
+class Cancelled(Exception):
+    """Raised by a step to stop scheduling of any further steps."""
+
+
+class Scheduler(Describer):
+    """Run steps of a dependency graph, independent ones concurrently.
+
+    Each step is a function receiving results of all steps finished so far
+    and it's started as soon as all steps it depends on are done. Steps
+    must be added after the steps they depend on, which guarantees the
+    graph has no cycles.
+
+    If a step fails no further steps are started and the error is raised
+    once the running ones are done. A step raising `Cancelled` stops the
+    graph the same way, but `run` returns `False` instead.
+
+    Durations of steps are recorded in `metrics` (if given) as well.
+
+    """
+
+    def __init__(self, workers=4, metrics=None):
+        self.workers = workers
+        self.metrics = metrics
+        self.steps = {}
+        self.results = {}
+        self.timings = {}
+
+    def add(self, name, fn, depends_on=None):
+
+        depends_on = list(depends_on or [])
+        for dependency in depends_on:
+            if dependency not in self.steps:
+                raise ValueError(f'unknown dependency "{dependency}"')
+
+        self.steps[name] = (fn, depends_on)
+
+    def run(self):
+
+        pending = dict(self.steps)
+        running = {}
+        cancelled, error = False, None
+        with ThreadPoolExecutor(max_workers=self.workers) as executor:
+            while pending or running:
+                if not cancelled and error is None:
+                    for name, (fn, depends_on) in list(pending.items()):
+                        if all(d in self.results for d in depends_on):
+                            del pending[name]
+                            running[executor.submit(
+                                self.run_step, name, fn)] = name
+
+                if not running:
+                    break
+
+                done, _ = wait(running, return_when=FIRST_COMPLETED)
+                for future in done:
+                    name = running.pop(future)
+                    try:
+                        self.results[name] = future.result()
+
+                    except Cancelled:
+                        cancelled = True
+
+                    except Exception as e:
+                        error = error or e
+
+        if error is not None:
+            raise error
+
+        return not cancelled
+
+    def run_step(self, name, fn):
+
+        started_at = perf_counter()
+        try:
+            with self.subheader(name):
+                return fn(self.results)
+
+        finally:
+            self.timings[name] = (started_at, perf_counter())
+
+    def get_critical_path(self):
+        """Return chain of steps which determined the total duration.
+
+        It starts with the step which finished last and walks back through
+        the dependency which finished last.
+
+        """
+        if not self.timings:
+            return []
+
+        name = max(self.timings, key=lambda n: self.timings[n][1])
+        path = [name]
+        while True:
+            depends_on = [
+                d for d in self.steps[name][1] if d in self.timings]
+            if not depends_on:
+                break
+
+            name = max(depends_on, key=lambda n: self.timings[n][1])
+            path.insert(0, name)
+
+        return path
+
+    def report(self):
+
+        critical_path = self.get_critical_path()
+        for name in self.steps:
+            if name not in self.timings:
+                continue
+
+            started_at, finished_at = self.timings[name]
+            marker = '*' if name in critical_path else ' '
+            click.secho(
+                f'{marker} {name}: {finished_at - started_at:.2f}s',
+                fg='white')
@@ -0,0 +1,53 @@
+import os
+import shutil
+
+
+class Staging:
+    """Mapping of bucket keys to the local files which should land there.
+
+    It allows one to upload files straight from the build directory without
+    copying them to an intermediate directory first. Only files which had
+    to be changed are stored elsewhere.
+
+    """
+
+    def __init__(self):
+        self.files = {}
+
+    @classmethod
+    def from_dir(cls, path):
+
+        staging = cls()
+        for subdir, dirs, files in os.walk(path):
+            for file in files:
+                filepath = os.path.join(subdir, file)
+                staging.add(os.path.relpath(filepath, path), filepath)
+
+        return staging
+
+    def add(self, key, path):
+        self.files[key] = path
+
+    def __iter__(self):
+        return iter(self.files.items())
+
+    def __len__(self):
+        return len(self.files)
+
+    def materialize(self, path):
+        """Create physical directory tree reflecting the staging at `path`.
+
+        Files are hard linked whenever possible, otherwise they're copied.
+
+        """
+        for key, src in self:
+            dst = os.path.join(path, key)
+            os.makedirs(os.path.dirname(dst), exist_ok=True)
+
+            try:
+                os.link(src, dst)
+
+            except OSError:
+                shutil.copy2(src, dst)
+
+        return path
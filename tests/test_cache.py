@@ -0,0 +1,138 @@
+from concurrent.futures import ThreadPoolExecutor
+import os
+import pickle
+import time
+from unittest import TestCase
+
+import pytest
+
+from lily_delivery.cache import ArtifactCache
+
+
+class ArtifactCacheTestCase(TestCase):
+
+    @pytest.fixture(autouse=True)
+    def initfixtures(self, tmpdir):
+        self.tmpdir = tmpdir
+
+    def setUp(self):
+        self.cache = ArtifactCache(str(self.tmpdir.join('cache')), 100)
+
+    #
+    # GET_KEY
+    #
+    def test_get_key(self):
+
+        key = ArtifactCache.get_key('gzip', 'a8f9', 9)
+
+        assert key == ArtifactCache.get_key('gzip', 'a8f9', 9)
+        assert key != ArtifactCache.get_key('gzip', 'a8f9', 6)
+        assert key != ArtifactCache.get_key('replacements', 'a8f9', 9)
+
+    #
+    # GET / PUT
+    #
+    def test_get__missing(self):
+
+        assert self.cache.get(ArtifactCache.get_key('x')) is None
+
+    def test_put_and_get(self):
+
+        key = ArtifactCache.get_key('x')
+
+        path = self.cache.put(key, [b'abc', b'def'])
+
+        assert self.cache.get(key) == path
+        with open(path, 'rb') as f:
+            assert f.read() == b'abcdef'
+
+    def test_put_file(self):
+
+        source = self.tmpdir.join('main.js')
+        source.write('console.log(1)')
+        key = ArtifactCache.get_key('y')
+
+        path = self.cache.put_file(key, str(source))
+
+        with open(path, 'r') as f:
+            assert f.read() == 'console.log(1)'
+
+    def test_pickle(self):
+
+        key = ArtifactCache.get_key('x')
+        self.cache.put(key, [b'abc'])
+
+        cache = pickle.loads(pickle.dumps(self.cache))
+
+        assert cache.get(key) == self.cache.get(key)
+        cache.put(ArtifactCache.get_key('y'), [b'def'])
+
+    def test_get_or_put__builds_once(self):
+
+        key = ArtifactCache.get_key('x')
+        builds = []
+
+        def build():
+            builds.append(1)
+            time.sleep(0.05)
+
+            return [b'abc']
+
+        with ThreadPoolExecutor(max_workers=4) as executor:
+            paths = list(executor.map(
+                lambda _: self.cache.get_or_put(key, build), range(4)))
+
+        assert builds == [1]
+        assert set(paths) == {self.cache.get_path(key)}
+
+    #
+    # EVICT
+    #
+    def test_evict__removes_least_recently_used(self):
+
+        a, b, c = [ArtifactCache.get_key(name) for name in 'abc']
+        self.cache.put(a, [b'a' * 40])
+        self.cache.put(b, [b'b' * 40])
+        os.utime(self.cache.get_path(a), (1, 1))
+        os.utime(self.cache.get_path(b), (2, 2))
+
+        # -- a is used so it becomes the most recent one
+        assert self.cache.get(a)
+
+        self.cache.put(c, [b'c' * 40])
+
+        assert self.cache.get(a)
+        assert self.cache.get(b) is None
+        assert self.cache.get(c)
+        assert self.cache.size == 80
+
+    def test_evict__keeps_artifact_being_put(self):
+
+        a, b = ArtifactCache.get_key('a'), ArtifactCache.get_key('b')
+        self.cache.put(a, [b'a' * 40])
+
+        path = self.cache.put(b, [b'b' * 120])
+
+        assert self.cache.get(a) is None
+        assert self.cache.get(b) == path
+
+    def test_evict__ignores_other_files(self):
+
+        inventory = self.tmpdir.join('cache').mkdir('inventory')
+        inventory.join('my_bucket.json').write('x' * 200)
+        self.tmpdir.join('cache').join('history.jsonl').write('x' * 200)
+
+        self.cache.put(ArtifactCache.get_key('a'), [b'a' * 40])
+
+        assert self.cache.size == 40
+        assert inventory.join('my_bucket.json').check()
+        assert self.tmpdir.join('cache').join('history.jsonl').check()
+
+    def test_evict__size_survives_new_instances(self):
+
+        self.cache.put(ArtifactCache.get_key('a'), [b'a' * 40])
+
+        cache = ArtifactCache(str(self.tmpdir.join('cache')), 100)
+        cache.put(ArtifactCache.get_key('b'), [b'b' * 40])
+
+        assert cache.size == 80
@@ -1,7 +1,9 @@
 
 from unittest import TestCase
-from unittest.mock import call
+from unittest.mock import ANY, call
 import os
+import subprocess
+import sys
 
 from click.testing import CliRunner
 import pytest
@@ -25,10 +27,10 @@ class CLITestCase(TestCase):
     def test_deploy_angular_cli_to_s3__makes_the_right_calls(self):
 
         cwd = self.tmpdir.mkdir('cwd')
-        cwd.join('.lily_delivery.yaml').write('something')
+        cwd.join('.lily_delivery.yaml').write('meta: something')
         self.mocker.patch.object(os, 'getcwd').return_value = str(cwd)
         AngularCLIS3WebsiteDeployer = self.mocker.patch(  # noqa
-            'lily_delivery.cli.AngularCLIS3WebsiteDeployer')
+            'lily_delivery.deployers.AngularCLIS3WebsiteDeployer')
 
         result = self.runner.invoke(
             cli,
@@ -42,10 +44,107 @@ class CLITestCase(TestCase):
 
         assert result.exit_code == 0
         assert result.output == ''
+        assert (
+            AngularCLIS3WebsiteDeployer.deploy_environments.call_args_list ==
+            [
+                call(
+                    conf={'meta': 'something'},
+                    environments=['integration'],
+                    project='my-project',
+                    workers=None,
+                    serial_transform=False,
+                    context=ANY,
+                ),
+            ])
+
+    def test_deploy_angular_cli_to_s3__multiple_environments(self):
+
+        cwd = self.tmpdir.mkdir('cwd')
+        cwd.join('.lily_delivery.yaml').write('meta: something')
+        self.mocker.patch.object(os, 'getcwd').return_value = str(cwd)
+        AngularCLIS3WebsiteDeployer = self.mocker.patch(  # noqa
+            'lily_delivery.deployers.AngularCLIS3WebsiteDeployer')
+
+        result = self.runner.invoke(
+            cli,
+            [
+                'deploy-angular-cli-to-s3',
+                '--project',
+                'my-project',
+                '--environment',
+                'integration',
+                '--environment',
+                'production',
+            ])
+
+        assert result.exit_code == 0
+        assert (
+            AngularCLIS3WebsiteDeployer.deploy_environments.call_args_list ==
+            [
+                call(
+                    conf={'meta': 'something'},
+                    environments=['integration', 'production'],
+                    project='my-project',
+                    workers=None,
+                    serial_transform=False,
+                    context=ANY,
+                ),
+            ])
+
+    #
+    # PRUNE_S3_RELEASES
+    #
+    def test_prune_s3_releases(self):
+
+        cwd = self.tmpdir.mkdir('cwd')
+        cwd.join('.lily_delivery.yaml').write('meta: something')
+        self.mocker.patch.object(os, 'getcwd').return_value = str(cwd)
+        AngularCLIS3WebsiteDeployer = self.mocker.patch(  # noqa
+            'lily_delivery.deployers.AngularCLIS3WebsiteDeployer')
+
+        result = self.runner.invoke(
+            cli,
+            [
+                'prune-s3-releases',
+                '--environment',
+                'production',
+                '--keep',
+                '3',
+                '--dry-run',
+            ])
+
+        assert result.exit_code == 0
         assert AngularCLIS3WebsiteDeployer.call_args_list == [
             call(
-                conf='something',
-                environment='integration',
-                project='my-project',
-            ),
+                conf={'meta': 'something'},
+                environment='production',
+                project=None,
+                workers=None,
+                context=ANY),
         ]
+        prune = AngularCLIS3WebsiteDeployer.return_value.prune
+        assert prune.call_args_list == [call(3, dry_run=True)]
+
+    #
+    # STARTUP
+    #
+    def test_help__does_not_import_heavy_dependencies(self):
+
+        output = subprocess.run(
+            [
+                sys.executable,
+                '-c',
+                'import sys\n'
+                'from lily_delivery.cli import cli\n'
+                'try:\n'
+                '    cli(["--help"])\n'
+                'except SystemExit:\n'
+                '    pass\n'
+                'print(sorted(\n'
+                '    name for name in ["boto3", "botocore", "yaml"]\n'
+                '    if name in sys.modules))\n',
+            ],
+            check=True,
+            stdout=subprocess.PIPE).stdout.decode('utf-8')
+
+        assert output.splitlines()[-1] == '[]'
@@ -0,0 +1,88 @@
+import os
+from unittest import TestCase
+
+import pytest
+
+from lily_delivery.compression_policy import CompressionPolicy
+from lily_delivery.content_type import get_content_type
+
+
+class CompressionPolicyTestCase(TestCase):
+
+    @pytest.fixture(autouse=True)
+    def initfixtures(self, tmpdir):
+        self.tmpdir = tmpdir
+
+    def write(self, name, content):
+        f = self.tmpdir.join(name)
+        f.write(content, mode='wb')
+
+        return str(f)
+
+    #
+    # GET_LEVEL
+    #
+    def test_get_level__compressible(self):
+
+        path = self.write('main.js', b'console.log(1);' * 100)
+
+        assert CompressionPolicy().get_level(path) == 9
+        assert CompressionPolicy(level=6).get_level(path) == 6
+
+    def test_get_level__already_compressed_content_types(self):
+
+        policy = CompressionPolicy()
+
+        assert policy.get_level(self.write('logo.png', b'png')) is None
+        assert policy.get_level(self.write('photo.jpg', b'jpg')) is None
+        assert policy.get_level(self.write('font.woff2', b'woff')) is None
+        assert policy.get_level(self.write('intro.mp4', b'mp4')) is None
+
+    def test_get_level__custom_skipped_content_types(self):
+
+        path = self.write('main.js', b'console.log(1);' * 100)
+        policy = CompressionPolicy(
+            skip_content_types=[get_content_type(path)])
+
+        assert policy.get_level(path) is None
+
+    def test_get_level__min_size(self):
+
+        policy = CompressionPolicy(min_size=100)
+
+        assert policy.get_level(self.write('a.js', b'a' * 99)) is None
+        assert policy.get_level(self.write('b.js', b'a' * 100)) == 9
+
+    def test_get_level__per_content_type_levels(self):
+
+        policy = CompressionPolicy(levels={'text/html': 4})
+
+        assert policy.get_level(self.write('index.html', b'<html>')) == 4
+        assert policy.get_level(self.write('main.css', b'a {}')) == 9
+
+    def test_get_level__sample_check(self):
+
+        policy = CompressionPolicy(sample_size=4096)
+
+        assert policy.get_level(
+            self.write('random.js', os.urandom(8192))) is None
+        assert policy.get_level(
+            self.write('main.js', b'console.log(1);' * 1000)) == 9
+
+    #
+    # FROM_CONF
+    #
+    def test_from_conf(self):
+
+        policy = CompressionPolicy.from_conf({
+            'level': 6,
+            'min_size': 1024,
+            'sample_size': 4096,
+            'skip_content_types': ['application/wasm'],
+        })
+
+        assert policy.level == 6
+        assert policy.min_size == 1024
+        assert policy.sample_size == 4096
+        assert 'application/wasm' in policy.skip_content_types
+        assert 'image/png' in policy.skip_content_types
@@ -0,0 +1,116 @@
+import base64
+import gzip
+import hashlib
+import os
+from unittest import TestCase
+
+import pytest
+
+from lily_delivery.compressor import (
+    CachedGzipStream,
+    GzipStream,
+    get_content_md5,
+)
+
+
+class GzipStreamTestCase(TestCase):
+
+    @pytest.fixture(autouse=True)
+    def initfixtures(self, tmpdir):
+        self.tmpdir = tmpdir
+
+    #
+    # ITER
+    #
+    def test_iter__yields_compressed_chunks(self):
+
+        content = os.urandom(256 * 1024)
+        f = self.tmpdir.join('vendor.js')
+        f.write(content, mode='wb')
+
+        stream = GzipStream(str(f), chunk_size=1024)
+        chunks = list(stream)
+
+        assert len(chunks) > 1
+        assert gzip.decompress(b''.join(chunks)) == content
+        assert stream.raw_size == len(content)
+        assert stream.size == len(b''.join(chunks))
+        assert stream.md5.hexdigest() == hashlib.md5(
+            b''.join(chunks)).hexdigest()
+
+    def test_iter__is_deterministic(self):
+
+        f = self.tmpdir.join('main.js')
+        f.write('console.log("hi")')
+
+        assert GzipStream(str(f)).read() == GzipStream(str(f)).read()
+
+    def test_iter__empty_file(self):
+
+        f = self.tmpdir.join('empty.js')
+        f.write('')
+
+        assert gzip.decompress(GzipStream(str(f)).read()) == b''
+
+    #
+    # PARTS
+    #
+    def test_parts(self):
+
+        content = os.urandom(256 * 1024)
+        f = self.tmpdir.join('vendor.js')
+        f.write(content, mode='wb')
+
+        parts = list(GzipStream(str(f), chunk_size=1024).parts(64 * 1024))
+
+        assert len(parts) > 1
+        assert all(len(part) >= 64 * 1024 for part in parts[:-1])
+        assert gzip.decompress(b''.join(parts)) == content
+
+    #
+    # CONTENT_MD5
+    #
+    def test_content_md5(self):
+
+        f = self.tmpdir.join('main.js')
+        f.write('console.log("hi")')
+
+        stream = GzipStream(str(f))
+        content = stream.read()
+
+        assert stream.content_md5 == base64.b64encode(
+            hashlib.md5(content).digest()).decode('ascii')
+        assert stream.content_md5 == get_content_md5(content)
+
+
+class CachedGzipStreamTestCase(TestCase):
+
+    @pytest.fixture(autouse=True)
+    def initfixtures(self, tmpdir):
+        self.tmpdir = tmpdir
+
+    #
+    # ITER
+    #
+    def test_iter__reads_cached_content(self):
+
+        source = self.tmpdir.join('main.js')
+        source.write('console.log("hi")')
+        cached = self.tmpdir.join('cached')
+        cached.write(GzipStream(str(source), level=6).read(), mode='wb')
+
+        stream = CachedGzipStream(str(cached), str(source), level=6)
+
+        assert stream.read() == cached.read(mode='rb')
+        assert stream.raw_size == len('console.log("hi")')
+
+    def test_iter__compresses_source_if_evicted(self):
+
+        source = self.tmpdir.join('main.js')
+        source.write('console.log("hi")')
+
+        stream = CachedGzipStream(
+            str(self.tmpdir.join('evicted')), str(source), level=6)
+
+        assert stream.read() == GzipStream(str(source), level=6).read()
+        assert stream.raw_size == len('console.log("hi")')
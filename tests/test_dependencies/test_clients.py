@@ -0,0 +1,67 @@
+from unittest import TestCase
+
+import pytest
+
+from lily_delivery.dependencies import clients, get_client
+
+
+class GetClientTestCase(TestCase):
+
+    @pytest.fixture(autouse=True)
+    def initfixtures(self, mocker):
+        self.mocker = mocker
+
+    def setUp(self):
+        self.mocker.patch.object(clients, 'sessions', {})
+        self.mocker.patch.object(clients, 'clients', {})
+
+    def test_get_client__shared_for_the_same_credentials(self):
+
+        s3 = get_client('s3', 'key', 'secret', 'eu-central-1')
+
+        assert get_client('s3', 'key', 'secret', 'eu-central-1') is s3
+        assert get_client('s3', 'other', 'secret', 'eu-central-1') is not s3
+        assert len(clients.sessions) == 2
+
+    def test_get_client__one_session_per_credentials(self):
+
+        get_client('s3', 'key', 'secret', 'eu-central-1')
+        get_client('cloudfront', 'key', 'secret', 'eu-central-1')
+
+        assert len(clients.sessions) == 1
+        assert len(clients.clients) == 2
+
+    def test_get_client__config(self):
+
+        client = get_client(
+            's3',
+            'key',
+            'secret',
+            'eu-central-1',
+            {
+                'max_pool_connections': 64,
+                'tcp_keepalive': True,
+                'retries': {'mode': 'adaptive', 'max_attempts': 7},
+            })
+
+        assert client.meta.config.max_pool_connections == 64
+        assert client.meta.config.tcp_keepalive is True
+        assert client.meta.config.retries['mode'] == 'adaptive'
+        assert get_client(
+            's3',
+            'key',
+            'secret',
+            'eu-central-1',
+            {'max_pool_connections': 32}) is not client
+
+    def test_get_client__endpoint_url(self):
+
+        client = get_client(
+            's3',
+            'key',
+            'secret',
+            'eu-central-1',
+            endpoint_url='http://127.0.0.1:9000')
+
+        assert client.meta.endpoint_url == 'http://127.0.0.1:9000'
+        assert get_client('s3', 'key', 'secret', 'eu-central-1') is not client
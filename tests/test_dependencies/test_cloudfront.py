@@ -7,7 +7,9 @@ from freezegun import freeze_time
 import click
 import pytest
 
-from lily_delivery.dependencies import Cloudfront
+from lily_delivery.dependencies import Cloudfront, PropagationTracker
+from lily_delivery.dependencies import cloudfront as cloudfront_module
+from lily_delivery.dependencies.cloudfront import get_invalidation_paths
 
 
 class CloudfrontTestCase(TestCase):
@@ -122,6 +124,71 @@ class CloudfrontTestCase(TestCase):
             ),
         ]
 
+    def test_update_frontend_routing__already_up_to_date(self):
+
+        get_distribution = self.mocker.patch.object(
+            self.cloudfront.client, 'get_distribution')
+        get_distribution.return_value = {
+            'ETag': 's7f8sd7f',
+            'Distribution': {
+                'DistributionConfig': {
+                    'some': 'config',
+                    'CustomErrorResponses': {
+                        'Quantity': 1,
+                        'Items': [
+                            {
+                                'ErrorCode': 404,
+                                'ResponsePagePath': '/index-1.5.6.html',
+                                'ResponseCode': '200',
+                                'ErrorCachingMinTTL': 300,
+                            },
+                        ],
+                    },
+                }
+            }
+        }
+        update_distribution = self.mocker.patch.object(
+            self.cloudfront.client, 'update_distribution')
+
+        assert self.cloudfront.update_frontend_routing(
+            'index-1.5.6.html') is None
+        assert update_distribution.call_count == 0
+
+    #
+    # IS_DEPLOYED
+    #
+    def test_is_deployed(self):
+
+        self.mocker.patch.object(
+            self.cloudfront.client,
+            'get_distribution'
+        ).side_effect = [
+            {'Distribution': {'Status': 'InProgress'}},
+            {'Distribution': {'Status': 'Deployed'}},
+        ]
+
+        assert self.cloudfront.is_deployed() is False
+        assert self.cloudfront.is_deployed() is True
+
+    #
+    # IS_INVALIDATED
+    #
+    def test_is_invalidated(self):
+
+        get_invalidation = self.mocker.patch.object(
+            self.cloudfront.client, 'get_invalidation')
+        get_invalidation.side_effect = [
+            {'Invalidation': {'Status': 'InProgress'}},
+            {'Invalidation': {'Status': 'Completed'}},
+        ]
+
+        assert self.cloudfront.is_invalidated('I2J0I21') is False
+        assert self.cloudfront.is_invalidated('I2J0I21') is True
+        assert get_invalidation.call_args_list == [
+            call(DistributionId='DS09D0S', Id='I2J0I21'),
+            call(DistributionId='DS09D0S', Id='I2J0I21'),
+        ]
+
     #
     # INVALIDATE_CACHE
     #
@@ -144,3 +211,122 @@ class CloudfrontTestCase(TestCase):
                     'CallerReference': '1542988578.0',
                 }),
         ]
+
+    @freeze_time('2018-11-23 15:56:18')
+    def test_invalidate_cache__selected_paths(self):
+
+        create_invalidation = self.mocker.patch.object(
+            self.cloudfront.client, 'create_invalidation')
+        create_invalidation.return_value = {'Invalidation': {'Id': 'I2J0'}}
+
+        assert self.cloudfront.invalidate_cache(
+            ['/', '/index-1.5.6.html']) == 'I2J0'
+
+        assert create_invalidation.call_args_list == [
+            call(
+                DistributionId='DS09D0S',
+                InvalidationBatch={
+                    'Paths': {
+                        'Quantity': 2,
+                        'Items': ['/', '/index-1.5.6.html'],
+                    },
+                    'CallerReference': '1542988578.0',
+                }),
+        ]
+
+
+class PropagationTrackerTestCase(TestCase):
+
+    @pytest.fixture(autouse=True)
+    def initfixtures(self, mocker):
+        self.mocker = mocker
+
+    def setUp(self):
+        self.sleep = self.mocker.patch.object(cloudfront_module, 'sleep')
+        self.tracker = PropagationTracker(
+            initial_delay=1, max_delay=3, timeout=1000)
+
+    #
+    # TRACK
+    #
+    def test_track__polls_with_backoff(self):
+
+        checks = iter([False, False, False, False, True])
+
+        self.tracker.track('distribution', lambda: next(checks))
+        durations = self.tracker.wait()
+
+        assert list(durations.keys()) == ['distribution']
+        assert durations['distribution'] >= 0
+        assert self.sleep.call_args_list == [
+            call(1), call(2), call(3), call(3),
+        ]
+
+    def test_track__ignores_connection_errors(self):
+
+        checks = iter([EndpointConnectionError(endpoint_url='/url'), True])
+
+        def check():
+            result = next(checks)
+            if isinstance(result, Exception):
+                raise result
+
+            return result
+
+        self.tracker.track('invalidation', check)
+
+        assert self.tracker.wait()['invalidation'] is not None
+
+    def test_track__timeout(self):
+
+        self.tracker.timeout = 0
+
+        self.tracker.track('distribution', lambda: False)
+
+        assert self.tracker.wait() == {'distribution': None}
+
+
+@pytest.mark.parametrize(
+    'paths,max_paths,expected',
+    [
+        # -- case 0: within limits
+        (['/', '/index.html'], 2, ['/', '/index.html']),
+
+        # -- case 1: deepest directories merged first
+        (
+            ['/', '/1/a.js', '/1/b.js', '/1/x/c.js', '/1/x/d.js', '/1/x/e.js'],
+            4,
+            ['/', '/1/a.js', '/1/b.js', '/1/x/*'],
+        ),
+
+        # -- case 2: merged until it fits
+        (
+            ['/', '/1/a.js', '/1/b.js', '/1/x/c.js', '/1/x/d.js', '/1/x/e.js'],
+            3,
+            ['/', '/1/*'],
+        ),
+
+        # -- case 3: single directory merged
+        (
+            ['/', '/1/a.js', '/1/x/c.js', '/1/x/d.js', '/1/x/e.js'],
+            3,
+            ['/', '/1/a.js', '/1/x/*'],
+        ),
+
+        # -- case 4: nothing to merge, falls back to everything
+        (['/a.js', '/b.js', '/c.js'], 2, ['/*']),
+    ])
+def test_get_invalidation_paths(paths, max_paths, expected):
+
+    assert get_invalidation_paths(paths, max_paths=max_paths) == expected
+
+
+def test_get_invalidation_paths__too_many_wildcards():
+
+    paths = [f'/{i}/{name}.js' for i in range(4) for name in 'ab']
+
+    assert get_invalidation_paths(paths, max_paths=4) == [
+        '/0/*', '/1/*', '/2/*', '/3/*',
+    ]
+    assert get_invalidation_paths(
+        paths, max_paths=4, max_wildcards=3) == ['/*']
@@ -0,0 +1,84 @@
+import time
+from unittest import TestCase
+
+import pytest
+
+from lily_delivery.dependencies.inventory import Inventory
+
+
+class InventoryTestCase(TestCase):
+
+    @pytest.fixture(autouse=True)
+    def initfixtures(self, tmpdir):
+        self.tmpdir = tmpdir
+
+    def setUp(self):
+        self.inventory = Inventory(
+            'my_bucket', path=str(self.tmpdir.join('inventory')))
+
+    #
+    # LOAD / SAVE
+    #
+    def test_load__missing(self):
+
+        assert self.inventory.load() is False
+        assert self.inventory.is_loaded is False
+
+    def test_save_and_load(self):
+
+        self.inventory.add('index-1.0.0.html', '"a1"', 4)
+        self.inventory.add('1.0.0/main.js', '"b2"', 5)
+        self.inventory.mark_refreshed()
+        self.inventory.save()
+
+        inventory = Inventory(
+            'my_bucket', path=str(self.tmpdir.join('inventory')))
+
+        assert inventory.load() is True
+        assert inventory.objects == self.inventory.objects
+        assert inventory.prefixes == set(['1.0.0/'])
+        assert inventory.refreshed_at == self.inventory.refreshed_at
+
+    #
+    # IS_STALE
+    #
+    def test_is_stale(self):
+
+        assert self.inventory.is_stale() is True
+
+        self.inventory.mark_refreshed()
+        assert self.inventory.is_stale() is False
+
+        self.inventory.refreshed_at = time.time() - 25 * 60 * 60
+        assert self.inventory.is_stale() is True
+
+    #
+    # LOOKUPS
+    #
+    def test_lookups(self):
+
+        self.inventory.add('1.0.0/main.js', '"b2"', 5)
+
+        assert '1.0.0/main.js' in self.inventory
+        assert '1.0.0/other.js' not in self.inventory
+        assert self.inventory.get('1.0.0/main.js') == {
+            'etag': '"b2"',
+            'size': 5,
+        }
+
+    #
+    # REMOVE_PREFIX
+    #
+    def test_remove_prefix(self):
+
+        self.inventory.add('index-1.0.0.html', '"a1"', 4)
+        self.inventory.add('1.0.0/main.js', '"b2"', 5)
+        self.inventory.add('1.0.1/main.js', '"c3"', 6)
+
+        self.inventory.remove_prefix('1.0.0/')
+
+        assert sorted(self.inventory.keys()) == [
+            '1.0.1/main.js',
+            'index-1.0.0.html',
+        ]
+        assert self.inventory.prefixes == set(['1.0.1/'])
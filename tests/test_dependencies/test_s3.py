@@ -1,13 +1,40 @@
 
 import gzip
+import io
+import itertools
+import os
 from unittest import TestCase
 from unittest.mock import call
 
-from botocore.exceptions import EndpointConnectionError, ClientError
+from botocore.exceptions import (
+    ClientError,
+    ConnectionClosedError,
+    EndpointConnectionError,
+    ParamValidationError,
+    ReadTimeoutError,
+)
 import click
 import pytest
 
+from lily_delivery import compressor
+from lily_delivery.cache import ArtifactCache
+from lily_delivery.compressor import GzipStream, get_content_md5
+from lily_delivery.content_type import get_content_type
 from lily_delivery.dependencies import S3
+from lily_delivery.dependencies import s3 as s3_module
+from lily_delivery.dependencies.inventory import Inventory
+from lily_delivery.journal import Journal
+from lily_delivery.manifest import get_file_hash
+from lily_delivery.metadata_policy import MetadataPolicy
+
+
+def gzipped(content):
+
+    buffer = io.BytesIO()
+    with gzip.GzipFile(fileobj=buffer, mode='wb', mtime=0) as f:
+        f.write(content)
+
+    return buffer.getvalue()
 
 
 class S3TestCase(TestCase):
@@ -81,11 +108,13 @@ class S3TestCase(TestCase):
     #
     def test_check_if_key_exists__exists(self):
 
-        get_object = self.mocker.patch.object(self.s3.client, 'get_object')
-        get_object.return_value = {'ResponseMetadata': {'HTTPStatusCode': 200}}
+        head_object = self.mocker.patch.object(self.s3.client, 'head_object')
+        head_object.return_value = {
+            'ResponseMetadata': {'HTTPStatusCode': 200},
+        }
 
         assert self.s3.check_if_key_exists('index.html') is True
-        assert get_object.call_args_list == [
+        assert head_object.call_args_list == [
             call(Bucket='my_bucket', Key='index.html'),
         ]
 
@@ -93,9 +122,9 @@ class S3TestCase(TestCase):
 
         self.mocker.patch.object(
             self.s3.client,
-            'get_object'
+            'head_object'
         ).side_effect = ClientError(
-            operation_name='GET_OBJECT',
+            operation_name='HEAD_OBJECT',
             error_response={'ResponseMetadata': {'HTTPStatusCode': 404}})
 
         assert self.s3.check_if_key_exists('index.html') is False
@@ -104,10 +133,10 @@ class S3TestCase(TestCase):
 
         self.mocker.patch.object(
             self.s3.client,
-            'get_object'
+            'head_object'
         ).side_effect = [
             ClientError(
-                operation_name='GET_OBJECT',
+                operation_name='HEAD_OBJECT',
                 error_response={'ResponseMetadata': {'HTTPStatusCode': 403}}),
             EndpointConnectionError(endpoint_url='/some/url'),
         ]
@@ -122,12 +151,311 @@ class S3TestCase(TestCase):
 
         assert e.value.message == 'could not connect to bucket specified'
 
+    #
+    # LIST_ROOT
+    #
+    def test_list_root(self):
+
+        get_paginator = self.mocker.patch.object(
+            self.s3.client, 'get_paginator')
+        get_paginator.return_value.paginate.return_value = [
+            {
+                'Contents': [
+                    {'Key': 'index-1.0.0.html', 'ETag': '"a1"', 'Size': 4},
+                ],
+                'CommonPrefixes': [{'Prefix': '1.0.0/'}],
+            },
+            {
+                'Contents': [
+                    {'Key': 'index-1.0.1.html', 'ETag': '"b2"', 'Size': 5},
+                ],
+            },
+        ]
+
+        assert self.s3.list_root() == (
+            {
+                'index-1.0.0.html': {'etag': '"a1"', 'size': 4},
+                'index-1.0.1.html': {'etag': '"b2"', 'size': 5},
+            },
+            set(['1.0.0/']),
+        )
+        assert get_paginator.call_args_list == [call('list_objects_v2')]
+        assert get_paginator.return_value.paginate.call_args_list == [
+            call(Bucket='my_bucket', Delimiter='/'),
+        ]
+
+    def test_list_root__connection_problem(self):
+
+        get_paginator = self.mocker.patch.object(
+            self.s3.client, 'get_paginator')
+        get_paginator.return_value.paginate.side_effect = (
+            EndpointConnectionError(endpoint_url='/some/url'))
+
+        with pytest.raises(click.ClickException) as e:
+            self.s3.list_root()
+
+        assert e.value.message == 'could not connect to bucket specified'
+
+    #
+    # LIST_RELEASES
+    #
+    def test_list_releases(self):
+
+        self.mocker.patch.object(self.s3, 'list_root').return_value = (
+            {
+                'index-1.0.0.html': {'etag': '"a1"', 'size': 4},
+                'manifest-1.0.0.json': {'etag': '"a2"', 'size': 4},
+                'index-1.0.1.html': {'etag': '"b1"', 'size': 5},
+                'index-404.html': {'etag': '"d1"', 'size': 5},
+                'favicon.ico': {'etag': '"c1"', 'size': 5},
+            },
+            set(['1.0.0/', '1.0.2/', 'assets/', '404/', '2024/']),
+        )
+
+        releases = self.s3.list_releases()
+
+        assert {
+            version: sorted(keys) for version, keys in releases.items()
+        } == {
+            '1.0.0': ['index-1.0.0.html', 'manifest-1.0.0.json'],
+            '1.0.1': ['index-1.0.1.html'],
+            '1.0.2': [],
+        }
+
+    def test_get_version_key(self):
+
+        assert sorted(
+            ['1.10.0', 'v1.9.1', '1.9.0', '2.0.0'],
+            key=s3_module.get_version_key
+        ) == ['1.9.0', 'v1.9.1', '1.10.0', '2.0.0']
+
+    def test_get_version_key__prereleases(self):
+
+        assert sorted(
+            [
+                '1.0.1-rc.1',
+                '1.0.0',
+                '1.0.0-rc.1',
+                '0.9.0',
+                '1.0.0-rc.10',
+                '1.0.0-rc.2',
+                '1.0.0-alpha',
+                '1.0.0-beta+build.5',
+            ],
+            key=s3_module.get_version_key
+        ) == [
+            '0.9.0',
+            '1.0.0-alpha',
+            '1.0.0-beta+build.5',
+            '1.0.0-rc.1',
+            '1.0.0-rc.2',
+            '1.0.0-rc.10',
+            '1.0.0',
+            '1.0.1-rc.1',
+        ]
+
+    #
+    # DELETE_KEYS
+    #
+    def test_delete_keys__in_batches(self):
+
+        delete_objects = self.mocker.patch.object(
+            self.s3.client, 'delete_objects')
+        delete_objects.return_value = {}
+        self.s3.inventory = Inventory(
+            'my_bucket', path=str(self.tmpdir.join('inventory')))
+        self.s3.inventory.add('1.0.0/0.js', '"a1"', 4)
+        self.s3.inventory.add('1.0.1/0.js', '"a1"', 4)
+        keys = [f'1.0.0/{i}.js' for i in range(2500)]
+
+        self.s3.delete_keys(keys, workers=3)
+
+        batches = [
+            [obj['Key'] for obj in c[1]['Delete']['Objects']]
+            for c in delete_objects.call_args_list
+        ]
+        assert sorted(len(batch) for batch in batches) == [500, 1000, 1000]
+        assert sorted(key for batch in batches for key in batch) == (
+            sorted(keys))
+        assert self.s3.inventory.keys() == ['1.0.1/0.js']
+
+    def test_delete_keys__errors(self):
+
+        self.mocker.patch.object(
+            self.s3.client, 'delete_objects'
+        ).return_value = {
+            'Errors': [{'Key': '1.0.0/main.js', 'Message': 'Access Denied'}],
+        }
+
+        with pytest.raises(click.ClickException) as e:
+            self.s3.delete_keys(['1.0.0/main.js', '1.0.0/vendor.js'])
+
+        assert e.value.message == 'failed to delete 1 file(s)'
+
+    #
+    # CHECK_IF_RELEASE_EXISTS
+    #
+    def test_check_if_release_exists(self):
+
+        self.mocker.patch.object(self.s3, 'list_root').return_value = (
+            {
+                'index-1.0.0.html': {'etag': '"a1"', 'size': 4},
+                'index-1.0.1.html': {'etag': '"b2"', 'size': 5},
+            },
+            set(['1.0.0/', '1.0.2/']),
+        )
+
+        assert self.s3.check_if_release_exists(
+            'index-1.0.0.html', '1.0.0') is True
+        assert self.s3.check_if_release_exists(
+            'index-1.0.1.html', '1.0.1') is True
+        assert self.s3.check_if_release_exists(
+            'index-1.0.2.html', '1.0.2') is True
+        assert self.s3.check_if_release_exists(
+            'index-1.0.3.html', '1.0.3') is False
+
+    def test_check_if_release_exists__uses_inventory(self):
+
+        list_root = self.mocker.patch.object(self.s3, 'list_root')
+        self.s3.inventory = Inventory(
+            'my_bucket', path=str(self.tmpdir.join('inventory')))
+        self.s3.inventory.add('1.0.0/main.js', '"a1"', 4)
+        self.s3.inventory.mark_refreshed()
+
+        assert self.s3.check_if_release_exists(
+            'index-1.0.0.html', '1.0.0') is True
+        assert self.s3.check_if_release_exists(
+            'index-1.0.1.html', '1.0.1') is False
+        assert self.s3.check_if_key_exists('1.0.0/main.js') is True
+        assert list_root.call_count == 0
+
+    #
+    # REFRESH_INVENTORY
+    #
+    def test_refresh_inventory__full_listing(self):
+
+        self.s3.inventory = Inventory(
+            'my_bucket', path=str(self.tmpdir.join('inventory')))
+        list_objects = self.mocker.patch.object(self.s3, 'list_objects')
+        list_objects.return_value = {
+            'index-1.0.0.html': {'etag': '"a1"', 'size': 4},
+            '1.0.0/main.js': {'etag': '"b2"', 'size': 5},
+        }
+
+        self.s3.refresh_inventory()
+
+        assert list_objects.call_args_list == [call()]
+        assert self.s3.inventory.prefixes == set(['1.0.0/'])
+        assert self.s3.inventory.get('1.0.0/main.js') == {
+            'etag': '"b2"',
+            'size': 5,
+        }
+        assert os.path.exists(self.s3.inventory.path)
+
+    def test_refresh_inventory__incremental(self):
+
+        path = str(self.tmpdir.join('inventory'))
+        inventory = Inventory('my_bucket', path=path)
+        inventory.add('index-0.9.0.html', '"x"', 1)
+        inventory.add('0.9.0/main.js', '"y"', 2)
+        inventory.add('index-1.0.0.html', '"a1"', 4)
+        inventory.add('1.0.0/main.js', '"b2"', 5)
+        inventory.mark_refreshed()
+        inventory.save()
+
+        self.s3.inventory = Inventory('my_bucket', path=path)
+        self.mocker.patch.object(self.s3, 'list_root').return_value = (
+            {
+                'index-1.0.0.html': {'etag': '"a1"', 'size': 4},
+                'index-1.0.1.html': {'etag': '"c3"', 'size': 6},
+            },
+            set(['1.0.0/', '1.0.1/']),
+        )
+        list_objects = self.mocker.patch.object(self.s3, 'list_objects')
+        list_objects.return_value = {
+            '1.0.1/main.js': {'etag': '"d4"', 'size': 7},
+        }
+
+        self.s3.refresh_inventory()
+
+        assert list_objects.call_args_list == [call('1.0.1/')]
+        assert sorted(self.s3.inventory.keys()) == [
+            '1.0.0/main.js',
+            '1.0.1/main.js',
+            'index-1.0.0.html',
+            'index-1.0.1.html',
+        ]
+        assert self.s3.inventory.prefixes == set(['1.0.0/', '1.0.1/'])
+
+    def test_refresh_inventory__stale(self):
+
+        path = str(self.tmpdir.join('inventory'))
+        inventory = Inventory('my_bucket', path=path)
+        inventory.add('1.0.0/main.js', '"b2"', 5)
+        inventory.refreshed_at = 0
+        inventory.save()
+
+        self.s3.inventory = Inventory('my_bucket', path=path)
+        list_objects = self.mocker.patch.object(self.s3, 'list_objects')
+        list_objects.return_value = {}
+
+        self.s3.refresh_inventory()
+
+        assert list_objects.call_args_list == [call()]
+        assert self.s3.inventory.keys() == []
+
+    #
+    # GET_MANIFEST
+    #
+    def test_get_manifest(self):
+
+        get_object = self.mocker.patch.object(self.s3.client, 'get_object')
+        get_object.return_value = {
+            'Body': io.BytesIO(b'{"1.0.0/main.js": "8a9f"}'),
+        }
+
+        assert self.s3.get_manifest('manifest-1.0.0.json') == {
+            '1.0.0/main.js': '8a9f',
+        }
+        assert get_object.call_args_list == [
+            call(Bucket='my_bucket', Key='manifest-1.0.0.json'),
+        ]
+
+    def test_get_manifest__does_not_exist(self):
+
+        self.mocker.patch.object(
+            self.s3.client,
+            'get_object'
+        ).side_effect = ClientError(
+            operation_name='GET_OBJECT',
+            error_response={'ResponseMetadata': {'HTTPStatusCode': 404}})
+
+        assert self.s3.get_manifest('manifest-1.0.0.json') is None
+
+    #
+    # PUT_MANIFEST
+    #
+    def test_put_manifest(self):
+
+        put_object = self.mocker.patch.object(self.s3.client, 'put_object')
+
+        self.s3.put_manifest('manifest-1.0.0.json', {'main.js': '8a9f'})
+
+        assert put_object.call_args_list == [
+            call(
+                Body=b'{"main.js": "8a9f"}',
+                Bucket='my_bucket',
+                ContentType='application/json',
+                Key='manifest-1.0.0.json'),
+        ]
+
     #
     # UPLOAD_DIR
     #
     def test_upload_dir__makes_the_right_calls(self):
 
-        put_object = self.mocker.patch.object(self.s3.client, 'put_object')
+        put_object = self.mocker.patch.object(
+            self.s3.upload_client, 'put_object')
 
         build_dir = self.tmpdir.mkdir('build')
         build_dir.join('index.html').write('<html>')
@@ -139,33 +467,675 @@ class S3TestCase(TestCase):
         assert put_object.call_args_list == [
             call(
                 ACL='public-read',
-                Body=gzip.compress(b'<html>'),
+                Body=gzipped(b'<html>'),
                 Bucket='my_bucket',
+                ContentMD5=get_content_md5(gzipped(b'<html>')),
                 CacheControl='forever',
                 ContentEncoding='gzip',
                 ContentType='text/html',
                 Key='index.html'),
             call(
                 ACL='public-read',
-                Body=gzip.compress(b'abc'),
+                Body=b'abc',
                 Bucket='my_bucket',
+                ContentMD5=get_content_md5(b'abc'),
                 CacheControl='forever',
-                ContentEncoding='gzip',
                 ContentType='image/png',
                 Key='logo.png'),
             call(
                 ACL='public-read',
-                Body=gzip.compress(b'gif.it'),
+                Body=b'gif.it',
                 Bucket='my_bucket',
+                ContentMD5=get_content_md5(b'gif.it'),
                 CacheControl='forever',
-                ContentEncoding='gzip',
                 ContentType='image/gif',
                 Key='assets/asset.gif'),
         ]
 
+    def test_upload_dir__metadata_rules(self):
+
+        put_object = self.mocker.patch.object(
+            self.s3.upload_client, 'put_object')
+        self.s3.metadata_policy = MetadataPolicy(rules=[
+            {'glob': 'index.html', 'cache-control': 'no-cache'},
+            {
+                'regex': r'\.map$',
+                'content-type': 'application/json',
+                'compress': False,
+            },
+        ])
+
+        build_dir = self.tmpdir.mkdir('build')
+        build_dir.join('index.html').write('<html>')
+        release_dir = build_dir.mkdir('1.0.0')
+        release_dir.join('main.3f2a9c1b8e7d6a5f.js.map').write('{}')
+        release_dir.join('chunk-5ZDXMDWL.js').write('a')
+        release_dir.join('logo.png').write('abc')
+
+        self.s3.upload_dir(str(build_dir), {'cache-control': 'forever'})
+
+        assert sorted(
+            (
+                c[1]['Key'],
+                c[1]['CacheControl'],
+                c[1]['ContentType'],
+                c[1].get('ContentEncoding'),
+            )
+            for c in put_object.call_args_list
+        ) == [
+            (
+                '1.0.0/chunk-5ZDXMDWL.js',
+                'public, max-age=31536000, immutable',
+                get_content_type('chunk-5ZDXMDWL.js'),
+                'gzip',
+            ),
+            ('1.0.0/logo.png', 'forever', 'image/png', None),
+            (
+                '1.0.0/main.3f2a9c1b8e7d6a5f.js.map',
+                'public, max-age=31536000, immutable',
+                'application/json',
+                None,
+            ),
+            ('index.html', 'no-cache', 'text/html', 'gzip'),
+        ]
+
+    def test_upload_dir__collects_stats(self):
+
+        self.mocker.patch.object(self.s3.upload_client, 'put_object')
+
+        build_dir = self.tmpdir.mkdir('build')
+        build_dir.join('main.js').write('console.log(1);' * 100)
+        build_dir.join('logo.png').write('abc')
+
+        self.s3.upload_dir(str(build_dir), {'cache-control': 'forever'})
+
+        assert self.s3.stats.files_count == 2
+        assert self.s3.stats.compressed_count == 1
+        assert self.s3.stats.raw_size == 1503
+        assert self.s3.stats.size == 3 + len(
+            gzipped(b'console.log(1);' * 100))
+        assert self.s3.stats.saved_size == (
+            self.s3.stats.raw_size - self.s3.stats.size)
+
+    def test_upload_dir__uses_cache(self):
+
+        put_object = self.mocker.patch.object(
+            self.s3.upload_client, 'put_object')
+        self.s3.cache = ArtifactCache(str(self.tmpdir.join('cache')))
+        gzip_stream = self.mocker.spy(s3_module, 'GzipStream')
+
+        build_dir = self.tmpdir.mkdir('build')
+        build_dir.join('main.js').write('console.log(1);' * 100)
+
+        self.s3.upload_dir(str(build_dir), {'cache-control': 'forever'})
+        self.s3.upload_dir(str(build_dir), {'cache-control': 'forever'})
+
+        assert gzip_stream.call_count == 1
+        assert [c[1]['Body'] for c in put_object.call_args_list] == [
+            gzipped(b'console.log(1);' * 100),
+            gzipped(b'console.log(1);' * 100),
+        ]
+        assert self.s3.stats.raw_size == 1500
+        assert self.s3.stats.compressed_count == 1
+
+    def test_upload_dir__reports_cpu_time_of_cache_misses(self):
+
+        self.mocker.patch.object(self.s3.upload_client, 'put_object')
+        self.mocker.patch.object(
+            compressor.time, 'thread_time', side_effect=itertools.count())
+        self.s3.cache = ArtifactCache(str(self.tmpdir.join('cache')))
+
+        build_dir = self.tmpdir.mkdir('build')
+        build_dir.join('main.js').write('console.log(1);' * 100)
+
+        self.s3.upload_dir(str(build_dir), {'cache-control': 'forever'})
+
+        assert self.s3.stats.cpu_time > 0
+
+        # -- content served from the cache costs no compression
+        self.s3.upload_dir(str(build_dir), {'cache-control': 'forever'})
+
+        assert self.s3.stats.cpu_time == 0
+
+    def test_upload_dir__cache_smaller_than_artifacts(self):
+
+        put_object = self.mocker.patch.object(
+            self.s3.upload_client, 'put_object')
+        self.s3.cache = ArtifactCache(str(self.tmpdir.join('cache')), 10)
+
+        build_dir = self.tmpdir.mkdir('build')
+        build_dir.join('main.js').write('console.log(1);' * 100)
+        build_dir.join('vendor.js').write('console.log(2);' * 100)
+
+        self.s3.upload_dir(str(build_dir), {'cache-control': 'forever'})
+
+        assert sorted(c[1]['Body'] for c in put_object.call_args_list) == (
+            sorted([
+                gzipped(b'console.log(1);' * 100),
+                gzipped(b'console.log(2);' * 100),
+            ]))
+
+    def test_upload_dir__skips_files_present_in_manifest(self):
+
+        put_object = self.mocker.patch.object(
+            self.s3.upload_client, 'put_object')
+
+        build_dir = self.tmpdir.mkdir('build')
+        build_dir.join('main.js').write('console.log(1)')
+        build_dir.join('vendor.js').write('console.log(2)')
+
+        manifest = self.s3.upload_dir(
+            str(build_dir),
+            {'cache-control': 'forever'},
+            manifest={
+                'main.js': get_file_hash(str(build_dir.join('main.js'))),
+                'vendor.js': 'a8s9',
+            })
+
+        assert [c[1]['Key'] for c in put_object.call_args_list] == [
+            'vendor.js',
+        ]
+        assert manifest == {
+            'main.js': get_file_hash(str(build_dir.join('main.js'))),
+            'vendor.js': get_file_hash(str(build_dir.join('vendor.js'))),
+        }
+
+    def test_upload__copies_files_matching_sources(self):
+
+        put_object = self.mocker.patch.object(
+            self.s3.upload_client, 'put_object')
+        head_object = self.mocker.patch.object(
+            self.s3.upload_client, 'head_object')
+        head_object.return_value = {
+            'ContentEncoding': 'gzip',
+            'ContentLength': 120,
+        }
+        copy_object = self.mocker.patch.object(
+            self.s3.upload_client, 'copy_object')
+        copy_object.return_value = {'CopyObjectResult': {'ETag': '"c1"'}}
+
+        build_dir = self.tmpdir.mkdir('build')
+        build_dir.join('main.js').write('console.log(1)')
+        build_dir.join('vendor.js').write('console.log(2)')
+        main_hash = get_file_hash(str(build_dir.join('main.js')))
+
+        self.s3.upload(
+            [
+                ('1.0.1/main.js', str(build_dir.join('main.js'))),
+                ('1.0.1/vendor.js', str(build_dir.join('vendor.js'))),
+            ],
+            {'cache-control': 'forever'},
+            sources={
+                '1.0.1/main.js': ('1.0.0/main.js', main_hash),
+                '1.0.1/vendor.js': ('1.0.0/vendor.js', 'a8s9'),
+            })
+
+        assert head_object.call_args_list == [
+            call(Bucket='my_bucket', Key='1.0.0/main.js'),
+        ]
+        assert copy_object.call_args_list == [
+            call(
+                ACL='public-read',
+                Key='1.0.1/main.js',
+                Bucket='my_bucket',
+                CopySource={'Bucket': 'my_bucket', 'Key': '1.0.0/main.js'},
+                MetadataDirective='REPLACE',
+                ContentType=get_content_type('main.js'),
+                CacheControl='forever',
+                ContentEncoding='gzip'),
+        ]
+        assert [c[1]['Key'] for c in put_object.call_args_list] == [
+            '1.0.1/vendor.js',
+        ]
+        assert self.s3.stats.copied_count == 1
+        assert self.s3.stats.copied_size == 120
+
+    def test_copy_file__different_encoding(self):
+
+        self.mocker.patch.object(
+            self.s3.upload_client, 'head_object'
+        ).return_value = {'ContentLength': 14}
+        copy_object = self.mocker.patch.object(
+            self.s3.upload_client, 'copy_object')
+
+        build_dir = self.tmpdir.mkdir('build')
+        build_dir.join('main.js').write('console.log(1)')
+
+        assert self.s3.copy_file(
+            '1.0.0/main.js',
+            '1.0.1/main.js',
+            str(build_dir.join('main.js')),
+            {'cache-control': 'forever'}) is False
+        assert copy_object.call_count == 0
+
+    def test_copy_file__source_missing(self):
+
+        self.mocker.patch.object(
+            self.s3.upload_client, 'head_object'
+        ).side_effect = ClientError(
+            operation_name='HEAD_OBJECT',
+            error_response={'ResponseMetadata': {'HTTPStatusCode': 404}})
+
+        build_dir = self.tmpdir.mkdir('build')
+        build_dir.join('main.js').write('console.log(1)')
+
+        assert self.s3.copy_file(
+            '1.0.0/main.js',
+            '1.0.1/main.js',
+            str(build_dir.join('main.js')),
+            {'cache-control': 'forever'}) is False
+
+    def test_upload__resumes_from_journal(self):
+
+        put_object = self.mocker.patch.object(
+            self.s3.upload_client, 'put_object')
+        put_object.return_value = {'ETag': '"a1"'}
+
+        build_dir = self.tmpdir.mkdir('build')
+        build_dir.join('main.js').write('console.log(1)')
+        build_dir.join('vendor.js').write('console.log(2)')
+        journal = Journal('my_bucket-1.0.0', path=str(self.tmpdir))
+        journal.record(
+            'main.js', get_file_hash(str(build_dir.join('main.js'))))
+
+        self.s3.upload_dir(
+            str(build_dir), {'cache-control': 'forever'}, journal=journal)
+
+        assert [c[1]['Key'] for c in put_object.call_args_list] == [
+            'vendor.js',
+        ]
+
+        loaded = Journal('my_bucket-1.0.0', path=str(self.tmpdir))
+        loaded.load()
+        assert loaded.entries == {
+            'main.js': get_file_hash(str(build_dir.join('main.js'))),
+            'vendor.js': get_file_hash(str(build_dir.join('vendor.js'))),
+        }
+
+    def test_upload__retries_files(self):
+
+        sleep = self.mocker.patch.object(s3_module.time, 'sleep')
+        put_object = self.mocker.patch.object(
+            self.s3.upload_client, 'put_object')
+        put_object.side_effect = [
+            EndpointConnectionError(endpoint_url='/some/url'),
+            {'ETag': '"a1"'},
+        ]
+
+        build_dir = self.tmpdir.mkdir('build')
+        build_dir.join('main.js').write('console.log(1)')
+
+        self.s3.upload_dir(str(build_dir), {'cache-control': 'forever'})
+
+        assert put_object.call_count == 2
+        assert sleep.call_args_list == [call(0.5)]
+        assert self.s3.stats.retries == 1
+
+    def test_upload__retries_connection_errors(self):
+
+        self.mocker.patch.object(s3_module.time, 'sleep')
+        put_object = self.mocker.patch.object(
+            self.s3.upload_client, 'put_object')
+        put_object.side_effect = [
+            ConnectionClosedError(endpoint_url='/some/url'),
+            ReadTimeoutError(endpoint_url='/some/url'),
+            {'ETag': '"a1"'},
+        ]
+
+        build_dir = self.tmpdir.mkdir('build')
+        build_dir.join('main.js').write('console.log(1)')
+
+        self.s3.upload_dir(str(build_dir), {'cache-control': 'forever'})
+
+        assert put_object.call_count == 3
+        assert self.s3.stats.retries == 2
+
+    def test_with_retries__invalid_requests_are_not_retried(self):
+
+        fn = self.mocker.Mock(
+            side_effect=ParamValidationError(report='ContentType'))
+
+        with pytest.raises(ParamValidationError):
+            self.s3.with_retries(fn)
+
+        assert fn.call_count == 1
+
+    def test_with_retries__client_errors_are_not_retried(self):
+
+        sleep = self.mocker.patch.object(s3_module.time, 'sleep')
+        for code, status in [('AccessDenied', 403), ('BadDigest', 400)]:
+            fn = self.mocker.Mock(side_effect=ClientError(
+                operation_name='put_object',
+                error_response={
+                    'Error': {'Code': code},
+                    'ResponseMetadata': {'HTTPStatusCode': status},
+                }))
+
+            with pytest.raises(ClientError):
+                self.s3.with_retries(fn)
+
+            assert fn.call_count == 1
+
+        assert sleep.call_count == 0
+        assert self.s3.stats.retries == 0
+
+    def test_with_retries__throttling_is_retried(self):
+
+        self.mocker.patch.object(s3_module.time, 'sleep')
+        fn = self.mocker.Mock(side_effect=[
+            ClientError(
+                operation_name='put_object',
+                error_response={
+                    'Error': {'Code': 'SlowDown'},
+                    'ResponseMetadata': {'HTTPStatusCode': 503},
+                }),
+            ClientError(
+                operation_name='put_object',
+                error_response={
+                    'Error': {'Code': 'RequestTimeout'},
+                    'ResponseMetadata': {'HTTPStatusCode': 400},
+                }),
+            {'ETag': '"a1"'},
+        ])
+
+        assert self.s3.with_retries(fn) == {'ETag': '"a1"'}
+        assert fn.call_count == 3
+        assert self.s3.stats.retries == 2
+
+    def test_upload__access_denied_is_not_retried(self):
+
+        put_object = self.mocker.patch.object(
+            self.s3.upload_client, 'put_object')
+        put_object.side_effect = ClientError(
+            operation_name='put_object',
+            error_response={
+                'Error': {'Code': 'AccessDenied'},
+                'ResponseMetadata': {'HTTPStatusCode': 403},
+            })
+
+        build_dir = self.tmpdir.mkdir('build')
+        build_dir.join('main.js').write('console.log(1)')
+
+        with pytest.raises(click.ClickException):
+            self.s3.upload_dir(str(build_dir), {'cache-control': 'forever'})
+
+        assert put_object.call_count == 1
+
+    def test_upload__botocore_does_not_retry_uploads(self):
+
+        s3 = S3(
+            access_key_id='3489348',
+            secret_access_key='382938',
+            region_name='east-eu',
+            bucket_name='my_bucket',
+            client_config={'retries': {'mode': 'adaptive', 'max_attempts': 5}})
+
+        assert s3.client.meta.config.retries['total_max_attempts'] == 6
+        assert s3.upload_client.meta.config.retries == {
+            'mode': 'adaptive',
+            'total_max_attempts': 1,
+        }
+
+    def test_upload_dir__parallel(self):
+
+        put_object = self.mocker.patch.object(
+            self.s3.upload_client, 'put_object')
+
+        build_dir = self.tmpdir.mkdir('build')
+        for i in range(20):
+            build_dir.join(f'{i}.js').write(f'console.log({i})')
+
+        self.s3.upload_dir(
+            str(build_dir), {'cache-control': 'forever'}, workers=4)
+
+        assert (
+            sorted(c[1]['Key'] for c in put_object.call_args_list) ==
+            sorted(f'{i}.js' for i in range(20)))
+
+    def test_upload_dir__deferred_keys_are_uploaded_last(self):
+
+        put_object = self.mocker.patch.object(
+            self.s3.upload_client, 'put_object')
+
+        build_dir = self.tmpdir.mkdir('build')
+        build_dir.join('index-1.0.0.html').write('<html>')
+        version_dir = build_dir.mkdir('1.0.0')
+        for i in range(10):
+            version_dir.join(f'{i}.js').write(f'console.log({i})')
+
+        self.s3.upload_dir(
+            str(build_dir),
+            {'cache-control': 'forever'},
+            workers=4,
+            deferred_keys=['index-1.0.0.html'])
+
+        keys = [c[1]['Key'] for c in put_object.call_args_list]
+        assert len(keys) == 11
+        assert keys[-1] == 'index-1.0.0.html'
+
+    def test_upload_dir__failures_are_reported_together(self):
+
+        self.mocker.patch.object(s3_module.time, 'sleep')
+
+        def put_object(Key, **kwargs):
+            if Key.startswith('1.0.0/broken'):
+                raise ClientError(
+                    operation_name='put_object',
+                    error_response={
+                        'ResponseMetadata': {'HTTPStatusCode': 500}})
+
+            return {'ETag': '"a1"'}
+
+        put_object = self.mocker.patch.object(
+            self.s3.upload_client, 'put_object', side_effect=put_object)
+
+        build_dir = self.tmpdir.mkdir('build')
+        build_dir.join('index-1.0.0.html').write('<html>')
+        version_dir = build_dir.mkdir('1.0.0')
+        version_dir.join('main.js').write('console.log(1)')
+        version_dir.join('broken-1.js').write('console.log(2)')
+        version_dir.join('broken-2.js').write('console.log(3)')
+
+        with pytest.raises(click.ClickException) as e:
+            self.s3.upload_dir(
+                str(build_dir),
+                {'cache-control': 'forever'},
+                workers=2,
+                deferred_keys=['index-1.0.0.html'])
+
+        assert e.value.message == 'failed to upload 2 file(s)'
+        assert 'index-1.0.0.html' not in [
+            c[1]['Key'] for c in put_object.call_args_list]
+
+    #
+    # UPLOAD_FILE_MULTIPART
+    #
+    def test_upload_dir__botocore_errors_are_reported_together(self):
+
+        self.mocker.patch.object(s3_module.time, 'sleep')
+
+        def put_object(Key, **kwargs):
+            if Key == 'main.js.map':
+                raise ParamValidationError(report='ContentType')
+
+            if Key == 'vendor.js':
+                raise ConnectionClosedError(endpoint_url='/some/url')
+
+            return {'ETag': '"a1"'}
+
+        self.mocker.patch.object(
+            self.s3.upload_client, 'put_object', side_effect=put_object)
+
+        build_dir = self.tmpdir.mkdir('build')
+        build_dir.join('main.js.map').write('{}')
+        build_dir.join('vendor.js').write('console.log(1)')
+        build_dir.join('main.js').write('console.log(2)')
+
+        with pytest.raises(click.ClickException) as e:
+            self.s3.upload_dir(str(build_dir), {'cache-control': 'forever'})
+
+        assert e.value.message == 'failed to upload 2 file(s)'
+
+    def test_upload_file__large_files_use_multipart(self):
+
+        self.s3.multipart_threshold = 10
+        put_object = self.mocker.patch.object(
+            self.s3.upload_client, 'put_object')
+        upload_file_multipart = self.mocker.patch.object(
+            self.s3, 'upload_file_multipart')
+
+        build_dir = self.tmpdir.mkdir('build')
+        build_dir.join('small.js').write('small')
+        build_dir.join('large.js').write('large' * 10)
+
+        self.s3.upload_dir(str(build_dir), {'cache-control': 'forever'})
+
+        assert [c[1]['Key'] for c in put_object.call_args_list] == [
+            'small.js',
+        ]
+        assert len(upload_file_multipart.call_args_list) == 1
+        key, stream, params = upload_file_multipart.call_args_list[0][0]
+        assert key == 'large.js'
+        assert stream.path == str(build_dir.join('large.js'))
+        assert params == {
+            'CacheControl': 'forever',
+            'ContentEncoding': 'gzip',
+            'ContentType': get_content_type('large.js'),
+        }
+
+    def test_upload_file_multipart__makes_the_right_calls(self):
+
+        self.mocker.patch.object(s3_module, 'MIN_PART_SIZE', 1)
+        self.mocker.patch.object(compressor, 'CHUNK_SIZE', 1024)
+        self.s3.multipart_chunksize = 2048
+
+        content = os.urandom(256 * 1024)
+        large = self.tmpdir.join('vendor.js')
+        large.write(content, mode='wb')
+
+        self.mocker.patch.object(
+            self.s3.upload_client, 'create_multipart_upload'
+        ).return_value = {'UploadId': 'u-1'}
+        upload_part = self.mocker.patch.object(
+            self.s3.upload_client, 'upload_part')
+        upload_part.side_effect = lambda PartNumber, **kwargs: {
+            'ETag': f'etag-{PartNumber}',
+        }
+        complete_multipart_upload = self.mocker.patch.object(
+            self.s3.upload_client, 'complete_multipart_upload')
+
+        self.s3.upload_file_multipart(
+            'vendor.js',
+            GzipStream(str(large)),
+            {'CacheControl': 'forever', 'ContentEncoding': 'gzip'})
+
+        calls = sorted(
+            upload_part.call_args_list, key=lambda c: c[1]['PartNumber'])
+        assert len(calls) > 1
+        assert all(len(c[1]['Body']) >= 2048 for c in calls[:-1])
+        assert gzip.decompress(
+            b''.join(c[1]['Body'] for c in calls)) == content
+        assert complete_multipart_upload.call_args_list == [
+            call(
+                Bucket='my_bucket',
+                Key='vendor.js',
+                UploadId='u-1',
+                MultipartUpload={
+                    'Parts': [
+                        {'ETag': f'etag-{i}', 'PartNumber': i}
+                        for i in range(1, len(calls) + 1)
+                    ],
+                }),
+        ]
+
+    def test_upload_file_multipart__aborts_on_failure(self):
+
+        self.mocker.patch.object(s3_module, 'MIN_PART_SIZE', 1)
+        self.mocker.patch.object(compressor, 'CHUNK_SIZE', 1024)
+        self.mocker.patch.object(s3_module.time, 'sleep')
+        self.s3.multipart_chunksize = 2048
+
+        large = self.tmpdir.join('vendor.js')
+        large.write(os.urandom(10 * 1024), mode='wb')
+
+        self.mocker.patch.object(
+            self.s3.upload_client, 'create_multipart_upload'
+        ).return_value = {'UploadId': 'u-1'}
+        self.mocker.patch.object(
+            self.s3.upload_client, 'upload_part'
+        ).side_effect = ClientError(
+            operation_name='upload_part',
+            error_response={'ResponseMetadata': {'HTTPStatusCode': 500}})
+        abort_multipart_upload = self.mocker.patch.object(
+            self.s3.upload_client, 'abort_multipart_upload')
+
+        with pytest.raises(ClientError):
+            self.s3.upload_file_multipart(
+                'vendor.js',
+                GzipStream(str(large)),
+                {'CacheControl': 'forever', 'ContentEncoding': 'gzip'})
+
+        assert abort_multipart_upload.call_args_list == [
+            call(Bucket='my_bucket', Key='vendor.js', UploadId='u-1'),
+        ]
+
+    #
+    # UPLOAD_PART
+    #
+    def test_upload_part__retries(self):
+
+        sleep = self.mocker.patch.object(s3_module.time, 'sleep')
+        upload_part = self.mocker.patch.object(
+            self.s3.upload_client, 'upload_part')
+        upload_part.side_effect = [
+            EndpointConnectionError(endpoint_url='/some/url'),
+            ClientError(
+                operation_name='upload_part',
+                error_response={'ResponseMetadata': {'HTTPStatusCode': 500}}),
+            {'ETag': 'abc', 'ResponseMetadata': {'RetryAttempts': 1}},
+        ]
+
+        assert self.s3.upload_part('vendor.js', 'u-1', 3, b'part') == {
+            'ETag': 'abc',
+            'PartNumber': 3,
+        }
+        assert sleep.call_args_list == [call(0.5), call(1.0)]
+        assert self.s3.stats.retries == 3
+
+    def test_upload_part__gives_up_after_retries(self):
+
+        self.mocker.patch.object(s3_module.time, 'sleep')
+        upload_part = self.mocker.patch.object(
+            self.s3.upload_client, 'upload_part')
+        upload_part.side_effect = EndpointConnectionError(
+            endpoint_url='/some/url')
+
+        with pytest.raises(EndpointConnectionError):
+            self.s3.upload_part('vendor.js', 'u-1', 3, b'part')
+
+        assert upload_part.call_count == 4
+
     #
     # UPDATE_WEBSITE_INDEX
     #
+    def test_get_website_index(self):
+
+        self.mocker.patch.object(
+            self.s3.client, 'get_bucket_website'
+        ).return_value = {'IndexDocument': {'Suffix': 'index-1.5.6.html'}}
+
+        assert self.s3.get_website_index() == 'index-1.5.6.html'
+
+    def test_get_website_index__not_configured(self):
+
+        self.mocker.patch.object(
+            self.s3.client, 'get_bucket_website'
+        ).side_effect = ClientError(
+            operation_name='get_bucket_website',
+            error_response={'ResponseMetadata': {'HTTPStatusCode': 404}})
+
+        assert self.s3.get_website_index() is None
+
     def test_update_website_index(self):
 
         put_bucket_website = self.mocker.patch.object(
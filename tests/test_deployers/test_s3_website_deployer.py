@@ -6,9 +6,19 @@ import textwrap
 from unittest import TestCase
 from unittest.mock import call
 
+from botocore.exceptions import ClientError
+import click
 import pytest
 
+from lily_delivery.cache import ArtifactCache
+from lily_delivery.dependencies import S3, Cloudfront
 from lily_delivery.deployers import AngularCLIS3WebsiteDeployer
+from lily_delivery.deployers import s3_website_deployer as deployer_module
+from lily_delivery.deployers.s3_website_deployer import transform_file
+from lily_delivery.journal import Journal
+from lily_delivery.manifest import get_file_hash
+from lily_delivery.replacements import ReplacementEngine
+from lily_delivery.staging import Staging
 
 
 class AngularCLIS3WebsiteDeployerTestCase(TestCase):
@@ -24,6 +34,7 @@ class AngularCLIS3WebsiteDeployerTestCase(TestCase):
                 'cache-control': 'max-age=7200, no-transform, public',
             },
             'replacements': [],
+            'journal': {'path': str(self.tmpdir.join('journal'))},
             'dependencies': {
                 'integration': {
                     'hosting_s3': {
@@ -47,6 +58,12 @@ class AngularCLIS3WebsiteDeployerTestCase(TestCase):
             'integration',
             'fe-app',
             conf=self.conf)
+        self.staging = Staging()
+        self.staging.add('index-1.4.56.html', '/tmp/build/index.html')
+        self.staging.add('1.4.56/main.js', '/tmp/build/main.js')
+        self.mocker.patch.object(S3, 'is_valid').return_value = True
+        self.mocker.patch.object(Cloudfront, 'is_valid').return_value = True
+        self.mocker.patch.object(S3, 'get_website_index').return_value = None
 
     #
     # DEPLOY
@@ -55,38 +72,1120 @@ class AngularCLIS3WebsiteDeployerTestCase(TestCase):
 
         self.mocker.patch.object(
             self.deployer,
-            'copy_build_dir_to_versioned'
-        ).return_value = '/tmp/1278', 'index-1.4.56.html', '1.4.56'
+            'stage'
+        ).return_value = self.staging, 'index-1.4.56.html', '1.4.56'
+        self.mocker.patch.object(
+            self.deployer.s3, 'check_if_release_exists').return_value = False
+        self.mocker.patch.object(
+            self.deployer.s3, 'get_manifest').return_value = None
+        s3_upload = self.mocker.patch.object(self.deployer.s3, 'upload')
+        s3_upload.return_value = {'index-1.4.56.html': 'a8f9'}
+        s3_put_manifest = self.mocker.patch.object(
+            self.deployer.s3, 'put_manifest')
+        s3_update_website_index = self.mocker.patch.object(
+            self.deployer.s3, 'update_website_index')
+        cloudfront_update_frontend_routing = self.mocker.patch.object(
+            self.deployer.cloudfront, 'update_frontend_routing')
+        cloudfront_invalidate_cache = self.mocker.patch.object(
+            self.deployer.cloudfront, 'invalidate_cache')
+
+        self.mocker.patch.object(
+            AngularCLIS3WebsiteDeployer,
+            'version',
+            '1.4.56')
+
+        self.deployer.deploy()
+
+        assert s3_upload.call_args_list == [
+            call(
+                self.staging,
+                {'cache-control': 'max-age=7200, no-transform, public'},
+                workers=1,
+                deferred_keys=['index-1.4.56.html'],
+                manifest=None,
+                sources={},
+                journal=self.deployer.journal),
+        ]
+        assert s3_put_manifest.call_args_list == [
+            call('manifest-1.4.56.json', {'index-1.4.56.html': 'a8f9'}),
+        ]
+        assert (
+            s3_update_website_index.call_args_list ==
+            [call('index-1.4.56.html')])
+        assert (
+            cloudfront_update_frontend_routing.call_args_list ==
+            [call('index-1.4.56.html')])
+        assert cloudfront_invalidate_cache.call_args_list == [
+            call(['/', '/index-1.4.56.html']),
+        ]
+
+    def test_deploy__tracks_propagation(self):
+
+        self.mocker.patch.object(
+            AngularCLIS3WebsiteDeployer,
+            'version',
+            '1.4.56')
+        deployer = AngularCLIS3WebsiteDeployer(
+            'integration',
+            'fe-app',
+            {**self.conf, 'tracking': {'enabled': True, 'timeout': 10}})
+        self.mocker.patch.object(
+            deployer,
+            'stage'
+        ).return_value = self.staging, 'index-1.4.56.html', '1.4.56'
+        self.mocker.patch.object(
+            deployer.s3, 'get_manifest').return_value = None
+        self.mocker.patch.object(
+            deployer.s3, 'check_if_release_exists').return_value = False
+        self.mocker.patch.object(
+            deployer.s3, 'upload').return_value = {'1.4.56/main.js': 'a1'}
+        self.mocker.patch.object(deployer.s3, 'put_manifest')
+        self.mocker.patch.object(deployer.s3, 'update_website_index')
+        self.mocker.patch.object(
+            deployer.cloudfront,
+            'update_frontend_routing').return_value = {'ETag': 'x'}
+        self.mocker.patch.object(
+            deployer.cloudfront, 'invalidate_cache').return_value = 'I2J0'
+        self.mocker.patch.object(
+            deployer.cloudfront, 'is_deployed').return_value = True
+        is_invalidated = self.mocker.patch.object(
+            deployer.cloudfront, 'is_invalidated')
+        is_invalidated.return_value = True
+
+        deployer.deploy()
+
+        assert deployer.tracker.timeout == 10
+        assert set(deployer.tracker.durations.keys()) == set([
+            'cloudfront: distribution',
+            'cloudfront: invalidation',
+        ])
+        assert is_invalidated.call_args_list == [call('I2J0')]
+
+    def test_deploy__refreshes_inventory(self):
+
+        self.mocker.patch.object(
+            AngularCLIS3WebsiteDeployer,
+            'version',
+            '1.4.56')
+        deployer = AngularCLIS3WebsiteDeployer(
+            'integration',
+            'fe-app',
+            {
+                **self.conf,
+                'inventory': {'path': str(self.tmpdir.join('inventory'))},
+            })
+        self.mocker.patch.object(
+            deployer,
+            'stage'
+        ).return_value = self.staging, 'index-1.4.56.html', '1.4.56'
+        refresh_inventory = self.mocker.patch.object(
+            deployer.s3, 'refresh_inventory')
+        save_inventory = self.mocker.patch.object(
+            deployer.s3, 'save_inventory')
+        self.mocker.patch.object(
+            deployer.s3, 'get_manifest').return_value = None
+        self.mocker.patch.object(
+            deployer.s3, 'check_if_release_exists').return_value = True
+
+        deployer.deploy()
+
+        assert deployer.s3.inventory.bucket_name == 'my_bucket'
+        assert refresh_inventory.call_count == 1
+        assert save_inventory.call_count == 1
+
+    def test_deploy__writes_report(self):
+
+        report_path = self.tmpdir.join('report-{environment}.json')
+        history_path = self.tmpdir.join('history.jsonl')
+        deployer = AngularCLIS3WebsiteDeployer(
+            'integration',
+            'fe-app',
+            {
+                **self.conf,
+                'report': {
+                    'path': str(report_path),
+                    'history': str(history_path),
+                },
+            })
+        self.mocker.patch.object(
+            AngularCLIS3WebsiteDeployer,
+            'version',
+            '1.4.56')
+        self.mocker.patch.object(
+            deployer,
+            'stage'
+        ).return_value = self.staging, 'index-1.4.56.html', '1.4.56'
+        self.mocker.patch.object(
+            deployer.s3, 'get_manifest').return_value = None
+        self.mocker.patch.object(
+            deployer.s3, 'check_if_release_exists').return_value = False
+        self.mocker.patch.object(
+            deployer.s3, 'upload').return_value = {'1.4.56/main.js': 'a1'}
+        self.mocker.patch.object(deployer.s3, 'put_manifest')
+        self.mocker.patch.object(deployer.s3, 'update_website_index')
+        self.mocker.patch.object(
+            deployer.cloudfront, 'update_frontend_routing')
+        self.mocker.patch.object(deployer.cloudfront, 'invalidate_cache')
+
+        deployer.deploy()
+
+        report = json.loads(
+            self.tmpdir.join('report-integration.json').read())
+        assert report['environment'] == 'integration'
+        assert report['version'] == '1.4.56'
+        assert report['succeeded'] is True
+        assert report['critical_path'][-1] == (
+            'cloudfront: waiting for propagation')
+        assert report['upload']['files_count'] == 0
+        assert 's3: uploading files' in [
+            phase['name'] for phase in report['phases']]
+        assert json.loads(history_path.read()) == report
+
+    def test_deploy__release_without_manifest_exists(self):
+
+        self.mocker.patch.object(
+            AngularCLIS3WebsiteDeployer,
+            'version',
+            '1.4.56')
+        self.mocker.patch.object(
+            self.deployer,
+            'stage'
+        ).return_value = self.staging, 'index-1.4.56.html', '1.4.56'
+        self.mocker.patch.object(
+            self.deployer.s3, 'check_if_release_exists').return_value = True
+        self.mocker.patch.object(
+            self.deployer.s3, 'get_manifest').return_value = None
+        s3_upload = self.mocker.patch.object(self.deployer.s3, 'upload')
+
+        self.deployer.deploy()
+
+        assert s3_upload.call_count == 0
+
+    def test_deploy__resumes_interrupted_release(self):
+
+        self.mocker.patch.object(
+            AngularCLIS3WebsiteDeployer,
+            'version',
+            '1.4.56')
+        self.mocker.patch.object(
+            self.deployer,
+            'stage'
+        ).return_value = self.staging, 'index-1.4.56.html', '1.4.56'
+        self.mocker.patch.object(
+            self.deployer.s3, 'check_if_release_exists').return_value = True
+        self.mocker.patch.object(
+            self.deployer.s3, 'get_manifest').return_value = None
+        journaled = []
+
+        def upload(*args, journal, **kwargs):
+            journaled.append(dict(journal.entries))
+
+            return {'1.4.56/main.js': 'a7c8'}
+
+        self.mocker.patch.object(
+            self.deployer.s3, 'upload', side_effect=upload)
+        s3_put_manifest = self.mocker.patch.object(
+            self.deployer.s3, 'put_manifest')
+        self.mocker.patch.object(self.deployer.s3, 'update_website_index')
+        self.mocker.patch.object(
+            self.deployer.cloudfront, 'update_frontend_routing')
+        self.mocker.patch.object(self.deployer.cloudfront, 'invalidate_cache')
+        Journal(
+            'my_bucket-1.4.56', path=str(self.tmpdir.join('journal'))
+        ).record('1.4.56/main.js', 'a7c8')
+
+        self.deployer.deploy()
+
+        assert journaled == [{'1.4.56/main.js': 'a7c8'}]
+        assert s3_put_manifest.call_args_list == [
+            call('manifest-1.4.56.json', {'1.4.56/main.js': 'a7c8'}),
+        ]
+        assert Journal(
+            'my_bucket-1.4.56', path=str(self.tmpdir.join('journal'))
+        ).load() is False
+
+    def test_deploy__interrupted_upload_keeps_journal(self):
+
+        self.mocker.patch.object(
+            AngularCLIS3WebsiteDeployer,
+            'version',
+            '1.4.56')
+        self.mocker.patch.object(
+            self.deployer,
+            'stage'
+        ).return_value = self.staging, 'index-1.4.56.html', '1.4.56'
+        self.mocker.patch.object(
+            self.deployer.s3, 'check_if_release_exists').return_value = False
+        self.mocker.patch.object(
+            self.deployer.s3, 'get_manifest').return_value = None
+
+        def upload(*args, journal, **kwargs):
+            journal.record('1.4.56/main.js', 'a7c8')
+            raise click.ClickException('failed to upload 1 file(s)')
+
+        self.mocker.patch.object(
+            self.deployer.s3, 'upload', side_effect=upload)
+        s3_update_website_index = self.mocker.patch.object(
+            self.deployer.s3, 'update_website_index')
+
+        with pytest.raises(click.ClickException):
+            self.deployer.deploy()
+
+        journal = Journal(
+            'my_bucket-1.4.56', path=str(self.tmpdir.join('journal')))
+        assert journal.load() is True
+        assert journal.entries == {'1.4.56/main.js': 'a7c8'}
+        assert journal.is_complete is False
+        assert s3_update_website_index.call_count == 0
+
+    def test_deploy__uploads_delta_against_manifest(self):
+
+        self.mocker.patch.object(
+            AngularCLIS3WebsiteDeployer,
+            'version',
+            '1.4.56')
+        self.mocker.patch.object(
+            self.deployer,
+            'stage'
+        ).return_value = self.staging, 'index-1.4.56.html', '1.4.56'
+        self.mocker.patch.object(
+            self.deployer.s3, 'get_manifest'
+        ).return_value = {'1.4.56/main.js': 'f8d9'}
+        s3_upload = self.mocker.patch.object(self.deployer.s3, 'upload')
+        s3_upload.return_value = {'1.4.56/main.js': 'a7c8'}
+        s3_put_manifest = self.mocker.patch.object(
+            self.deployer.s3, 'put_manifest')
+        self.mocker.patch.object(self.deployer.s3, 'update_website_index')
+        self.mocker.patch.object(
+            self.deployer.cloudfront, 'update_frontend_routing')
+        self.mocker.patch.object(self.deployer.cloudfront, 'invalidate_cache')
+
+        self.deployer.deploy()
+
+        assert s3_upload.call_args_list[0][1]['manifest'] == {
+            '1.4.56/main.js': 'f8d9',
+        }
+        assert s3_put_manifest.call_args_list == [
+            call('manifest-1.4.56.json', {'1.4.56/main.js': 'a7c8'}),
+        ]
+
+    def test_deploy__nothing_changed(self):
+
+        self.mocker.patch.object(
+            AngularCLIS3WebsiteDeployer,
+            'version',
+            '1.4.56')
+        self.mocker.patch.object(
+            self.deployer,
+            'stage'
+        ).return_value = self.staging, 'index-1.4.56.html', '1.4.56'
+        self.mocker.patch.object(
+            self.deployer.s3, 'get_manifest'
+        ).return_value = {'1.4.56/main.js': 'f8d9'}
+        self.mocker.patch.object(
+            self.deployer.s3, 'upload'
+        ).return_value = {'1.4.56/main.js': 'f8d9'}
+        S3.get_website_index.return_value = 'index-1.4.56.html'
+        s3_put_manifest = self.mocker.patch.object(
+            self.deployer.s3, 'put_manifest')
+        self.mocker.patch.object(self.deployer.s3, 'update_website_index')
+        self.mocker.patch.object(
+            self.deployer.cloudfront.client, 'get_distribution'
+        ).return_value = {
+            'ETag': 'e1',
+            'Distribution': {
+                'DistributionConfig': {
+                    'CustomErrorResponses': {
+                        'Quantity': 1,
+                        'Items': [
+                            {
+                                'ErrorCode': 404,
+                                'ResponsePagePath': '/index-1.4.56.html',
+                                'ResponseCode': '200',
+                                'ErrorCachingMinTTL': 300
+                            },
+                        ],
+                    },
+                },
+            },
+        }
+        update_distribution = self.mocker.patch.object(
+            self.deployer.cloudfront.client, 'update_distribution')
+        cloudfront_invalidate_cache = self.mocker.patch.object(
+            self.deployer.cloudfront, 'invalidate_cache')
+
+        self.deployer.deploy()
+
+        # -- rollout is repeated but the distribution is left alone
+        assert s3_put_manifest.call_count == 0
+        assert update_distribution.call_count == 0
+        assert cloudfront_invalidate_cache.call_args_list == [
+            call(['/', '/index-1.4.56.html']),
+        ]
+
+    def test_deploy__finishes_rollout_after_routing_failed(self):
+
+        self.mocker.patch.object(
+            AngularCLIS3WebsiteDeployer,
+            'version',
+            '1.4.56')
+        self.mocker.patch.object(
+            self.deployer,
+            'stage'
+        ).return_value = self.staging, 'index-1.4.56.html', '1.4.56'
+        get_manifest = self.mocker.patch.object(
+            self.deployer.s3, 'get_manifest')
+        get_manifest.return_value = None
+        self.mocker.patch.object(
+            self.deployer.s3, 'check_if_release_exists').return_value = False
+        self.mocker.patch.object(
+            self.deployer.s3, 'upload'
+        ).return_value = {'1.4.56/main.js': 'f8d9'}
+        self.mocker.patch.object(self.deployer.s3, 'put_manifest')
+        self.mocker.patch.object(self.deployer.s3, 'update_website_index')
+        update_frontend_routing = self.mocker.patch.object(
+            self.deployer.cloudfront, 'update_frontend_routing')
+        update_frontend_routing.side_effect = [
+            ClientError(
+                operation_name='update_distribution',
+                error_response={
+                    'ResponseMetadata': {'HTTPStatusCode': 412},
+                }),
+            None,
+        ]
+        cloudfront_invalidate_cache = self.mocker.patch.object(
+            self.deployer.cloudfront, 'invalidate_cache')
+
+        with pytest.raises(ClientError):
+            self.deployer.deploy()
+
+        assert cloudfront_invalidate_cache.call_count == 0
+
+        # -- manifest and the S3 index switch made it before the failure
+        get_manifest.return_value = {'1.4.56/main.js': 'f8d9'}
+        S3.get_website_index.return_value = 'index-1.4.56.html'
+
+        self.deployer.deploy()
+
+        assert update_frontend_routing.call_args_list == [
+            call('index-1.4.56.html'),
+            call('index-1.4.56.html'),
+        ]
+        assert cloudfront_invalidate_cache.call_args_list == [
+            call(['/', '/index-1.4.56.html']),
+        ]
+
+    def test_deploy__finishes_rollout_after_manifest_was_stored(self):
+
+        self.mocker.patch.object(
+            AngularCLIS3WebsiteDeployer,
+            'version',
+            '1.4.56')
+        self.mocker.patch.object(
+            self.deployer,
+            'stage'
+        ).return_value = self.staging, 'index-1.4.56.html', '1.4.56'
+        self.mocker.patch.object(
+            self.deployer.s3, 'get_manifest'
+        ).return_value = {'1.4.56/main.js': 'f8d9'}
+        self.mocker.patch.object(
+            self.deployer.s3, 'upload'
+        ).return_value = {'1.4.56/main.js': 'f8d9'}
+        S3.get_website_index.return_value = 'index-1.4.55.html'
+        s3_put_manifest = self.mocker.patch.object(
+            self.deployer.s3, 'put_manifest')
+        s3_update_website_index = self.mocker.patch.object(
+            self.deployer.s3, 'update_website_index')
+        cloudfront_update_frontend_routing = self.mocker.patch.object(
+            self.deployer.cloudfront, 'update_frontend_routing')
+        cloudfront_invalidate_cache = self.mocker.patch.object(
+            self.deployer.cloudfront, 'invalidate_cache')
+
+        self.deployer.deploy()
+
+        assert s3_put_manifest.call_count == 0
+        assert s3_update_website_index.call_args_list == [
+            call('index-1.4.56.html'),
+        ]
+        assert cloudfront_update_frontend_routing.call_args_list == [
+            call('index-1.4.56.html'),
+        ]
+        assert cloudfront_invalidate_cache.call_args_list == [
+            call(['/', '/index-1.4.56.html']),
+        ]
+
+    def test_deploy__stops_if_preflight_fails(self):
+
+        self.mocker.patch.object(
+            AngularCLIS3WebsiteDeployer,
+            'version',
+            '1.4.56')
+        self.mocker.patch.object(
+            self.deployer,
+            'stage'
+        ).return_value = self.staging, 'index-1.4.56.html', '1.4.56'
+        self.mocker.patch.object(
+            self.deployer.s3, 'check_if_release_exists').return_value = False
+        self.mocker.patch.object(
+            self.deployer.s3, 'get_manifest').return_value = None
+        self.mocker.patch.object(
+            self.deployer.cloudfront, 'is_valid').return_value = False
+        s3_upload = self.mocker.patch.object(self.deployer.s3, 'upload')
+        s3_update_website_index = self.mocker.patch.object(
+            self.deployer.s3, 'update_website_index')
+
+        with pytest.raises(click.ClickException):
+            self.deployer.deploy()
+
+        assert s3_upload.call_count == 0
+        assert s3_update_website_index.call_count == 0
+
+    #
+    # DEPLOY_ENVIRONMENTS
+    #
+    def get_multi_environment_conf(self):
+
+        dependencies = self.conf['dependencies']['integration']
+
+        return {
+            **self.conf,
+            'dependencies': {
+                'integration': dependencies,
+                'production': {
+                    'hosting_s3': {
+                        **dependencies['hosting_s3'],
+                        'bucket_name': 'my_prod_bucket',
+                    },
+                    'hosting_cloudfront': dependencies['hosting_cloudfront'],
+                },
+            },
+        }
+
+    def test_deploy_environments__stages_once(self):
+
+        temp_dir = self.tmpdir.mkdir('temp')
+        stage = self.mocker.patch.object(AngularCLIS3WebsiteDeployer, 'stage')
+        stage.return_value = self.staging, 'index-1.4.56.html', '1.4.56'
+        deploy = self.mocker.patch.object(
+            AngularCLIS3WebsiteDeployer, 'deploy', autospec=True)
+        self.mocker.patch.object(
+            AngularCLIS3WebsiteDeployer,
+            'cleanup',
+            autospec=True,
+            side_effect=lambda deployer: temp_dir.remove())
+
+        AngularCLIS3WebsiteDeployer.deploy_environments(
+            ['integration', 'production'],
+            'fe-app',
+            self.get_multi_environment_conf())
+
+        assert stage.call_count == 1
+        assert sorted(
+            deployer.s3.bucket_name
+            for (deployer, staged), _ in deploy.call_args_list
+        ) == ['my_bucket', 'my_prod_bucket']
+        assert all(
+            staged == stage.return_value
+            for (deployer, staged), _ in deploy.call_args_list)
+        assert not temp_dir.exists()
+
+    def test_deploy_environments__compresses_once(self):
+
+        stage = self.mocker.patch.object(AngularCLIS3WebsiteDeployer, 'stage')
+        stage.return_value = self.staging, 'index-1.4.56.html', '1.4.56'
+        caches = []
+        self.mocker.patch.object(
+            AngularCLIS3WebsiteDeployer,
+            'deploy',
+            autospec=True,
+            side_effect=lambda deployer, staged: caches.append(
+                deployer.s3.cache))
+
+        AngularCLIS3WebsiteDeployer.deploy_environments(
+            ['integration', 'production'],
+            'fe-app',
+            self.get_multi_environment_conf())
+
+        assert len(caches) == 2
+        assert caches[0] is caches[1]
+        assert not os.path.exists(caches[0].path)
+
+    def test_deploy_environments__reports_failures(self):
+
+        self.mocker.patch.object(
+            AngularCLIS3WebsiteDeployer,
+            'stage'
+        ).return_value = self.staging, 'index-1.4.56.html', '1.4.56'
+
+        def deploy(deployer, staged):
+            if deployer.s3.bucket_name == 'my_prod_bucket':
+                raise click.ClickException('failed to upload 1 file(s)')
+
+        deploy = self.mocker.patch.object(
+            AngularCLIS3WebsiteDeployer,
+            'deploy',
+            autospec=True,
+            side_effect=deploy)
+
+        with pytest.raises(click.ClickException) as e:
+            AngularCLIS3WebsiteDeployer.deploy_environments(
+                ['integration', 'production'],
+                'fe-app',
+                self.get_multi_environment_conf())
+
+        assert e.value.message == 'failed to deploy to: production'
+        assert deploy.call_count == 2
+
+    def test_deploy_environments__single_environment(self):
+
+        stage = self.mocker.patch.object(AngularCLIS3WebsiteDeployer, 'stage')
+        deploy = self.mocker.patch.object(
+            AngularCLIS3WebsiteDeployer, 'deploy', autospec=True)
+
+        AngularCLIS3WebsiteDeployer.deploy_environments(
+            ['integration'], 'fe-app', self.conf)
+
+        assert stage.call_count == 0
+        assert len(deploy.call_args_list) == 1
+
+    def test_deploy__shared_staging_is_not_removed(self):
+
+        self.mocker.patch.object(
+            AngularCLIS3WebsiteDeployer,
+            'version',
+            '1.4.56')
+        stage = self.mocker.patch.object(self.deployer, 'stage')
+        self.mocker.patch.object(
+            self.deployer.s3, 'check_if_release_exists').return_value = True
+        self.mocker.patch.object(
+            self.deployer.s3, 'get_manifest').return_value = None
+        cleanup = self.mocker.patch.object(self.deployer, 'cleanup')
+
+        self.deployer.deploy((self.staging, 'index-1.4.56.html', '1.4.56'))
+
+        assert stage.call_count == 0
+        assert cleanup.call_count == 0
+
+    #
+    # PLAN
+    #
+    def prepare_plan(self):
+
+        deployer = AngularCLIS3WebsiteDeployer(
+            'integration',
+            'fe-app',
+            {
+                **self.conf,
+                'replacements': [
+                    {
+                        'from': '/assets/',
+                        'to': '/{version}/assets/',
+                        'file_extensions': ['.js'],
+                    }
+                ],
+            },
+            serial_transform=True)
+
+        build_dir = self.tmpdir.mkdir('build')
+        build_dir.join('index.html').write('<html>' * 100)
+        build_dir.join('main.js').write('console.log("/assets/a.png");')
+        build_dir.join('vendor.js').write('console.log(1);')
+        build_dir.mkdir('assets').join('a.png').write('x' * 10)
+
+        self.mocker.patch.object(
+            AngularCLIS3WebsiteDeployer,
+            'build_path',
+            str(build_dir))
         self.mocker.patch.object(
-            self.deployer.s3, 'check_if_key_exists').return_value = False
-        s3_upload_dir = self.mocker.patch.object(
-            self.deployer.s3, 'upload_dir')
-        s3_update_website_index = self.mocker.patch.object(
-            self.deployer.s3, 'update_website_index')
-        cloudfront_update_frontend_routing = self.mocker.patch.object(
-            self.deployer.cloudfront, 'update_frontend_routing')
-        cloudfront_invalidate_cache = self.mocker.patch.object(
-            self.deployer.cloudfront, 'invalidate_cache')
+            AngularCLIS3WebsiteDeployer,
+            'version',
+            '1.4.56')
+
+        return deployer, build_dir
+
+    def test_plan__offline(self):
+
+        deployer, build_dir = self.prepare_plan()
+        get_manifest = self.mocker.patch.object(deployer.s3, 'get_manifest')
+        upload_file = self.mocker.patch.object(deployer.s3, 'upload_file')
+
+        plan = deployer.plan()
+
+        assert get_manifest.call_count == 0
+        assert upload_file.call_count == 0
+        assert deployer.temp_dirs == []
+        assert plan['version'] == '1.4.56'
+        assert plan['release_exists'] is None
+        assert plan['invalidation_paths'] == ['/', '/index-1.4.56.html']
+        assert [
+            (file['key'], file['action'], file['replaced'])
+            for file in plan['files']
+        ] == [
+            ('1.4.56/assets/a.png', 'upload', False),
+            ('1.4.56/main.js', 'upload', True),
+            ('1.4.56/vendor.js', 'upload', False),
+            ('index-1.4.56.html', 'upload', False),
+        ]
+
+        index = plan['files'][-1]
+        assert index['raw_size'] == 600
+        assert index['size'] < 100
+        assert index['headers'] == {
+            'ContentType': 'text/html',
+            'CacheControl': 'max-age=7200, no-transform, public',
+            'ContentEncoding': 'gzip',
+        }
+
+    def test_plan__compares_with_remote_manifest(self):
+
+        deployer, build_dir = self.prepare_plan()
+        self.mocker.patch.object(
+            deployer.s3, 'get_manifest'
+        ).return_value = {
+            '1.4.56/vendor.js': get_file_hash(
+                str(build_dir.join('vendor.js'))),
+            '1.4.56/main.js': 'f8d9',
+        }
+        check_if_release_exists = self.mocker.patch.object(
+            deployer.s3, 'check_if_release_exists')
+
+        plan = deployer.plan(remote=True)
+
+        assert check_if_release_exists.call_count == 0
+        assert {
+            file['key']: file['action'] for file in plan['files']
+        } == {
+            '1.4.56/assets/a.png': 'upload',
+            '1.4.56/main.js': 'upload',
+            '1.4.56/vendor.js': 'unchanged',
+            'index-1.4.56.html': 'upload',
+        }
+        assert sorted(plan['invalidation_paths']) == [
+            '/', '/1.4.56/main.js', '/index-1.4.56.html']
+
+    def test_plan__release_without_manifest_exists(self):
+
+        deployer, _ = self.prepare_plan()
+        self.mocker.patch.object(
+            deployer.s3, 'get_manifest').return_value = None
+        self.mocker.patch.object(
+            deployer.s3, 'check_if_release_exists').return_value = True
+
+        plan = deployer.plan(remote=True)
+
+        assert plan['release_exists'] is True
+        assert plan['resumed'] is None
+        assert plan['invalidation_paths'] == []
+        assert set(file['action'] for file in plan['files']) == set(['skip'])
+
+    def test_plan__resumes_interrupted_release(self):
+
+        deployer, build_dir = self.prepare_plan()
+        self.mocker.patch.object(
+            deployer.s3, 'get_manifest').return_value = None
+        self.mocker.patch.object(
+            deployer.s3, 'check_if_release_exists').return_value = True
+        journal = Journal(
+            'my_bucket-1.4.56', path=self.conf['journal']['path'])
+        journal.record(
+            '1.4.56/vendor.js',
+            get_file_hash(str(build_dir.join('vendor.js'))))
+
+        plan = deployer.plan(remote=True)
+
+        assert plan['release_exists'] is False
+        assert plan['resumed'] == 1
+        assert plan['invalidation_paths'] == ['/', '/index-1.4.56.html']
+        assert {
+            file['key']: file['action'] for file in plan['files']
+        } == {
+            '1.4.56/assets/a.png': 'upload',
+            '1.4.56/main.js': 'upload',
+            '1.4.56/vendor.js': 'unchanged',
+            'index-1.4.56.html': 'upload',
+        }
+
+    #
+    # GET_COPY_SOURCES
+    #
+    def test_get_copy_sources(self):
+
+        S3.get_website_index.return_value = 'index-1.4.55.html'
+        get_manifest = self.mocker.patch.object(
+            self.deployer.s3, 'get_manifest')
+        get_manifest.return_value = {
+            'index-1.4.55.html': 'a1',
+            '1.4.55/main.js': 'b2',
+            '1.4.55/assets/logo.svg': 'c3',
+        }
+
+        assert self.deployer.get_copy_sources('1.4.56') == {
+            'index-1.4.56.html': ('index-1.4.55.html', 'a1'),
+            '1.4.56/main.js': ('1.4.55/main.js', 'b2'),
+            '1.4.56/assets/logo.svg': ('1.4.55/assets/logo.svg', 'c3'),
+        }
+        assert get_manifest.call_args_list == [call('manifest-1.4.55.json')]
+
+    def test_get_copy_sources__same_or_no_release(self):
+
+        get_manifest = self.mocker.patch.object(
+            self.deployer.s3, 'get_manifest')
+
+        S3.get_website_index.return_value = None
+        assert self.deployer.get_copy_sources('1.4.56') == {}
+
+        S3.get_website_index.return_value = 'index-1.4.56.html'
+        assert self.deployer.get_copy_sources('1.4.56') == {}
+
+        assert get_manifest.call_count == 0
+
+    def test_get_copy_sources__disabled(self):
+
+        deployer = AngularCLIS3WebsiteDeployer(
+            'integration',
+            'fe-app',
+            {**self.conf, 'upload': {'copy_unchanged': False}})
+        S3.get_website_index.return_value = 'index-1.4.55.html'
+
+        assert deployer.get_copy_sources('1.4.56') == {}
+        assert S3.get_website_index.call_count == 0
+
+    #
+    # PRUNE
+    #
+    def prepare_prune(self):
+
+        self.mocker.patch.object(
+            self.deployer.s3, 'list_releases'
+        ).return_value = {
+            '1.9.0': ['index-1.9.0.html'],
+            '1.10.0': ['index-1.10.0.html', 'manifest-1.10.0.json'],
+            '1.8.0': ['index-1.8.0.html'],
+            '1.11.0': ['index-1.11.0.html'],
+            '1.7.0': [],
+        }
+        self.mocker.patch.object(
+            self.deployer.s3, 'list_objects'
+        ).side_effect = lambda prefix: {
+            f'{prefix}main.js': {'etag': '"a1"', 'size': 4},
+        }
+        S3.get_website_index.return_value = 'index-1.8.0.html'
+
+        return self.mocker.patch.object(self.deployer.s3, 'delete_keys')
+
+    def test_prune(self):
+
+        delete_keys = self.prepare_prune()
+
+        assert self.deployer.prune(2) == ['1.7.0', '1.9.0']
+        assert sorted(delete_keys.call_args_list[0][0][0]) == [
+            '1.7.0/main.js',
+            '1.9.0/main.js',
+            'index-1.9.0.html',
+        ]
+
+    def test_prune__dry_run(self):
+
+        delete_keys = self.prepare_prune()
+
+        assert self.deployer.prune(3, dry_run=True) == ['1.7.0']
+        assert delete_keys.call_count == 0
+
+    def test_prune__keeps_at_least_one(self):
+
+        delete_keys = self.prepare_prune()
+
+        with pytest.raises(click.ClickException):
+            self.deployer.prune(0)
+
+        assert delete_keys.call_count == 0
+
+    def test_init__client_config(self):
+
+        deployer = AngularCLIS3WebsiteDeployer(
+            'integration',
+            'fe-app',
+            {
+                **self.conf,
+                'upload': {'workers': 8},
+                'aws': {'retries': {'mode': 'standard'}},
+            })
+
+        config = deployer.s3.client.meta.config
+        assert config.max_pool_connections == 32
+        assert config.tcp_keepalive is True
+        assert config.retries['mode'] == 'standard'
+        assert deployer.cloudfront.client.meta.config.max_pool_connections == (
+            32)
+
+    def test_deploy__uses_configured_workers(self):
+
+        deployer = AngularCLIS3WebsiteDeployer(
+            'integration',
+            'fe-app',
+            {**self.conf, 'upload': {'workers': 8}})
+
+        assert deployer.workers == 8
+
+        deployer = AngularCLIS3WebsiteDeployer(
+            'integration',
+            'fe-app',
+            {**self.conf, 'upload': {'workers': 8}},
+            workers=3)
+
+        assert deployer.workers == 3
+
+    def test_deploy__removes_temp_dirs(self):
 
         self.mocker.patch.object(
             AngularCLIS3WebsiteDeployer,
             'version',
             '1.4.56')
+        temp_dir = self.tmpdir.mkdir('temp')
+        self.deployer.temp_dirs = [str(temp_dir)]
+        self.mocker.patch.object(
+            self.deployer, 'stage').side_effect = OSError('no space left')
 
-        self.deployer.deploy()
+        with pytest.raises(OSError):
+            self.deployer.deploy()
 
-        assert s3_upload_dir.call_args_list == [
-            call(
-                '/tmp/1278',
-                {'cache-control': 'max-age=7200, no-transform, public'}),
+        assert not temp_dir.exists()
+        assert self.deployer.temp_dirs == []
+
+    #
+    # STAGE
+    #
+    def test_stage__physical(self):
+
+        deployer = AngularCLIS3WebsiteDeployer(
+            'integration',
+            'fe-app',
+            {**self.conf, 'staging': 'physical'})
+        temp_dir = self.tmpdir.mkdir('temp')
+        temp_dir.mkdir('build').join('index-1.4.56.html').write('<html>')
+        self.mocker.patch.object(
+            deployer,
+            'copy_build_dir_to_versioned'
+        ).return_value = (
+            str(temp_dir.join('build')), 'index-1.4.56.html', '1.4.56')
+
+        staging, index_html_name, assets_name = deployer.stage()
+
+        assert list(staging) == [
+            (
+                'index-1.4.56.html',
+                str(temp_dir.join('build', 'index-1.4.56.html')),
+            ),
         ]
-        assert (
-            s3_update_website_index.call_args_list ==
-            [call('index-1.4.56.html')])
-        assert (
-            cloudfront_update_frontend_routing.call_args_list ==
-            [call('index-1.4.56.html')])
-        assert cloudfront_invalidate_cache.call_args_list == [call()]
+        assert index_html_name == 'index-1.4.56.html'
+        assert assets_name == '1.4.56'
+
+    #
+    # STAGE_BUILD_DIR
+    #
+    def test_stage_build_dir__maps_build_files_to_keys(self):
+
+        deployer = AngularCLIS3WebsiteDeployer(
+            'integration',
+            'fe-app',
+            {
+                **self.conf,
+                'replacements': [
+                    {
+                        'from': '/assets/monaco',
+                        'to': '/{version}/assets/monaco',
+                        'file_extensions': ['.js'],
+                    }
+                ],
+            })
+
+        build_dir = self.tmpdir.mkdir('build')
+        build_dir.join('index.html').write('<html>INDEX</html>')
+        build_dir.join('main.js').write('console.log("/assets/monaco/1.png")')
+        build_dir.mkdir('assets').join('image.png').write('some.bytes')
+
+        self.mocker.patch.object(
+            AngularCLIS3WebsiteDeployer,
+            'build_path',
+            str(build_dir))
+        self.mocker.patch.object(
+            AngularCLIS3WebsiteDeployer,
+            'version',
+            '1.4.56')
+        temp_dir = self.tmpdir.mkdir('temp')
+        self.mocker.patch.object(
+            tempfile,
+            'mkdtemp'
+        ).return_value = str(temp_dir)
+
+        staging, index_html_name, assets_name = deployer.stage_build_dir()
+
+        assert index_html_name == 'index-1.4.56.html'
+        assert assets_name == '1.4.56'
+        assert dict(staging) == {
+            'index-1.4.56.html': str(build_dir.join('index.html')),
+            '1.4.56/assets/image.png': str(
+                build_dir.join('assets', 'image.png')),
+            '1.4.56/main.js': str(temp_dir.join('1.4.56', 'main.js')),
+        }
+        assert temp_dir.join(
+            '1.4.56', 'main.js'
+        ).read() == 'console.log("/1.4.56/assets/monaco/1.png")'
+        assert deployer.temp_dirs == [str(temp_dir)]
+
+    #
+    # TRANSFORM_FILES
+    #
+    def test_transform_files__parallel_gives_same_results_as_serial(self):
+
+        replacements = [
+            {
+                'from': '/assets/monaco',
+                'to': '/{version}/assets/monaco',
+                'file_extensions': ['.js'],
+            }
+        ]
+        deployer = AngularCLIS3WebsiteDeployer(
+            'integration',
+            'fe-app',
+            {**self.conf, 'replacements': replacements},
+            serial_transform=True)
+        engine = ReplacementEngine(replacements, '1.4.56')
+
+        src_dir = self.tmpdir.mkdir('src')
+        files = []
+        for i in range(6):
+            src = src_dir.join(f'{i}.js')
+            src.write(
+                'console.log("/assets/monaco")' if i % 2 else 'nothing')
+            files.append((str(src), str(src_dir.join(f'{i}.out.js'))))
+
+        assert deployer.transform_workers == 1
+        serial = deployer.transform_files(engine, files)
+        serial_content = [
+            open(dst).read() for (_, dst), r in zip(files, serial) if r]
+        for _, dst in files:
+            if os.path.exists(dst):
+                os.remove(dst)
+
+        deployer.transform_workers = 3
+        parallel = deployer.transform_files(engine, files)
+        parallel_content = [
+            open(dst).read() for (_, dst), r in zip(files, parallel) if r]
+
+        assert serial == parallel == [False, True, False, True, False, True]
+        assert serial_content == parallel_content == [
+            'console.log("/1.4.56/assets/monaco")',
+        ] * 3
+
+    def test_transform_files__pool_does_not_fork(self):
+
+        pool = self.mocker.spy(deployer_module, 'ProcessPoolExecutor')
+        deployer = AngularCLIS3WebsiteDeployer(
+            'integration',
+            'fe-app',
+            {**self.conf, 'cache': {'path': str(self.tmpdir.join('cache'))}})
+        deployer.transform_workers = 2
+        engine = ReplacementEngine(
+            [{'from': 'a', 'to': 'b', 'file_extensions': ['.js']}], '1.4.56')
+
+        src_dir = self.tmpdir.mkdir('src')
+        files = []
+        for i in range(4):
+            src_dir.join(f'{i}.js').write('aaa')
+            files.append((
+                str(src_dir.join(f'{i}.js')),
+                str(src_dir.join(f'{i}.out.js'))))
+
+        assert deployer.transform_files(engine, files) == [True] * 4
+        assert src_dir.join('3.out.js').read() == 'bbb'
+
+        kwargs = pool.call_args_list[0][1]
+        assert kwargs['mp_context'].get_start_method() in (
+            'forkserver', 'spawn')
+        assert kwargs['initargs'] == (engine, deployer.cache)
+
+    def test_transform_file__cached_artifact_evicted(self):
+
+        replacements = [{'from': 'a', 'to': 'b', 'file_extensions': ['.js']}]
+        engine = ReplacementEngine(replacements, '1.4.56')
+        cache = ArtifactCache(str(self.tmpdir.join('cache')))
+        self.mocker.patch.object(
+            cache, 'get').return_value = str(self.tmpdir.join('evicted'))
+
+        src = self.tmpdir.join('main.js')
+        src.write('aaa')
+        dst = self.tmpdir.join('main.out.js')
+
+        assert transform_file(engine, cache, str(src), str(dst)) is True
+        assert dst.read() == 'bbb'
+
+    #
+    # GET_INVALIDATION_PATHS
+    #
+    def test_get_invalidation_paths__targeted(self):
+
+        paths = self.deployer.get_invalidation_paths(
+            'index-1.4.56.html',
+            {
+                'index-1.4.56.html': 'a1',
+                '1.4.56/main.js': 'b2',
+                '1.4.56/assets/logo.svg': 'c3',
+                '1.4.56/assets/new.svg': 'd4',
+            },
+            {
+                'index-1.4.56.html': 'a1',
+                '1.4.56/main.js': 'b1',
+                '1.4.56/assets/logo.svg': 'c3',
+            })
+
+        assert paths == ['/', '/1.4.56/main.js', '/index-1.4.56.html']
+
+    def test_get_invalidation_paths__routes(self):
+
+        deployer = AngularCLIS3WebsiteDeployer(
+            'integration',
+            'fe-app',
+            {
+                **self.conf,
+                'invalidation': {'routes': ['/products/*', 'account/*']},
+            })
+
+        paths = deployer.get_invalidation_paths(
+            'index-1.4.56.html',
+            {'index-1.4.56.html': 'a1'},
+            None)
+
+        assert paths == [
+            '/',
+            '/account/*',
+            '/index-1.4.56.html',
+            '/products/*',
+        ]
+
+    def test_get_invalidation_paths__merges_into_wildcards(self):
+
+        deployer = AngularCLIS3WebsiteDeployer(
+            'integration',
+            'fe-app',
+            {**self.conf, 'invalidation': {'max_paths': 3}})
+
+        paths = deployer.get_invalidation_paths(
+            'index-1.4.56.html',
+            {f'1.4.56/assets/{i}.svg': 'new' for i in range(5)},
+            {f'1.4.56/assets/{i}.svg': 'old' for i in range(5)})
+
+        assert paths == ['/', '/1.4.56/assets/*', '/index-1.4.56.html']
+
+    def test_get_invalidation_paths__full(self):
+
+        deployer = AngularCLIS3WebsiteDeployer(
+            'integration',
+            'fe-app',
+            {**self.conf, 'invalidation': {'mode': 'full'}})
+
+        assert deployer.get_invalidation_paths(
+            'index-1.4.56.html', {}, None) is None
 
     #
     # BUILD_PATH
@@ -272,6 +1371,54 @@ class AngularCLIS3WebsiteDeployerTestCase(TestCase):
         assert temp_dir.join(
             'build/1.4.56/assets/image.png').read() == 'some.bytes'
 
+    def test_copy_build_dir_to_versioned__uses_cache(self):
+
+        deployer = AngularCLIS3WebsiteDeployer(
+            'integration',
+            'fe-app',
+            {
+                **self.conf,
+                'cache': {'path': str(self.tmpdir.join('cache'))},
+                'replacements': [
+                    {
+                        'from': '/assets/monaco',
+                        'to': '/{version}/assets/monaco',
+                        'file_extensions': ['.js'],
+                    }
+                ],
+            })
+
+        build_dir = self.tmpdir.mkdir('build')
+        build_dir.join('index.html').write('<html>INDEX</html>')
+        build_dir.join('main.js').write('console.log("/assets/monaco/1.png")')
+
+        self.mocker.patch.object(
+            AngularCLIS3WebsiteDeployer,
+            'build_path',
+            str(build_dir))
+        self.mocker.patch.object(
+            AngularCLIS3WebsiteDeployer,
+            'version',
+            '1.4.56')
+
+        temp_dir = self.tmpdir.mkdir('temp')
+        self.mocker.patch.object(
+            tempfile,
+            'mkdtemp'
+        ).side_effect = [
+            str(temp_dir.mkdir('first')),
+            str(temp_dir.mkdir('second')),
+        ]
+
+        deployer.copy_build_dir_to_versioned()
+        put_file = self.mocker.spy(deployer.cache, 'put_file')
+        deployer.copy_build_dir_to_versioned()
+
+        assert put_file.call_count == 0
+        assert temp_dir.join(
+            'second/build/1.4.56/main.js'
+        ).read() == 'console.log("/1.4.56/assets/monaco/1.png")'
+
     #
     # UPLOAD_TO_S3
     #
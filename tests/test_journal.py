@@ -0,0 +1,96 @@
+from unittest import TestCase
+
+import pytest
+
+from lily_delivery.cache import ArtifactCache
+from lily_delivery.journal import Journal
+
+
+class JournalTestCase(TestCase):
+
+    @pytest.fixture(autouse=True)
+    def initfixtures(self, mocker, tmpdir):
+        self.mocker = mocker
+        self.tmpdir = tmpdir
+
+    def setUp(self):
+        self.path = str(self.tmpdir.join('journal'))
+
+    #
+    # LOAD
+    #
+    def test_load__missing(self):
+
+        journal = Journal('my_bucket-1.0.0', path=self.path)
+
+        assert journal.load() is False
+        assert journal.entries == {}
+        assert journal.is_complete is False
+
+    def test_load__recorded_entries(self):
+
+        journal = Journal('my_bucket-1.0.0', path=self.path)
+        journal.record('1.0.0/main.js', 'a1')
+        journal.record('1.0.0/vendor.js', 'b2')
+
+        loaded = Journal('my_bucket-1.0.0', path=self.path)
+
+        assert loaded.load() is True
+        assert loaded.entries == {
+            '1.0.0/main.js': 'a1',
+            '1.0.0/vendor.js': 'b2',
+        }
+        assert loaded.is_complete is False
+
+    def test_load__skips_truncated_line(self):
+
+        journal = Journal('my_bucket-1.0.0', path=self.path)
+        journal.record('1.0.0/main.js', 'a1')
+        with open(journal.path, 'a') as f:
+            f.write('{"key": "1.0.0/ven')
+
+        loaded = Journal('my_bucket-1.0.0', path=self.path)
+
+        assert loaded.load() is True
+        assert loaded.entries == {'1.0.0/main.js': 'a1'}
+
+    def test_load__complete(self):
+
+        journal = Journal('my_bucket-1.0.0', path=self.path)
+        journal.record('1.0.0/main.js', 'a1')
+        journal.mark_complete()
+
+        loaded = Journal('my_bucket-1.0.0', path=self.path)
+        loaded.load()
+
+        assert loaded.is_complete is True
+
+    #
+    # REMOVE
+    #
+    def test_remove(self):
+
+        journal = Journal('my_bucket-1.0.0', path=self.path)
+        journal.record('1.0.0/main.js', 'a1')
+
+        journal.remove()
+        journal.remove()
+
+        assert journal.entries == {}
+        assert Journal('my_bucket-1.0.0', path=self.path).load() is False
+
+    #
+    # CACHE
+    #
+    def test_survives_cache_eviction(self):
+
+        # -- cache configured to share the directory with the journal
+        cache = ArtifactCache(str(self.tmpdir), 10)
+        journal = Journal('my_bucket-1.0.0', path=self.path)
+        journal.record('1.0.0/main.js', 'a8f9')
+
+        cache.put(ArtifactCache.get_key('a'), [b'a' * 100])
+
+        journal = Journal('my_bucket-1.0.0', path=self.path)
+        assert journal.load() is True
+        assert journal.entries == {'1.0.0/main.js': 'a8f9'}
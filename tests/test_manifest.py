@@ -0,0 +1,23 @@
+import hashlib
+
+from lily_delivery import manifest
+from lily_delivery.manifest import get_file_hash
+
+
+def test_get_file_hash(tmpdir):
+
+    f = tmpdir.join('main.js')
+    f.write('console.log("hi")')
+
+    assert get_file_hash(str(f)) == hashlib.sha256(
+        b'console.log("hi")').hexdigest()
+
+
+def test_get_file_hash__reads_in_blocks(tmpdir, mocker):
+
+    mocker.patch.object(manifest, 'BLOCK_SIZE', 3)
+    f = tmpdir.join('main.js')
+    f.write('console.log("hi")')
+
+    assert get_file_hash(str(f)) == hashlib.sha256(
+        b'console.log("hi")').hexdigest()
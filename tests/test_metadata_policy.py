@@ -0,0 +1,136 @@
+from unittest import TestCase
+
+import click
+import pytest
+
+from lily_delivery.metadata_policy import HASHED_CACHE_CONTROL, MetadataPolicy
+
+
+class MetadataPolicyTestCase(TestCase):
+
+    #
+    # GET_METADATA
+    #
+    def test_get_metadata__no_rules(self):
+
+        policy = MetadataPolicy()
+
+        assert policy.get_metadata('index-1.0.0.html') == {}
+        assert policy.get_metadata('1.0.0/assets/logo.svg') == {}
+
+    def test_get_metadata__glob(self):
+
+        policy = MetadataPolicy(rules=[
+            {'glob': 'index-*.html', 'cache-control': 'no-cache'},
+            {'glob': '*/assets/*.svg', 'content-type': 'image/svg+xml'},
+        ])
+
+        assert policy.get_metadata('index-1.0.0.html') == {
+            'cache-control': 'no-cache',
+        }
+        assert policy.get_metadata('1.0.0/assets/icons/logo.svg') == {
+            'content-type': 'image/svg+xml',
+        }
+
+        # -- globs match whole keys
+        assert policy.get_metadata('1.0.0/index-1.0.0.html') == {}
+        assert policy.get_metadata('1.0.0/assets/logo.svg.gz') == {}
+
+    def test_get_metadata__regex(self):
+
+        policy = MetadataPolicy(rules=[
+            {'regex': r'/i18n/[a-z]{2}\.json$', 'cache-control': 'max-age=60'},
+        ])
+
+        assert policy.get_metadata('1.0.0/assets/i18n/en.json') == {
+            'cache-control': 'max-age=60',
+        }
+        assert policy.get_metadata('1.0.0/assets/i18n/en-US.json') == {}
+
+    def test_get_metadata__first_matching_rule_wins(self):
+
+        policy = MetadataPolicy(rules=[
+            {'glob': '*.js', 'compress': 4},
+            {'glob': '*', 'cache-control': 'max-age=60', 'compress': False},
+        ])
+
+        assert policy.get_metadata('1.0.0/main.js') == {
+            'cache-control': 'max-age=60',
+            'compress': 4,
+        }
+        assert policy.get_metadata('1.0.0/logo.png') == {
+            'cache-control': 'max-age=60',
+            'compress': False,
+        }
+
+    def test_get_metadata__hashed(self):
+
+        policy = MetadataPolicy()
+
+        for key in [
+                '1.0.0/main.3f2a9c1b8e7d6a5f.js',
+                '1.0.0/styles.ef46db3751d8e999a8a1.css',
+                '1.0.0/chunk-5ZDXMDWL.js',
+                '1.0.0/media/roboto-LDX3GNLA.woff2',
+                '1.0.0/main.3f2a9c1b8e7d6a5f.js.map']:
+            assert policy.get_metadata(key) == {
+                'cache-control': HASHED_CACHE_CONTROL,
+            }, key
+
+        for key in [
+                'index-1.0.0.html',
+                'index-1.0.0-SNAPSHOT.html',
+                'index-2.3.0-RELEASE1.html',
+                'index-1.0.0-3f2a9c1b8e7d6a5f.html',
+                '1.0.0/main.js',
+                '1.0.0/assets/file-12345678.png',
+                '1.0.0/assets/main-menu.svg',
+                '1.0.0/3f2a9c1b8e7d6a5f/logo.svg']:
+            assert policy.get_metadata(key) == {}, key
+
+    def test_get_metadata__hashed_overridden_by_rules(self):
+
+        policy = MetadataPolicy(
+            rules=[{'glob': '*.css', 'cache-control': 'no-cache'}],
+            hashed_cache_control='max-age=600')
+
+        assert policy.get_metadata('1.0.0/styles.ef46db3751d8e999.css') == {
+            'cache-control': 'no-cache',
+        }
+        assert policy.get_metadata('1.0.0/main.3f2a9c1b8e7d6a5f.js') == {
+            'cache-control': 'max-age=600',
+        }
+
+    def test_get_metadata__hashed_detection_disabled(self):
+
+        policy = MetadataPolicy(detect_hashed=False)
+
+        assert policy.get_metadata('1.0.0/main.3f2a9c1b8e7d6a5f.js') == {}
+
+    #
+    # FROM_CONF
+    #
+    def test_from_conf(self):
+
+        policy = MetadataPolicy.from_conf({
+            'rules': [{'glob': '*.html', 'cache-control': 'no-cache'}],
+            'hashed_pattern': r'\.[0-9a-f]{8}\.js$',
+            'hashed_cache_control': 'max-age=600',
+        })
+
+        assert policy.get_metadata('index.html') == {
+            'cache-control': 'no-cache',
+        }
+        assert policy.get_metadata('1.0.0/main.3f2a9c1b.js') == {
+            'cache-control': 'max-age=600',
+        }
+
+    def test_from_conf__invalid_rules(self):
+
+        for rule in [
+                {'cache-control': 'no-cache'},
+                {'glob': '*', 'regex': '.*', 'cache-control': 'no-cache'},
+                {'glob': '*', 'cache_control': 'no-cache'},
+                {'regex': '(', 'cache-control': 'no-cache'}]:
+            with pytest.raises(click.ClickException):
+                MetadataPolicy.from_conf({'rules': [rule]})
@@ -0,0 +1,87 @@
+import json
+from unittest import TestCase
+
+import pytest
+
+from lily_delivery.describer import Describer
+from lily_delivery.metrics import Metrics
+
+
+class MeasuredDescriber(Describer):
+
+    def __init__(self, metrics):
+        self.metrics = metrics
+
+
+class MetricsTestCase(TestCase):
+
+    @pytest.fixture(autouse=True)
+    def initfixtures(self, mocker, tmpdir):
+        self.mocker = mocker
+        self.tmpdir = tmpdir
+
+    #
+    # PHASE
+    #
+    def test_phase__records_describer_phases(self):
+
+        metrics = Metrics(environment='integration')
+        describer = MeasuredDescriber(metrics)
+
+        with describer.header('deployment'):
+            with describer.subheader('s3: uploading files'):
+                pass
+
+        report = metrics.as_dict()
+        assert report['environment'] == 'integration'
+        assert [
+            (phase['name'], phase['kind'], phase['succeeded'])
+            for phase in report['phases']
+        ] == [
+            ('DEPLOYMENT', 'header', True),
+            ('s3: uploading files', 'subheader', True),
+        ]
+        assert all(phase['duration'] >= 0 for phase in report['phases'])
+
+    def test_phase__records_failures(self):
+
+        metrics = Metrics()
+        describer = MeasuredDescriber(metrics)
+
+        with pytest.raises(OSError):
+            with describer.subheader('staging build directory'):
+                raise OSError('no space left')
+
+        assert metrics.as_dict()['phases'][0]['succeeded'] is False
+
+    def test_phase__describer_without_metrics(self):
+
+        with Describer().subheader('staging build directory'):
+            pass
+
+    #
+    # SAVE / APPEND_TO_HISTORY
+    #
+    def test_save(self):
+
+        metrics = Metrics(environment='integration')
+        metrics.update(upload={'files_count': 3})
+        path = self.tmpdir.join('reports', 'report.json')
+
+        metrics.save(str(path))
+
+        report = json.loads(path.read())
+        assert report['environment'] == 'integration'
+        assert report['upload'] == {'files_count': 3}
+
+    def test_append_to_history(self):
+
+        path = self.tmpdir.join('history.jsonl')
+
+        Metrics(version='1.0.0').append_to_history(str(path))
+        Metrics(version='1.0.1').append_to_history(str(path))
+
+        assert [
+            json.loads(line)['version']
+            for line in path.read().splitlines()
+        ] == ['1.0.0', '1.0.1']
@@ -0,0 +1,92 @@
+from unittest import TestCase
+
+import pytest
+
+from lily_delivery.plan import format_plan, format_size
+
+
+class PlanTestCase(TestCase):
+
+    @pytest.fixture(autouse=True)
+    def initfixtures(self, mocker, tmpdir):
+        self.mocker = mocker
+        self.tmpdir = tmpdir
+
+    #
+    # FORMAT_SIZE
+    #
+    def test_format_size(self):
+
+        assert format_size(12) == '12B'
+        assert format_size(2048) == '2.0KB'
+        assert format_size(3 * 1024 * 1024) == '3.0MB'
+        assert format_size(5 * 1024 ** 3) == '5.0GB'
+
+    #
+    # FORMAT_PLAN
+    #
+    def test_format_plan(self):
+
+        plan = {
+            'environment': 'integration',
+            'version': '1.4.56',
+            'index': 'index-1.4.56.html',
+            'remote': False,
+            'release_exists': None,
+            'resumed': None,
+            'files': [
+                {
+                    'key': '1.4.56/main.js',
+                    'action': 'upload',
+                    'raw_size': 4096,
+                    'size': 1024,
+                    'replaced': True,
+                    'headers': {
+                        'ContentType': 'text/javascript',
+                        'CacheControl': 'max-age=7200',
+                        'ContentEncoding': 'gzip',
+                    },
+                },
+                {
+                    'key': 'index-1.4.56.html',
+                    'action': 'unchanged',
+                    'raw_size': 100,
+                    'size': 100,
+                    'replaced': False,
+                    'headers': {
+                        'ContentType': 'text/html',
+                        'CacheControl': 'max-age=7200',
+                    },
+                },
+            ],
+            'invalidation_paths': ['/', '/index-1.4.56.html'],
+        }
+
+        assert format_plan(plan).splitlines() == [
+            'environment: integration, version: 1.4.56, '
+            'index: index-1.4.56.html',
+            'ACTION     KEY                RAW    SIZE   ENCODING  '
+            'CONTENT TYPE     CACHE CONTROL  REPLACED',
+            'upload     1.4.56/main.js     4.0KB  1.0KB  gzip      '
+            'text/javascript  max-age=7200   yes',
+            'unchanged  index-1.4.56.html  100B   100B   -         '
+            'text/html        max-age=7200   -',
+            '1 of 2 file(s) to upload: 4.0KB -> 1.0KB',
+            'invalidation paths: /, /index-1.4.56.html',
+        ]
+
+    def test_format_plan__resumed(self):
+
+        plan = {
+            'environment': 'integration',
+            'version': '1.4.56',
+            'index': 'index-1.4.56.html',
+            'remote': True,
+            'release_exists': False,
+            'resumed': 3,
+            'files': [],
+            'invalidation_paths': ['/', '/index-1.4.56.html'],
+        }
+
+        assert format_plan(plan).splitlines()[1] == (
+            'resuming interrupted deployment, 3 file(s) already uploaded')
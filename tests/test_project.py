@@ -0,0 +1,125 @@
+import json
+import os
+from unittest import TestCase
+
+import click
+import pytest
+import yaml
+
+from lily_delivery import project as project_module
+from lily_delivery.project import ProjectContext, load_yaml
+
+
+class ProjectContextTestCase(TestCase):
+
+    @pytest.fixture(autouse=True)
+    def initfixtures(self, mocker, tmpdir):
+        self.mocker = mocker
+        self.tmpdir = tmpdir
+
+    def setUp(self):
+        self.project_dir = self.tmpdir.mkdir('project')
+        self.context = ProjectContext(str(self.project_dir))
+
+    #
+    # LOAD_YAML
+    #
+    def test_load_yaml(self):
+
+        assert load_yaml('meta:\n  cache-control: public\n') == {
+            'meta': {'cache-control': 'public'},
+        }
+
+    def test_load_yaml__invalid(self):
+
+        with pytest.raises(ValueError):
+            load_yaml('meta: [')
+
+    def test_load_yaml__falls_back_to_python_loader(self):
+
+        # -- libyaml might be missing, the attribute is restored either way
+        self.mocker.patch.object(yaml, 'CSafeLoader', create=True)
+        delattr(yaml, 'CSafeLoader')
+
+        assert load_yaml('a: 1') == {'a': 1}
+
+    #
+    # CONF
+    #
+    def test_conf__parsed_once(self):
+
+        self.project_dir.join('.lily_delivery.yaml').write('meta: {}')
+        load = self.mocker.spy(project_module, 'load_yaml')
+
+        assert self.context.conf == {'meta': {}}
+        assert self.context.conf == {'meta': {}}
+        assert load.call_count == 1
+
+    def test_conf__must_be_mapping(self):
+
+        self.project_dir.join('.lily_delivery.yaml').write('something')
+
+        with pytest.raises(click.ClickException):
+            self.context.conf
+
+    def test_conf__missing(self):
+
+        with pytest.raises(click.ClickException) as e:
+            self.context.conf
+
+        assert 'does not exist' in e.value.message
+
+    #
+    # VERSION
+    #
+    def test_version(self):
+
+        self.project_dir.join('package.json').write(
+            json.dumps({'version': '0.3.14'}))
+
+        assert self.context.version == '0.3.14'
+
+        # -- content is not read again
+        self.project_dir.join('package.json').write(
+            json.dumps({'version': '0.3.15'}))
+
+        assert self.context.version == '0.3.14'
+
+    def test_version__invalid(self):
+
+        self.project_dir.join('package.json').write('{"version": ')
+
+        with pytest.raises(click.ClickException) as e:
+            self.context.version
+
+        assert 'is not valid' in e.value.message
+
+    def test_version__missing(self):
+
+        self.project_dir.join('package.json').write('{}')
+
+        with pytest.raises(click.ClickException) as e:
+            self.context.version
+
+        assert e.value.message == '"package.json" lacks "version"'
+
+    #
+    # GET_BUILD_PATH
+    #
+    def test_get_build_path(self):
+
+        self.project_dir.join('angular.json').write(json.dumps({
+            'projects': {
+                'fe-app': {
+                    'architect': {
+                        'build': {'options': {'outputPath': 'dist/fe-app'}},
+                    },
+                },
+            },
+        }))
+
+        assert self.context.get_build_path('fe-app') == os.path.join(
+            str(self.project_dir), 'dist/fe-app')
+
+        with pytest.raises(click.ClickException):
+            self.context.get_build_path('be-app')
@@ -0,0 +1,90 @@
+from unittest import TestCase
+
+import pytest
+
+from lily_delivery.replacements import ReplacementEngine
+
+
+class ReplacementEngineTestCase(TestCase):
+
+    @pytest.fixture(autouse=True)
+    def initfixtures(self, mocker, tmpdir):
+        self.mocker = mocker
+        self.tmpdir = tmpdir
+
+    def setUp(self):
+        self.engine = ReplacementEngine(
+            [
+                {
+                    'from': '/assets/monaco',
+                    'to': '/{version}/assets/monaco',
+                    'file_extensions': ['.js', '.css'],
+                },
+                {
+                    'from': '/assets',
+                    'to': '/{version}/assets',
+                    'file_extensions': ['.css'],
+                },
+            ],
+            '1.4.56')
+
+    #
+    # GET_REPLACEMENTS
+    #
+    def test_get_replacements(self):
+
+        assert len(self.engine.get_replacements('a/main.js')) == 1
+        assert len(self.engine.get_replacements('a/styles.css')) == 2
+        assert self.engine.get_replacements('a/index.html') == []
+
+    #
+    # APPLY
+    #
+    def test_apply__replaces_all_patterns_in_one_pass(self):
+
+        src = self.tmpdir.join('styles.css')
+        src.write(
+            'a { src: url(/assets/monaco/1.png) } '
+            'b { src: url(/assets/2.png) }')
+        dst = self.tmpdir.join('out.css')
+
+        assert self.engine.apply(str(src), str(dst)) is True
+        assert dst.read() == (
+            'a { src: url(/1.4.56/assets/monaco/1.png) } '
+            'b { src: url(/1.4.56/assets/2.png) }')
+
+    def test_apply__no_match(self):
+
+        src = self.tmpdir.join('main.js')
+        src.write('console.log("assets/monaco")')
+        dst = self.tmpdir.join('out.js')
+
+        assert self.engine.apply(str(src), str(dst)) is False
+        assert not dst.exists()
+
+    def test_apply__not_matching_extension(self):
+
+        src = self.tmpdir.join('index.html')
+        src.write('<img src="/assets/monaco/1.png">')
+        dst = self.tmpdir.join('out.html')
+
+        assert self.engine.apply(str(src), str(dst)) is False
+        assert not dst.exists()
+
+    def test_apply__empty_file(self):
+
+        src = self.tmpdir.join('main.js')
+        src.write('')
+        dst = self.tmpdir.join('out.js')
+
+        assert self.engine.apply(str(src), str(dst)) is False
+
+    def test_apply__keeps_non_ascii_content(self):
+
+        src = self.tmpdir.join('main.js')
+        src.write_text('"zażółć" + "/assets/monaco"', encoding='utf-8')
+        dst = self.tmpdir.join('out.js')
+
+        assert self.engine.apply(str(src), str(dst)) is True
+        assert dst.read_text(encoding='utf-8') == (
+            '"zażółć" + "/1.4.56/assets/monaco"')
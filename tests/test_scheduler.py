@@ -0,0 +1,114 @@
+import threading
+from unittest import TestCase
+
+import pytest
+
+from lily_delivery.scheduler import Cancelled, Scheduler
+
+
+class SchedulerTestCase(TestCase):
+
+    @pytest.fixture(autouse=True)
+    def initfixtures(self, mocker, tmpdir):
+        self.mocker = mocker
+        self.tmpdir = tmpdir
+
+    #
+    # ADD
+    #
+    def test_add__unknown_dependency(self):
+
+        scheduler = Scheduler()
+
+        with pytest.raises(ValueError):
+            scheduler.add('upload', lambda results: None, depends_on=['stage'])
+
+    #
+    # RUN
+    #
+    def test_run__respects_dependencies(self):
+
+        order = []
+        scheduler = Scheduler()
+        scheduler.add('a', lambda results: order.append('a') or 1)
+        scheduler.add(
+            'b',
+            lambda results: order.append('b') or results['a'] + 1,
+            depends_on=['a'])
+        scheduler.add(
+            'c',
+            lambda results: order.append('c') or results['b'] + 1,
+            depends_on=['b'])
+
+        assert scheduler.run() is True
+        assert order == ['a', 'b', 'c']
+        assert scheduler.results == {'a': 1, 'b': 2, 'c': 3}
+
+    def test_run__runs_independent_steps_concurrently(self):
+
+        # -- both steps wait for each other, therefore they'd never finish
+        # -- if run one after another
+        barrier = threading.Barrier(2, timeout=5)
+        scheduler = Scheduler()
+        scheduler.add('a', lambda results: barrier.wait())
+        scheduler.add('b', lambda results: barrier.wait())
+        scheduler.add('c', lambda results: 'done', depends_on=['a', 'b'])
+
+        assert scheduler.run() is True
+        assert scheduler.results['c'] == 'done'
+
+    def test_run__cancelled(self):
+
+        def cancel(results):
+            raise Cancelled()
+
+        after = self.mocker.Mock()
+        scheduler = Scheduler()
+        scheduler.add('a', cancel)
+        scheduler.add('b', after, depends_on=['a'])
+
+        assert scheduler.run() is False
+        assert after.call_count == 0
+
+    def test_run__error_stops_dependent_steps(self):
+
+        def fail(results):
+            raise OSError('no space left')
+
+        after = self.mocker.Mock()
+        scheduler = Scheduler()
+        scheduler.add('a', fail)
+        scheduler.add('b', after, depends_on=['a'])
+
+        with pytest.raises(OSError):
+            scheduler.run()
+
+        assert after.call_count == 0
+        assert 'a' in scheduler.timings
+
+    #
+    # GET_CRITICAL_PATH
+    #
+    def test_get_critical_path(self):
+
+        scheduler = Scheduler()
+        for name, depends_on in [
+                ('check', []),
+                ('stage', []),
+                ('upload', ['check', 'stage']),
+                ('invalidate', ['upload'])]:
+            scheduler.add(name, lambda results: None, depends_on=depends_on)
+
+        scheduler.timings = {
+            'check': (0, 1),
+            'stage': (0, 5),
+            'upload': (5, 9),
+            'invalidate': (9, 10),
+        }
+
+        assert scheduler.get_critical_path() == [
+            'stage', 'upload', 'invalidate']
+
+    def test_get_critical_path__nothing_run(self):
+
+        assert Scheduler().get_critical_path() == []
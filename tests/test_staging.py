@@ -0,0 +1,62 @@
+import os
+from unittest import TestCase
+
+import pytest
+
+from lily_delivery.staging import Staging
+
+
+class StagingTestCase(TestCase):
+
+    @pytest.fixture(autouse=True)
+    def initfixtures(self, mocker, tmpdir):
+        self.mocker = mocker
+        self.tmpdir = tmpdir
+
+    #
+    # FROM_DIR
+    #
+    def test_from_dir(self):
+
+        build_dir = self.tmpdir.mkdir('build')
+        build_dir.join('index.html').write('<html>')
+        build_dir.mkdir('assets').join('logo.svg').write('<svg>')
+
+        staging = Staging.from_dir(str(build_dir))
+
+        assert len(staging) == 2
+        assert dict(staging) == {
+            'index.html': str(build_dir.join('index.html')),
+            'assets/logo.svg': str(build_dir.join('assets', 'logo.svg')),
+        }
+
+    #
+    # MATERIALIZE
+    #
+    def test_materialize__hard_links_files(self):
+
+        build_dir = self.tmpdir.mkdir('build')
+        build_dir.join('main.js').write('console.log(1)')
+        staging = Staging()
+        staging.add('1.0.0/main.js', str(build_dir.join('main.js')))
+
+        path = staging.materialize(str(self.tmpdir.join('target')))
+
+        target = os.path.join(path, '1.0.0', 'main.js')
+        assert os.path.samefile(target, str(build_dir.join('main.js')))
+
+    def test_materialize__copies_if_linking_fails(self):
+
+        self.mocker.patch.object(os, 'link').side_effect = OSError(
+            'cross-device link')
+        build_dir = self.tmpdir.mkdir('build')
+        build_dir.join('main.js').write('console.log(1)')
+        staging = Staging()
+        staging.add('1.0.0/main.js', str(build_dir.join('main.js')))
+
+        path = staging.materialize(str(self.tmpdir.join('target')))
+
+        target = os.path.join(path, '1.0.0', 'main.js')
+        assert not os.path.samefile(target, str(build_dir.join('main.js')))
+        with open(target) as f:
+            assert f.read() == 'console.log(1)'